@@ -1 +1,3 @@
-from .cliptiles_utils import *
+# clip-tiles is not a valid package name, so this file is imported as a top-level module by tools, e.g., pytest.
+if __package__:
+    from .cliptiles_utils import *
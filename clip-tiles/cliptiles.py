@@ -4,16 +4,19 @@ Zoom level: https://wiki.openstreetmap.org/wiki/Zoom_levels
 """
 # Internal functions
 import argparse
+import json
 import os
 
 # External functions
 from osgeo import osr
 
 # Project functions
-from cliptiles_utils import FileIO, Tile, get_sensor
+from cliptiles_utils import FileIO, Profiler, RunState, Sensors, StatsCache, Tile, WarpConfig, get_sensor, make_key
 
+# Name of a report file in an output directory.
+REPORT = 'cliptiles_report.json'
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('files', nargs='+', type=str, help='Path to input files. For multi-band, enter in rgb order.')
     parser.add_argument('zoom_min', type=int, help='Minimum zoom level. Minimum zoom level is 0.')
@@ -21,13 +24,66 @@ def parse_args():
     parser.add_argument('output', type=str, help='Path to an output directory.')
     parser.add_argument('--epsg_dsc', type=int, default=3857, help='EPSG code of a target projected coordinate system(Optional). Default: 3857')
     parser.add_argument('--tile_size', type=int, default=256, help='Size of a tile(Optional). Default: 256')
-    args = parser.parse_args()
+    parser.add_argument('--block_size', type=int, default=None, help='Width and height of a block to normalize an image '
+                                                                     'block by block(Optional). If not given, normalize '
+                                                                     'the whole image in memory. Default: None')
+    parser.add_argument('--threads', type=int, default=1, help='Number of threads of a warp. 0 uses all CPUs(Optional). '
+                                                               'Default: 1')
+    parser.add_argument('--warp_memory', type=int, default=None, help='Memory of a warp in MB(Optional). '
+                                                                      'Default: GDAL default(64)')
+    parser.add_argument('--cache_size', type=int, default=None, help='Size of GDAL block cache in MB(Optional). '
+                                                                     'Default: GDAL default')
+    parser.add_argument('--warp_resampling', type=str, default='near', help='Resampling method of a warp. E.g., near, '
+                                                                            'bilinear, cubic, average(Optional). '
+                                                                            'Default: near')
+    parser.add_argument('--memory_limit', type=int, default=1024, help='Maximum size of intermediate rasters kept in '
+                                                                       'memory in MB(Optional). Default: 1024')
+    parser.add_argument('--tmp_dir', type=str, default=None, help='Directory where intermediate rasters exceeding the '
+                                                                  'memory limit are written(Optional). Default: system '
+                                                                  'temporary directory')
+    parser.add_argument('--format', type=str, default='xyz', choices=['xyz', 'mbtiles'],
+                        help='Output format. xyz: [Zoom level]/[X]/[Y].png files, mbtiles: a single SQLite archive'
+                             '(Optional). Default: xyz')
+    parser.add_argument('--pixel_format', type=str, default='rgba', choices=['rgba', 'la', 'palette', 'webp'],
+                        help='Pixel format of tiles. rgba: RGBA png, la: gray + alpha png, palette: 8 bit gray '
+                             'palette png, webp: lossless RGBA webp. la and palette are for single-band images'
+                             '(Optional). Default: rgba')
+    parser.add_argument('--png_level', type=int, default=6, help='Compression level of png. 0 ~ 9. Lower is faster '
+                                                                 'and larger(Optional). Default: 6')
+    parser.add_argument('--dedup', action='store_true', help='Store identical tiles once. Hard links in xyz, shared '
+                                                             'images in mbtiles(Optional).')
+    parser.add_argument('--resume', action='store_true', help='Resume a previous run on the same output directory. '
+                                                              'Zoom levels and tile columns complete with the same '
+                                                              'input files and parameters are skipped(Optional).')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to cut tiles(Optional). Default: 1')
+    parser.add_argument('--pyramid', action='store_true', help='Generate tiles of the maximum zoom level only and build '
+                                                               'lower zoom levels by 2x2 downsampling(Optional).')
+    parser.add_argument('--resampling', type=str, default='average', choices=['average', 'mode'],
+                        help='Downsampling method of pyramid. Use mode for masks(Optional). Default: average')
+    parser.add_argument('--stats_cache', type=str, nargs='?', const='', default=None,
+                        help='Cache histograms of the scene in the given directory, or ~/.cache/cliptiles/stats if '
+                             'no directory is given(Optional). Default: None(no cache)')
+    parser.add_argument('--profile', action='store_true', help='Record duration, bytes, tiles and memory of each '
+                                                               'stage in cliptiles_report.json(Optional).')
+    parser.add_argument('--profile_events', type=str, default=None, help='Path to a line-delimited JSON file where '
+                                                                         'an event is appended per stage. It enables '
+                                                                         '--profile(Optional).')
+    parser.add_argument('--trace_memory', action='store_true', help='Record peak Python allocations per stage with '
+                                                                    'tracemalloc. It enables --profile and slows down '
+                                                                    'a run(Optional).')
+    args = parser.parse_args(argv)
 
     return args
 
 def main():
-    args = parse_args()
+    run(parse_args())
 
+def run(args):
+    """Tile a scene.
+
+    Args:
+        args(argparse.Namespace): Arguments from parse_args.
+    """
     for file in args.files:
         if not os.path.isfile(file):
             print(f'Input file not exist: {file}')
@@ -41,6 +97,21 @@ def main():
     if args.zoom_min > args.zoom_max:
         print(f'Minimum zoom level must be less than or equal to the maximum zoom level.')
         exit()
+    if args.block_size is not None and args.block_size <= 0:
+        print(f'Block size must be greater than 0: {args.block_size}')
+        exit()
+    if args.workers < 1:
+        print(f'Number of workers must be greater than 0: {args.workers}')
+        exit()
+    if args.threads < 0:
+        print(f'Number of threads must be greater than or the same as 0: {args.threads}')
+        exit()
+    if not 0 <= args.png_level <= 9:
+        print(f'Compression level of png must be between 0 and 9: {args.png_level}')
+        exit()
+    if args.pixel_format in ('la', 'palette') and len(args.files) > 1:
+        print(f'Pixel format {args.pixel_format} is for single-band images.')
+        exit()
     if osr.SpatialReference().ImportFromEPSG(args.epsg_dsc) != 0:
         print(f'Target EPSG code is not supported: {args.epsg_dsc}')
         exit()
@@ -56,21 +127,93 @@ def main():
     print('Maximum zoom level: ', args.zoom_max)
     print('Output directory: ', args.output)
     print('Tile size: ', args.tile_size)
+    print('Block size: ', args.block_size)
+    print('Warp threads: ', args.threads)
+    print('Warp memory(MB): ', args.warp_memory)
+    print('Cache size(MB): ', args.cache_size)
+    print('Warp resampling: ', args.warp_resampling)
+    print('Memory limit(MB): ', args.memory_limit)
+    print('Temporary directory: ', args.tmp_dir)
+    print('Format: ', args.format)
+    print('Pixel format: ', args.pixel_format, f'(level {args.png_level})' if args.pixel_format != 'webp' else '')
+    print('Workers: ', args.workers)
+    print('Resume: ', args.resume)
+    print('Pyramid: ', args.pyramid, f'({args.resampling})' if args.pyramid else '')
+    print('Stats cache: ', None if args.stats_cache is None else args.stats_cache or 'default')
+    print('Profile: ', args.profile or args.profile_events is not None or args.trace_memory)
     print('=' * 60)
     print()
 
     os.makedirs(args.output, exist_ok=True)
 
-    file_io = FileIO(sensor)
-    file_io.open(path=args.files,
-                 epsg=args.epsg_dsc)
+    state = None
+    if args.resume:
+        key = make_key(args.files,
+                       sensor=sensor,
+                       norm=Sensors.get(sensor, {}).get('norm'),
+                       epsg=args.epsg_dsc,
+                       tile_size=args.tile_size,
+                       warp_resampling=args.warp_resampling,
+                       pyramid=args.pyramid,
+                       resampling=args.resampling,
+                       format=args.format,
+                       pixel_format=args.pixel_format,
+                       png_level=args.png_level,
+                       dedup=args.dedup)
+        try:
+            state = RunState(args.output, key)
+        except FileExistsError as e:
+            print(f'{e}. Use another output directory, or the same input files and parameters to resume.')
+            exit()
+        if all(state.is_done(zoom) for zoom in range(args.zoom_min, args.zoom_max+1)):
+            print('All zoom levels are already complete.')
+            return
+
+    profiler = Profiler(enabled=args.profile or args.profile_events is not None or args.trace_memory,
+                        events=args.profile_events,
+                        trace_memory=args.trace_memory)
+    # The GDAL block cache size is set before the image is opened, so that reads of normalization use it too.
+    warp_config = WarpConfig(threads=args.threads,
+                             memory_limit=args.warp_memory,
+                             cache_size=args.cache_size,
+                             resampling=args.warp_resampling)
+    file_io = FileIO(sensor,
+                     block_size=args.block_size,
+                     memory_limit=args.memory_limit * 1024 * 1024,
+                     tmp_dir=args.tmp_dir,
+                     stats_cache=None if args.stats_cache is None else StatsCache(args.stats_cache),
+                     profiler=profiler)
+    # Intermediates of the scratch space are removed even if the run fails.
+    try:
+        file_io.open(path=args.files,
+                     epsg=args.epsg_dsc)
 
-    file_io.write(tile=Tile(args.tile_size),
-                  output_dir=args.output,
-                  zoom_min=args.zoom_min,
-                  zoom_max=args.zoom_max)
+        tile = Tile(args.tile_size,
+                    workers=args.workers,
+                    warp_config=warp_config,
+                    pixel_format=args.pixel_format,
+                    png_level=args.png_level,
+                    profiler=profiler)
+        report = file_io.write(tile=tile,
+                               output_dir=args.output,
+                               zoom_min=args.zoom_min,
+                               zoom_max=args.zoom_max,
+                               pyramid=args.pyramid,
+                               resampling=args.resampling,
+                               fmt=args.format,
+                               dedup=args.dedup,
+                               state=state)
+    finally:
+        file_io.close()
+        profiler.close()
+    if profiler.enabled:
+        report['profile'] = profiler.report()
 
-    file_io.close()
+    dedup = report['dedup']
+    print(f'Tiles: {dedup["tiles"]}, Unique: {dedup["unique"]}, Duplicates: {dedup["duplicates"]}, '
+          f'Saved: {dedup["bytes_saved"] / 1024 / 1024:.1f} MB')
+    with open(os.path.join(args.output, REPORT), 'w') as f:
+        json.dump(report, f, indent=2)
 
 if __name__ == '__main__':
     main()
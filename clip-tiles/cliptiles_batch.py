@@ -0,0 +1,257 @@
+"""Clip tiles of many scenes.
+Runs cliptiles on scenes of a directory or a manifest with a bounded number of processes.
+Each scene is tiled in [output]/[scene name], and a failing scene does not stop the others.
+Status, duration and error of each scene are written in [output]/batch_summary.json.
+"""
+# Internal functions
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from shutil import rmtree
+import argparse
+import contextlib
+import json
+import os
+import re
+import tempfile
+import time
+import traceback
+
+# Project functions
+import cliptiles
+
+# Extensions of input files.
+EXTENSIONS = ('.tif', '.tiff', '.h5')
+# Band names of multi-band(EO) scenes. A scene is a group of files whose names differ only by them.
+BANDS = {'red': 0, 'r': 0, 'green': 1, 'g': 1, 'blue': 2, 'b': 2}
+SUMMARY = 'batch_summary.json'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Options not listed below are passed to cliptiles.py. '
+                                                 'E.g., --block_size 4096 --format mbtiles')
+    parser.add_argument('input', type=str, help='Directory of scenes, or a manifest file listing a scene per line. '
+                                                'Files of a multi-band scene are written in a line in rgb order.')
+    parser.add_argument('zoom_min', type=int, help='Minimum zoom level. Minimum zoom level is 0.')
+    parser.add_argument('zoom_max', type=int, help='Maximum zoom level. Maximum zoom level is 20.')
+    parser.add_argument('output', type=str, help='Path to an output directory.')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of scenes tiled at the same time(Optional). '
+                                                            'Default: 1')
+    parser.add_argument('--summary', type=str, default=None, help='Path to a summary file(Optional). '
+                                                                  'Default: [output]/batch_summary.json')
+    args, options = parser.parse_known_args()
+
+    return args, options
+
+
+def find_scenes(input_path):
+    """Find scenes in a directory or a manifest.
+
+    A manifest lists files of a scene per line, separated by spaces or commas. Lines starting with # are ignored.
+    Relative paths are relative to the manifest.
+    In a directory, files whose names differ only by a band name(red, green, blue or R, G, B) are
+    grouped into a multi-band scene in rgb order. Files of other bands, e.g., NIR, are single-band scenes.
+
+    Args:
+        input_path(str): Path to a directory or a manifest file.
+    Returns:
+        scenes(list(tuple)): Name and paths to files of each scene.
+    """
+    if os.path.isfile(input_path):
+        root = os.path.dirname(os.path.abspath(input_path))
+        scenes = []
+        with open(input_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                files = [os.path.join(root, file) for file in re.split(r'[\s,]+', line)]
+                scenes.append((scene_name(files), files))
+        return unique_names(scenes)
+
+    singles = []
+    groups = {}
+    for file in sorted(os.listdir(input_path)):
+        if not file.lower().endswith(EXTENSIONS):
+            continue
+        stem, ext = os.path.splitext(file)
+        splits = stem.split('_')
+        band = BANDS.get(splits[-1].lower()) if len(splits) > 1 else None
+        if band is None:
+            singles.append((stem, [os.path.join(input_path, file)]))
+        else:
+            groups.setdefault('_'.join(splits[:-1]), {})[band] = os.path.join(input_path, file)
+
+    scenes = singles
+    for name, bands in groups.items():
+        if len(bands) == 3:
+            scenes.append((name, [bands[0], bands[1], bands[2]]))
+        else:
+            # Incomplete group is tiled as single-band scenes.
+            scenes.extend((os.path.splitext(os.path.basename(path))[0], [path]) for path in bands.values())
+
+    return unique_names(sorted(scenes))
+
+
+def scene_name(files):
+    """Get a name of a scene from its files. Band name of multi-band files is removed."""
+    stem = os.path.splitext(os.path.basename(files[0]))[0]
+    splits = stem.split('_')
+    if len(files) > 1 and len(splits) > 1 and splits[-1].lower() in BANDS:
+        return '_'.join(splits[:-1])
+
+    return stem
+
+
+def unique_names(scenes):
+    names = {}
+    unique = []
+    for name, files in scenes:
+        count = names.get(name, 0)
+        names[name] = count + 1
+        unique.append((f'{name}_{count}' if count else name, files))
+
+    return unique
+
+
+def run_job(job, conn):
+    """Tile a scene in a child process and send the result.
+
+    Outputs of the scene are written in its log file. A scene calling exit() is failed.
+
+    Args:
+        job(dict): Name, arguments and path to a log file of a scene.
+        conn(Connection): Connection to send the result.
+    """
+    result = {'status': 'done', 'error': None}
+    with open(job['log'], 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            cliptiles.run(cliptiles.parse_args(job['argv']))
+        except SystemExit:
+            log.flush()
+            result = {'status': 'failed', 'error': last_line(job['log']) or 'Exited.'}
+        except BaseException as e:
+            traceback.print_exc()
+            result = {'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+    conn.send(result)
+    conn.close()
+
+
+def last_line(path):
+    with open(path, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    return lines[-1] if lines else None
+
+
+def run_jobs(jobs, num_jobs, summary_path):
+    """Run jobs with at most num_jobs processes at the same time.
+
+    Each job has its own process and scratch directory, so a crash or exit() of a job does not affect the others.
+    The summary is updated whenever a job ends.
+
+    Args:
+        jobs(list(dict)): Jobs. See run_job.
+        num_jobs(int): Maximum number of processes.
+        summary_path(str): Path to a summary file.
+    Returns:
+        summary(list(dict)): Status, duration and error of each job.
+    """
+    summary = [{'name': job['name'], 'files': job['files'], 'output': job['output'], 'log': job['log'],
+                'status': 'pending', 'duration': None, 'error': None} for job in jobs]
+    pending = list(range(len(jobs)))
+    running = {}
+    while pending or running:
+        while pending and len(running) < num_jobs:
+            idx = pending.pop(0)
+            job = jobs[idx]
+            job['tmp_dir'] = tempfile.mkdtemp(prefix=f'cliptiles_{job["name"]}_', dir=job['tmp_root'])
+            job['argv'] += ['--tmp_dir', job['tmp_dir']]
+            recv_conn, send_conn = Pipe(duplex=False)
+            process = Process(target=run_job, args=(job, send_conn))
+            process.start()
+            send_conn.close()
+            running[process.sentinel] = (idx, process, recv_conn, time.perf_counter())
+            summary[idx]['status'] = 'running'
+            print(f'Start: {job["name"]}')
+
+        for sentinel in wait(list(running)):
+            idx, process, recv_conn, start = running.pop(sentinel)
+            process.join()
+            try:
+                result = recv_conn.recv()
+            except EOFError:  # The process died before sending a result.
+                result = {'status': 'failed', 'error': f'Process died. Exit code: {process.exitcode}'}
+            recv_conn.close()
+            rmtree(jobs[idx]['tmp_dir'], ignore_errors=True)
+
+            summary[idx].update(result, duration=round(time.perf_counter() - start, 3))
+            print(f'{summary[idx]["status"].capitalize()}: {jobs[idx]["name"]} ({summary[idx]["duration"]} s)'
+                  + (f' {summary[idx]["error"]}' if summary[idx]['error'] else ''))
+            write_summary(summary_path, summary)
+
+    return summary
+
+
+def write_summary(path, summary):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    args, options = parse_args()
+
+    if not os.path.exists(args.input):
+        print(f'Input not exist: {args.input}')
+        exit()
+    if args.jobs < 1:
+        print(f'Number of jobs must be greater than 0: {args.jobs}')
+        exit()
+
+    scenes = find_scenes(args.input)
+    if not scenes:
+        print(f'No scene is found: {args.input}')
+        exit()
+
+    # Check options before running scenes. Scratch directory of each scene is made in --tmp_dir.
+    tmp_root = cliptiles.parse_args(scenes[0][1] + [str(args.zoom_min), str(args.zoom_max), args.output]
+                                    + options).tmp_dir
+
+    os.makedirs(args.output, exist_ok=True)
+    log_dir = os.path.join(args.output, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    summary_path = args.summary or os.path.join(args.output, SUMMARY)
+
+    jobs = []
+    for name, files in scenes:
+        output = os.path.join(args.output, name)
+        jobs.append({'name': name,
+                     'files': files,
+                     'output': output,
+                     'log': os.path.join(log_dir, name + '.log'),
+                     'tmp_root': tmp_root,
+                     'argv': files + [str(args.zoom_min), str(args.zoom_max), output] + options})
+
+    print('=' * 21, 'Batch Parameters', '=' * 22)
+    print('Input: ', args.input)
+    print('Scenes: ', len(jobs))
+    print('Minimum zoom level: ', args.zoom_min)
+    print('Maximum zoom level: ', args.zoom_max)
+    print('Output directory: ', args.output)
+    print('Jobs: ', args.jobs)
+    print('Options of cliptiles: ', ' '.join(options))
+    print('Summary: ', summary_path)
+    print('=' * 60)
+    print()
+
+    start = time.perf_counter()
+    summary = run_jobs(jobs, args.jobs, summary_path)
+    num_failed = sum(job['status'] != 'done' for job in summary)
+
+    print()
+    print(f'Done: {len(summary) - num_failed}, Failed: {num_failed}, Time: {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Benchmark clip tiles.
+Generates synthetic georeferenced SAR(single-band) and EO(3 files of RGB) scenes and runs the pipeline on them.
+Wall time per stage, tiles per second, bytes written and peak RSS of each case are written as JSON.
+With --baseline, results are compared with a previous JSON and regressions are flagged.
+"""
+# Internal functions
+from multiprocessing import Pipe, Process
+from shutil import rmtree
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import traceback
+
+# External functions
+from osgeo import gdal, osr
+import numpy as np
+
+# Project functions
+from cliptiles_utils import FileIO, Store, Tile, WarpConfig, get_sensor
+
+# Synthetic scenes are in UTM zone 52N around Seoul.
+EPSG_SCENE = 32652
+ORIGIN = (320000, 4170000)
+# Metrics compared with a baseline. Larger is worse except tiles_per_s.
+METRICS = ('total', 'tiles_per_s', 'bytes', 'peak_rss_mb')
+# Stages shorter than this in seconds are not compared. They are dominated by noise.
+MIN_TIME = 0.05
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--kinds', nargs='+', default=['sar', 'eo'], choices=['sar', 'eo'],
+                        help='Kinds of synthetic scenes(Optional). Default: sar eo')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[2048, 8192],
+                        help='Width and height of synthetic scenes in pixels(Optional). Default: 2048 8192')
+    parser.add_argument('--pixel_size', type=float, default=5, help='Pixel size of synthetic scenes in meters'
+                                                                    '(Optional). Default: 5')
+    parser.add_argument('--zoom_min', type=int, default=12, help='Minimum zoom level(Optional). Default: 12')
+    parser.add_argument('--zoom_max', type=int, default=15, help='Maximum zoom level(Optional). Default: 15')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of runs per case. Median of runs is reported'
+                                                              '(Optional). Default: 1')
+    parser.add_argument('--tile_size', type=int, default=256, help='Size of a tile(Optional). Default: 256')
+    parser.add_argument('--block_size', type=int, default=None, help='Block size of normalization(Optional). '
+                                                                     'Default: None')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to cut tiles(Optional). '
+                                                               'Default: 1')
+    parser.add_argument('--threads', type=int, default=1, help='Number of threads of a warp(Optional). Default: 1')
+    parser.add_argument('--format', type=str, default='xyz', choices=['xyz', 'mbtiles'],
+                        help='Output format(Optional). Default: xyz')
+    parser.add_argument('--pixel_format', type=str, default='rgba', choices=['rgba', 'la', 'palette', 'webp'],
+                        help='Pixel format of tiles. la and palette are applied to SAR only(Optional). Default: rgba')
+    parser.add_argument('--work_dir', type=str, default=None, help='Directory of scenes and tiles. Scenes are kept '
+                                                                   'and reused(Optional). Default: a temporary '
+                                                                   'directory removed at the end')
+    parser.add_argument('--output', type=str, default='cliptiles_bench.json', help='Path to a result JSON(Optional). '
+                                                                                   'Default: cliptiles_bench.json')
+    parser.add_argument('--baseline', type=str, default=None, help='Path to a result JSON to compare with(Optional).')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change flagged as a regression'
+                                                                     '(Optional). Default: 0.1')
+    args = parser.parse_args()
+
+    return args
+
+
+def make_scene(work_dir, kind, size, pixel_size, seed=0):
+    """Generate a synthetic scene unless it exists.
+
+    SAR is a uint16 speckle(gamma distribution) over smooth structures, and EO is 12 bit RGB gradients with noise.
+    A triangle of no data(0) is left at the top left corner, as in the margins of real scenes.
+
+    Args:
+        work_dir(str): Directory of scenes.
+        kind(str): 'sar' or 'eo'.
+        size(int): Width and height in pixels.
+        pixel_size(float): Pixel size in meters.
+        seed(int): Seed of random numbers(Optional). Default: 0
+    Returns:
+        paths(list(str)): Paths to files of the scene. Names follow the sensors, K5 for SAR and K3A for EO.
+    """
+    if kind == 'sar':
+        paths = [os.path.join(work_dir, f'K5_bench{size}_HH.tif')]
+    else:
+        paths = [os.path.join(work_dir, f'K3A_bench{size}_{band}.tif') for band in ('red', 'green', 'blue')]
+    if all(os.path.isfile(path) for path in paths):
+        return paths
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG_SCENE)
+    rng = np.random.default_rng(seed)
+    driver = gdal.GetDriverByName('GTiff')
+    datasets = []
+    for path in paths:
+        ds = driver.Create(path, size, size, 1, gdal.GDT_UInt16, options=['TILED=YES'])
+        ds.SetProjection(srs.ExportToWkt())
+        ds.SetGeoTransform((ORIGIN[0], pixel_size, 0, ORIGIN[1], 0, -pixel_size))
+        datasets.append(ds)
+
+    rows = 512
+    x = np.arange(size)[None, :]
+    for yoff in range(0, size, rows):
+        y = np.arange(yoff, min(yoff + rows, size))[:, None]
+        nodata = x + y < size // 8
+        for idx, ds in enumerate(datasets):
+            if kind == 'sar':
+                mean = 200 + 150 * np.sin(x / 97.0) * np.cos(y / 131.0) + 100 * ((x // 256 + y // 256) % 2)
+                img = mean * rng.gamma(4.0, 0.25, size=(len(y), size))
+            else:
+                img = 500 + 3000 * (x + (idx + 1) * y) / ((idx + 2) * size) + rng.normal(0, 60, size=(len(y), size))
+            img = np.clip(img, 1, 65535).astype(np.uint16)
+            img[nodata] = 0
+            ds.GetRasterBand(1).WriteArray(img, 0, yoff)
+    datasets = None
+
+    return paths
+
+
+def run_case(case, conn):
+    """Run a case in a child process, so that peak RSS is of the case only, and send the result.
+
+    Args:
+        case(dict): Paths to scene files, options and output directory of a case.
+        conn(Connection): Connection to send the result.
+    """
+    try:
+        conn.send(measure(case))
+    except BaseException as e:
+        traceback.print_exc()
+        conn.send({'error': f'{type(e).__name__}: {e}'})
+    conn.close()
+
+
+def measure(case):
+    """Run the pipeline on a scene and measure its stages.
+
+    Args:
+        case(dict): Paths to scene files, options and output directory of a case.
+    Returns:
+        result(dict): Wall time per stage in seconds, number of tiles, tiles per second, bytes and peak RSS.
+    """
+    stages = {}
+    zoom_stages = {}
+
+    def timed(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        stages[name] = stages.get(name, 0) + time.perf_counter() - start
+        return value
+
+    warp_config = WarpConfig(threads=case['threads'], verbose=False)
+    tile = Tile(case['tile_size'], workers=case['workers'], warp_config=warp_config,
+                pixel_format=case['pixel_format'])
+    file_io = FileIO(get_sensor(case['files'][0]), block_size=case['block_size'])
+    try:
+        timed('open', file_io.read, case['files'])
+        timed('norm', file_io.norm)
+
+        store = Store.get(case['format'])(case['output'], tile_format=tile.tile_format)
+        timed('overviews', file_io.build_overviews, tile, case['zoom_min'])
+        num_tiles = 0
+        for zoom in range(case['zoom_min'], case['zoom_max'] + 1):
+            start = time.perf_counter()
+            tile.write_tiles(file_io.ds, zoom, store, file_io.scratch, epsg=file_io.epsg)
+            zoom_stages[zoom] = time.perf_counter() - start
+            num_tiles += len(store.tiles(zoom))
+        stages['write_tiles'] = sum(zoom_stages.values())
+        stages['warp'] = sum(elapsed for _, elapsed in warp_config.timings)  # Included in write_tiles.
+        timed('close', store.close)
+    finally:
+        file_io.close()
+
+    total = sum(elapsed for name, elapsed in stages.items() if name != 'warp')
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)  # Workers of cut_tiles_parallel
+
+    return {'stages': stages,
+            'zoom_levels': {str(zoom): elapsed for zoom, elapsed in zoom_stages.items()},
+            'total': total,
+            'tiles': num_tiles,
+            'tiles_per_s': num_tiles / stages['write_tiles'] if stages['write_tiles'] else 0,
+            'bytes': dir_size(case['output']),
+            'peak_rss_mb': peak_rss / 1024}  # ru_maxrss is in KB on Linux.
+
+
+def dir_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        size += sum(os.path.getsize(os.path.join(root, file)) for file in files)
+
+    return size
+
+
+def run_repeats(case, repeat):
+    """Run a case repeatedly, each in a new process, and take the median of every metric.
+
+    Args:
+        case(dict): Case to run. See measure.
+        repeat(int): Number of runs.
+    Returns:
+        result(dict): Median result. See measure.
+    """
+    results = []
+    for _ in range(repeat):
+        rmtree(case['output'], ignore_errors=True)
+        recv_conn, send_conn = Pipe(duplex=False)
+        process = Process(target=run_case, args=(case, send_conn))
+        process.start()
+        send_conn.close()
+        process.join()
+        try:
+            result = recv_conn.recv()
+        except EOFError:  # The process died before sending a result.
+            result = {'error': f'Process died. Exit code: {process.exitcode}'}
+        recv_conn.close()
+        if 'error' in result:
+            return result
+        results.append(result)
+
+    median = {key: float(np.median([result[key] for result in results]))
+              for key in ('total', 'tiles_per_s', 'bytes', 'peak_rss_mb')}
+    median['tiles'] = results[0]['tiles']
+    for key in ('stages', 'zoom_levels'):
+        median[key] = {name: float(np.median([result[key][name] for result in results])) for name in results[0][key]}
+
+    return median
+
+
+def compare(cases, baseline, threshold):
+    """Compare results with a baseline.
+
+    Args:
+        cases(dict): Results per case name.
+        baseline(dict): Results of a baseline per case name.
+        threshold(float): Relative change flagged as a regression.
+    Returns:
+        comparison(list(dict)): Metric, baseline, current value, relative change and regression flag.
+    """
+    comparison = []
+    for name, result in cases.items():
+        base = baseline.get(name)
+        if base is None or 'error' in result or 'error' in base:
+            continue
+
+        metrics = [(metric, base[metric], result[metric]) for metric in METRICS]
+        metrics += [(f'stages.{stage}', base['stages'][stage], elapsed) for stage, elapsed in result['stages'].items()
+                    if stage in base['stages'] and max(base['stages'][stage], elapsed) >= MIN_TIME]
+        for metric, old, new in metrics:
+            change = (new - old) / old if old else 0
+            worse = -change if metric == 'tiles_per_s' else change
+            comparison.append({'case': name, 'metric': metric, 'baseline': old, 'current': new,
+                               'change': round(change, 4), 'regression': worse > threshold})
+
+    return comparison
+
+
+def main():
+    args = parse_args()
+
+    if args.zoom_min < 0 or args.zoom_max > 20 or args.zoom_min > args.zoom_max:
+        print(f'Zoom levels must be 0 <= zoom_min <= zoom_max <= 20: {args.zoom_min}, {args.zoom_max}')
+        exit()
+    if args.repeat < 1:
+        print(f'Number of runs must be greater than 0: {args.repeat}')
+        exit()
+    baseline = None
+    if args.baseline is not None:
+        if not os.path.isfile(args.baseline):
+            print(f'Baseline not exist: {args.baseline}')
+            exit()
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['cases']
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='cliptiles_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    cases = {}
+    try:
+        for kind in args.kinds:
+            for size in args.sizes:
+                name = f'{kind}_{size}'
+                start = time.perf_counter()
+                files = make_scene(work_dir, kind, size, args.pixel_size)
+                generate = time.perf_counter() - start
+                # la and palette are for single-band images.
+                pixel_format = args.pixel_format if kind == 'sar' or args.pixel_format in ('rgba', 'webp') else 'rgba'
+
+                case = {'files': files,
+                        'output': os.path.join(work_dir, 'tiles_' + name),
+                        'zoom_min': args.zoom_min,
+                        'zoom_max': args.zoom_max,
+                        'tile_size': args.tile_size,
+                        'block_size': args.block_size,
+                        'workers': args.workers,
+                        'threads': args.threads,
+                        'format': args.format,
+                        'pixel_format': pixel_format}
+                result = run_repeats(case, args.repeat)
+                result['generate'] = generate
+                cases[name] = result
+                rmtree(case['output'], ignore_errors=True)
+
+                if 'error' in result:
+                    print(f'{name}: {result["error"]}')
+                else:
+                    print(f'{name}: {result["total"]:.2f} s, {result["tiles"]} tiles, '
+                          f'{result["tiles_per_s"]:.1f} tiles/s, {result["bytes"] / 1024 / 1024:.1f} MB, '
+                          f'peak RSS {result["peak_rss_mb"]:.0f} MB')
+    finally:
+        if args.work_dir is None:
+            rmtree(work_dir, ignore_errors=True)
+
+    report = {'meta': {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'python': platform.python_version(),
+                       'gdal': gdal.__version__,
+                       'numpy': np.__version__,
+                       'platform': platform.platform(),
+                       'cpus': os.cpu_count(),
+                       'args': vars(args)},
+              'cases': cases}
+
+    regressions = []
+    if baseline is not None:
+        report['comparison'] = compare(cases, baseline, args.threshold)
+        regressions = [item for item in report['comparison'] if item['regression']]
+        for item in regressions:
+            print(f'Regression: {item["case"]} {item["metric"]} {item["baseline"]:.3f} -> {item["current"]:.3f} '
+                  f'({item["change"]:+.1%})')
+        print(f'Regressions: {len(regressions)}')
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if regressions or any('error' in result for result in cases.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
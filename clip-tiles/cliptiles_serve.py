@@ -0,0 +1,128 @@
+"""Serve tiles on demand.
+Runs a local HTTP server giving /[Zoom level]/[X]/[Y].png tiles(openstreetmap) of a scene.
+Tiles are rendered when they are requested, instead of all zoom levels in advance, and kept in a LRU cache.
+"""
+# Internal functions
+import argparse
+import hashlib
+import json
+import os
+
+# Project functions
+from cliptiles_utils import FileIO, StatsCache, Tile, TileCache, TileRenderer, WarpConfig, get_sensor, serve
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+', type=str, help='Path to input files. For multi-band, enter in rgb order.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on(Optional). '
+                                                                      'Default: 127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on(Optional). Default: 8000')
+    parser.add_argument('--tile_size', type=int, default=256, help='Size of a tile(Optional). Default: 256')
+    parser.add_argument('--block_size', type=int, default=None, help='Width and height of a block to normalize an image '
+                                                                     'block by block(Optional). Default: None')
+    parser.add_argument('--memory_limit', type=int, default=1024, help='Maximum size of intermediate rasters kept in '
+                                                                       'memory in MB(Optional). Default: 1024')
+    parser.add_argument('--tmp_dir', type=str, default=None, help='Directory where intermediate rasters exceeding the '
+                                                                  'memory limit are written(Optional). Default: system '
+                                                                  'temporary directory')
+    parser.add_argument('--warp_resampling', type=str, default='near', help='Resampling method of a warp(Optional). '
+                                                                            'Default: near')
+    parser.add_argument('--pixel_format', type=str, default='rgba', choices=['rgba', 'la', 'palette', 'webp'],
+                        help='Pixel format of tiles. See cliptiles.py(Optional). Default: rgba')
+    parser.add_argument('--png_level', type=int, default=6, help='Compression level of png(Optional). Default: 6')
+    parser.add_argument('--cache_memory', type=int, default=256, help='Size of tiles cached in memory in MB'
+                                                                      '(Optional). Default: 256')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory of tiles cached on disk. Tiles of each '
+                                                                    'scene and options are kept in a sub directory and '
+                                                                    'reused by the next run(Optional). Default: None')
+    parser.add_argument('--cache_disk', type=int, default=1024, help='Size of tiles cached on disk in MB(Optional). '
+                                                                     'Default: 1024')
+    parser.add_argument('--stats_cache', type=str, nargs='?', const='', default=None,
+                        help='Cache histograms of the scene in the given directory, or ~/.cache/cliptiles/stats if '
+                             'no directory is given(Optional). Default: None(no cache)')
+    parser.add_argument('--verbose', action='store_true', help='Log requests(Optional).')
+    args = parser.parse_args()
+
+    return args
+
+
+def scene_key(paths, **params):
+    """Make a key of tiles of a scene. Tiles cached on disk are reused while it is the same.
+
+    Args:
+        paths(list(str)): Paths to input files.
+        params(dict): Options changing tiles.
+    Returns:
+        (str): Key of the tiles.
+    """
+    files = []
+    for path in paths:
+        stat = os.stat(path)
+        files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+
+    return hashlib.sha1(json.dumps({'files': files, 'params': params}, sort_keys=True).encode()).hexdigest()
+
+
+def main():
+    args = parse_args()
+
+    for file in args.files:
+        if not os.path.isfile(file):
+            print(f'Input file not exist: {file}')
+            exit()
+    if args.pixel_format in ('la', 'palette') and len(args.files) > 1:
+        print(f'Pixel format {args.pixel_format} is for single-band images.')
+        exit()
+    if not 0 <= args.png_level <= 9:
+        print(f'Compression level of png must be between 0 and 9: {args.png_level}')
+        exit()
+
+    sensor = get_sensor(os.path.basename(args.files[0]))
+    file_io = FileIO(sensor,
+                     block_size=args.block_size,
+                     memory_limit=args.memory_limit * 1024 * 1024,
+                     tmp_dir=args.tmp_dir,
+                     stats_cache=None if args.stats_cache is None else StatsCache(args.stats_cache))
+    # Intermediates of the scratch space are removed when the server stops, e.g., with Ctrl+C.
+    try:
+        file_io.open(path=args.files, epsg=3857)
+
+        # Overviews down to zoom level 0, so that tiles of any zoom level read decimated data.
+        warp_config = WarpConfig(resampling=args.warp_resampling, verbose=False)
+        file_io.build_overviews(Tile(args.tile_size, warp_config=warp_config), 0)
+        file_io.ds.FlushCache()  # Datasets of threads open the normalized image again.
+
+        renderer = TileRenderer(file_io.ds.GetDescription(),
+                                tile_size=args.tile_size,
+                                warp_config=warp_config,
+                                pixel_format=args.pixel_format,
+                                png_level=args.png_level)
+
+        cache_dir = None
+        if args.cache_dir is not None:
+            cache_dir = os.path.join(args.cache_dir, scene_key(args.files,
+                                                               tile_size=args.tile_size,
+                                                               warp_resampling=args.warp_resampling,
+                                                               pixel_format=args.pixel_format,
+                                                               png_level=args.png_level))
+        cache = TileCache(memory_size=args.cache_memory * 1024 * 1024,
+                          cache_dir=cache_dir,
+                          disk_size=args.cache_disk * 1024 * 1024,
+                          ext=renderer.tile_format)
+
+        print('=' * 22, 'Tile Server', '=' * 25)
+        print('File: ', args.files)
+        print('Sensor: ', sensor)
+        print('Tiles: ', f'http://{args.host}:{args.port}/{{z}}/{{x}}/{{y}}.{renderer.tile_format}')
+        print('Cache statistics: ', f'http://{args.host}:{args.port}/stats')
+        print('Cache directory: ', cache_dir)
+        print('=' * 60)
+
+        serve(renderer, cache, host=args.host, port=args.port, verbose=args.verbose)
+    finally:
+        file_io.close()
+
+
+if __name__ == '__main__':
+    main()
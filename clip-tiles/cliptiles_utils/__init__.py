@@ -4,6 +4,17 @@ from .tile import Tile
 from .registry import Registry
 from .normalization_SAR import percentile_sar
 from .normalization_EO import percentile_eo
+from .profiler import Profiler
 from .sensor import Sensors
+from .tile_store import Store
+from .resume import RunState, make_key
+from .scratch import Scratch
+from .stats_cache import StatsCache
+from .tile_cache import TileCache
+from .tile_math import lonlat_to_tile, polygon_tiles, tile_children, tile_parents, tile_to_lonlat, tile_to_mercator
+from .tile_server import TileRenderer, serve
+from .warp import WarpConfig
 
-__all__ = ['FileIO', 'get_sensor', 'Normalization', 'Tile', 'Registry', 'percentile_sar', 'percentile_eo', 'Sensors']
\ No newline at end of file
+__all__ = ['FileIO', 'get_sensor', 'Normalization', 'Tile', 'Registry', 'percentile_sar', 'percentile_eo', 'Sensors', 'Profiler', 'Store', 'RunState', 'make_key', 'Scratch', 'StatsCache', 'WarpConfig',
+           'lonlat_to_tile', 'polygon_tiles', 'tile_children', 'tile_parents', 'tile_to_lonlat', 'tile_to_mercator',
+           'TileCache', 'TileRenderer', 'serve']
\ No newline at end of file
@@ -1,42 +1,86 @@
 # Internal functions
-from shutil import rmtree
+from functools import partial
 import os
+import time
 
 # External functions
 from osgeo import gdal
 import numpy as np
 
 # Project functions
+from .histogram import channel_histograms, float_bin_values
 from .normalization import Normalization
+from .profiler import Profiler
+from .scratch import Scratch
 from .sensor import Sensors
+from .tile_store import Store
+
+# Resampling methods of overviews per resampling method of a warp. Others are built by NEAREST.
+OVERVIEW_RESAMPLING = {'near': 'NEAREST', 'bilinear': 'BILINEAR', 'cubic': 'CUBIC', 'cubicspline': 'CUBICSPLINE',
+                       'lanczos': 'LANCZOS', 'average': 'AVERAGE', 'mode': 'MODE', 'rms': 'RMS'}
 
 
 class FileIO:
-    def __init__(self, sensor):
+    def __init__(self, sensor, block_size=None, memory_limit=1024 * 1024 * 1024, tmp_dir=None, stats_cache=None,
+                 profiler=None):
         """
-        Read a TIFF or HDF5 image and write tile images.
+        Read a TIFF or HDF5(KOMPSAT-5 SBI) image and write tile images.
         If sensor is not given but norm is True, it applies default normalization function
         which might be inappropriate to the given image.
 
         Args:
             sensor(str): Satellite name(Optional). Default: None
             norm(bool): Apply normalization to an image(Optional).  Default: True
+            block_size(int): Width and height of a block for streaming normalization(Optional).
+                             Rows of HDF5 are also read in blocks of this size.
+                             If not given, the whole image is normalized in memory. Default: None
+            memory_limit(int): Maximum bytes of intermediate rasters kept in memory(Optional). Default: 1 GiB
+            tmp_dir(str): Directory where intermediate rasters exceeding memory_limit are written(Optional).
+                          If not given, the system temporary directory is used. Default: None
+            stats_cache(StatsCache): Cache of stretch statistics(Optional).
+                                     If given, statistics of a scene normalized before are reused. Default: None
+            profiler(Profiler): Instrumentation of stages(Optional). If not given, stages are not recorded.
+                                Default: None
         """
         self.ds = None
+        self.paths = []
+        self.epsg = 3857
         self.sensor = sensor
+        self.block_size = block_size
+        self.scratch = Scratch(memory_limit, tmp_dir)
+        self.stats_cache = stats_cache
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
 
     def open(self, path, epsg=None):
         """Open an input file.
 
-        If epsg is given, it transforms input file to the epsg coordinate system.
+        If epsg is given, tiles are cut in the epsg coordinate system.
+        The image is not warped here. It is warped once per zoom level directly onto the tile grid
+        in the system(see Tile.warp_to_grid), so that it is resampled only once.
 
         Args:
             paths(str): Paths to input files.
             epsg(int): EPSG code of a target projected coordinate system(Optional). Default: None
             #norm(bool): Apply normalization to visualize png file(Optional). Default: True
         """
-        os.makedirs('.proc_tile', exist_ok=True)
+        with self.profiler.stage('read') as record:
+            self.read(path)
+            record['bytes_read'] = sum(os.path.getsize(p) for p in self.paths)
+
+        with self.profiler.stage('norm'):
+            self.norm()
+
+        if epsg:
+            self.epsg = epsg
+
+    def read(self, path):
+        """Read input files without normalization. Multi-band files are merged.
+
+        Args:
+            path(list(str)): Paths to input files.
+        """
         fmt = path[0].split('.')[-1]
+        self.paths = list(path)
 
         if fmt == 'tiff' or fmt == 'tif':
             if len(path) == 1:
@@ -44,87 +88,300 @@ class FileIO:
             else:
                 self.ds = self.merge_bands(path)
         elif fmt == 'h5':
-            # Not all hdf5 include metadata in hdf5 file. (KOMPSAT-5, etc.)
-            # Need to read Aux.xml
-            # ds = gdal.Open(path).GetSubDatasets()[2][0]
-            # self.ds = gdal.Open(ds)
-            raise NotImplementedError('HDF5 is not supported yet.')
+            # h5py is required for HDF5 only.
+            from .hdf5 import read_intensity
+            self.ds = read_intensity(path[0], self.scratch, rows=self.block_size or 1024)
         else:
             raise NotImplementedError(f'Not supported file type: {fmt}')
 
-        self.norm()
-
-        if epsg:
-            self.transform_crs(epsg)
-
     def close(self):
         # Error occurred
         # ERROR 6: WriteBlock() not supported for this dataset.
         self.ds = None
-        rmtree('.proc_tile')
+        self.scratch.close()
 
     def norm(self):
         """Generate a normalized image
 
         Normalize band(s) of an image.
         This reduces processing time in case the bands are more than 4.
+        The normalized image is uint8(Byte) whatever the data type of the input image is.
+        If block_size is given, the image is normalized block by block so that
+        peak memory depends on the block size, not on the image size.
+        If stats_cache is given, histograms of bands of the scene are loaded from it, or saved to it per band.
         """
         if self.sensor is None:
             raise NameError(f'Unknown sensor name.')
 
-        img = np.zeros([self.ds.RasterYSize, self.ds.RasterXSize, self.ds.RasterCount], dtype=np.uint16)
-        for idx in range(self.ds.RasterCount):
-            img[..., idx] = self.ds.GetRasterBand(idx+1).ReadAsArray()
-
-        img = Normalization(self.sensor)(img)
-
-        # Create a dataset for a normalized image
-        driver = gdal.GetDriverByName(self.ds.GetDriver().ShortName)
-        base_ds = driver.Create('.proc_tile/norm_ds', self.ds.RasterXSize, self.ds.RasterYSize, self.ds.RasterCount,
-                                self.ds.GetRasterBand(1).DataType)
+        normalization = Normalization(self.sensor)
+
+        # Create a dataset for a normalized image. Merged bands are a VRT, so it is written as GTiff.
+        driver_name = self.ds.GetDriver().ShortName
+        driver = gdal.GetDriverByName('GTiff' if driver_name == 'VRT' else driver_name)
+        # Normalized pixels are 0~255, so warps, grids and tiles downstream read and write 8 bit.
+        data_type = gdal.GDT_Byte
+        # Overviews of low zoom levels are written in the same file(see FileIO.build_overviews).
+        # Halved overviews take less than a third of the image, so they are counted in the scratch memory.
+        path = self.scratch.path('norm_ds', raster_bytes(self.ds, data_type) * 4 // 3)
+        base_ds = driver.Create(path, self.ds.RasterXSize, self.ds.RasterYSize, self.ds.RasterCount, data_type)
         base_ds.SetProjection(self.ds.GetProjection())
         base_ds.SetGeoTransform(self.ds.GetGeoTransform())
+        # 0 is transparent in tiles. Warps and overviews skip it instead of blending it into edges of the image.
+        for idx in range(base_ds.RasterCount):
+            base_ds.GetRasterBand(idx+1).SetNoDataValue(0)
+
+        stats, key, bands = None, None, None
+        if self.stats_cache is not None:
+            if self.is_float():  # E.g., intensity of HDF5 is not a band of the file. Its statistics are kept for FileIO.
+                key = self.stats_cache.make_key(self.paths, band='intensity',
+                                                stats=Sensors.get(self.sensor, {}).get('stats'))
+                stats, _ = self.stats_cache.load(key)
+            else:  # Histograms of bands are shared with other tools. See StatsCache.
+                bands = self.band_sources()
+                hist = self.stats_cache.load_bands(bands)
+                if hist is not None:
+                    stats = normalization.stats(normalization.merge_histograms(hist))
+        cached = stats is not None
+
+        if self.is_float():
+            accumulate = normalization.float_histogram
+        elif bands is not None:
+            accumulate = channel_histograms  # Cached per band whatever the normalization counts.
+        else:
+            accumulate = normalization.histogram
+
+        if self.block_size:
+            if stats is None:
+                with self.profiler.stage('histogram') as record:
+                    hist = self.histogram(accumulate)
+                    stats = self.stats(normalization, hist, bands,
+                                       refine=self.float_bin_values if self.is_float() else None)
+                    record['bytes_read'] = raster_bytes(self.ds)
+            with self.profiler.stage('normalize') as record:
+                self.norm_blocks(normalization, base_ds, stats)
+                record['bytes_read'] = raster_bytes(self.ds)
+                record['bytes_written'] = raster_bytes(base_ds)
+        else:
+            with self.profiler.stage('read_image') as record:
+                img = read_block(self.ds, 0, 0, self.ds.RasterXSize, self.ds.RasterYSize)
+                record['bytes_read'] = img.nbytes
+            if stats is None:
+                with self.profiler.stage('histogram'):
+                    stats = self.stats(normalization, accumulate(img), bands,
+                                       refine=partial(band_values, img) if self.is_float() else None)
+            with self.profiler.stage('normalize') as record:
+                img = normalization(img, stats=stats)
+                for idx in range(base_ds.RasterCount):
+                    base_ds.GetRasterBand(idx+1).WriteArray(img[..., idx])
+                record['bytes_written'] = raster_bytes(base_ds)
+
+        if key is not None and not cached:
+            self.stats_cache.save(key, stats)
+
+        # Release an intermediate of the input image. e.g., merged bands
+        src_path = self.ds.GetDescription()
         self.ds = base_ds
+        self.scratch.remove(src_path)
+
+    def is_float(self):
+        """Check if the image is float. E.g., intensity of HDF5"""
+        return self.ds.GetRasterBand(1).DataType == gdal.GDT_Float32
+
+    def band_sources(self):
+        """Get the scene file and the band of it of each band of the image.
+
+        Bands are identified by their files, so that tools merging files differently share histograms of them.
+
+        Returns:
+            (list(tuple)): Scene file and band index of each band. [(path, band), ...]
+        """
+        if len(self.paths) > 1:  # Band 1 of each file. See merge_bands.
+            return [(path, 1) for path in self.paths]
+
+        return [(self.paths[0], band) for band in range(1, self.ds.RasterCount + 1)]
+
+    def stats(self, normalization, hist, bands=None, refine=None):
+        """Compute stretch statistics from a histogram of the image.
+
+        Args:
+            normalization(Normalization): Normalization of the sensor.
+            hist(ndarray): Histogram from FileIO.histogram.
+            bands(list(tuple)): Bands of a histogram per band, saved to stats_cache(Optional).
+                                See FileIO.band_sources. Default: None
+            refine(callable): Function returning values of a float image in given bins(Optional). Default: None
+        Returns:
+            (tuple): Stretch statistics. See Normalization.stats.
+        """
+        if bands is not None:
+            self.stats_cache.save_bands(bands, hist)
+            hist = normalization.merge_histograms(hist)
+
+        return normalization.stats(hist, refine=refine)
+
+    def histogram(self, accumulate):
+        """Accumulate a histogram of the image block by block.
+
+        Args:
+            accumulate(callable): Function accumulating a block into a histogram.
+                                  E.g., Normalization.histogram, channel_histograms or float_histogram
+        Returns:
+            hist(ndarray): Pixel counts of the image. shape: (65536,) or (band, 65536)
+        """
+        hist = None
+        for xoff, yoff, xsize, ysize in iter_blocks(self.ds, self.block_size):
+            hist = accumulate(read_block(self.ds, xoff, yoff, xsize, ysize), hist)
 
-        for idx in range(self.ds.RasterCount):
-            self.ds.GetRasterBand(idx+1).WriteArray(img[..., idx])
+        return hist
 
-    def transform_crs(self, epsg):
-        """Transform a coordinate reference system to a given epsg sysytem.
+    def float_bin_values(self, bins, band=None):
+        """Gather values of a float image in the given bins of float_histogram block by block.
 
         Args:
-            epsg(int): EPSG code of a target projected coordinate system.
+            bins(ndarray): Bin indexes.
+            band(int): Index of a band(Optional). If not given, values of all bands are gathered. Default: None
+        Returns:
+            (ndarray): Values in the bins. shape: (n,)
         """
-        self.ds = gdal.Warp('', self.ds, dstSRS=f'EPSG:{epsg}', format='VRT',
-                            outputType=gdal.GDT_UInt16)  # Reprojected dataset
+        values = [band_values(read_block(self.ds, xoff, yoff, xsize, ysize), bins, band)
+                  for xoff, yoff, xsize, ysize in iter_blocks(self.ds, self.block_size)]
+
+        return np.concatenate(values)
 
-    def write(self, tile, output_dir, zoom_min, zoom_max):
+    def norm_blocks(self, normalization, norm_ds, stats):
+        """Normalize an image block by block.
+
+        Each block is stretched with the statistics of the whole image and written on the normalized dataset.
+        Blocks are read with a 1 pixel halo so that the 3x3 median filter of SAR
+        gives the same result as filtering the whole image.
+
+        Args:
+            normalization(Normalization): Normalization of the sensor.
+            norm_ds(gdal.Dataset): Dataset to write the normalized image.
+            stats(tuple): Stretch statistics of the whole image. See FileIO.histogram and Normalization.stats.
+        """
+        halo = 1
+        for xoff, yoff, xsize, ysize in iter_blocks(self.ds, self.block_size):
+            x0 = max(xoff - halo, 0)
+            y0 = max(yoff - halo, 0)
+            x1 = min(xoff + xsize + halo, self.ds.RasterXSize)
+            y1 = min(yoff + ysize + halo, self.ds.RasterYSize)
+
+            img = normalization(read_block(self.ds, x0, y0, x1 - x0, y1 - y0), stats=stats)
+            img = img[yoff-y0:yoff-y0+ysize, xoff-x0:xoff-x0+xsize]
+            for idx in range(norm_ds.RasterCount):
+                norm_ds.GetRasterBand(idx+1).WriteArray(img[..., idx], xoff, yoff)
+
+    def write(self, tile, output_dir, zoom_min, zoom_max, pyramid=False, resampling='average', fmt='xyz',
+              dedup=False, state=None):
         """Write tile images to the given path
 
+        If pyramid is True, only tiles of the maximum zoom level are generated from the image.
+        Tiles of lower zoom levels are built by 2x2 downsampling of the tiles of the level above.
+        Otherwise, overviews of the image are built once so that low zoom levels are warped from them.
+        If state is given, zoom levels and tile columns complete in a previous run are skipped.
+
         Args:
             tile(Tile): Tile class.
             output_dir(str): Path to an output directory.
             zoom_min(int): Minimum zoom level.
             zoom_max(int): Maximum zoom level.
+            pyramid(bool): Build lower zoom levels from the maximum zoom level(Optional). Default: False
+            resampling(str): Downsampling method of pyramid. 'average' or 'mode'(Optional). Default: 'average'
+            fmt(str): Output format. 'xyz'([Zoom level]/[X]/[Y].png files) or 'mbtiles'(Optional). Default: 'xyz'
+            dedup(bool): Store identical tiles once. Hard links in xyz, shared images in mbtiles(Optional).
+                         Default: False
+            state(RunState): Progress of a resumable run(Optional). Default: None
+        Returns:
+            report(dict): Report of the run. E.g., deduplication statistics of the store.
         """
         if not isinstance(self.ds, gdal.Dataset):
             print('Open an input image first.')
             exit()
 
-        for zoom in range(zoom_min, zoom_max+1):
-            path_z = os.path.join(output_dir, str(zoom))
-            os.makedirs(path_z, exist_ok=True)
-            tile.write_tiles(ds=self.ds,
-                             zoom_level=zoom,
-                             output_dir=path_z)
+        store = Store.get(fmt)(output_dir, dedup=dedup, resume=state is not None and state.resumed,
+                               tile_format=tile.tile_format)
+
+        zoom_levels = [zoom_max] if pyramid else range(zoom_min, zoom_max+1)
+        with self.profiler.stage('overviews'):
+            self.build_overviews(tile, zoom_levels[0])
+        for zoom in zoom_levels:
+            if state is not None and state.is_done(zoom):
+                continue
+            with self.profiler.stage('write_tiles', zoom=zoom):
+                tile.write_tiles(ds=self.ds,
+                                 zoom_level=zoom,
+                                 store=store,
+                                 scratch=self.scratch,
+                                 epsg=self.epsg,
+                                 state=state)
+            if state is not None:
+                state.mark_done(zoom)
+
+        if pyramid:
+            for zoom in range(zoom_max-1, zoom_min-1, -1):
+                if state is not None and state.is_done(zoom):
+                    continue
+                with self.profiler.stage('downsample', zoom=zoom) as record:
+                    bytes_written = tile.counters['bytes_written']
+                    tile.downsample_tiles(store=store,
+                                          zoom_level=zoom,
+                                          resampling=resampling)
+                    record['bytes_written'] = tile.counters['bytes_written'] - bytes_written
+                if state is not None:
+                    state.mark_done(zoom)
+
+        tiles = store.tiles(zoom_max)
+        if tiles:
+            store.set_metadata(bounds=','.join(str(v) for v in tile.get_bounds(tiles, zoom_max)))
+        report = {'format': fmt, 'dedup': store.stats()}
+        with self.profiler.stage('close_store'):
+            store.close()
+
+        return report
+
+    def build_overviews(self, tile, zoom_level):
+        """Build overviews of the image for warps of low zoom levels.
+
+        Overviews are halved until the one coarser than the resolution of the zoom level.
+        A warp reads the overview whose resolution is the closest to the one of the output(GDAL default),
+        so a low zoom level reads decimated data instead of the whole image. Existing overviews are reused.
+        Overviews are internal to the normalized image, so they are in memory or spill on disk with it.
+        0 is nodata of the normalized image(see FileIO.norm), so empty pixels around the image are not averaged
+        into overviews.
+
+        Args:
+            tile(Tile): Tile class.
+            zoom_level(int): Lowest zoom level to warp.
+        """
+        if self.ds.GetRasterBand(1).GetOverviewCount() > 0:
+            return
+
+        # Width of the image in pixels of the zoom level.
+        lon_min, _, lon_max, _ = tile.get_footprint(self.ds)
+        width = (lon_max - lon_min) / 360 * 2 ** zoom_level * tile.tile_size
+
+        factors = []
+        factor = 2
+        while self.ds.RasterXSize / factor >= width and min(self.ds.RasterXSize, self.ds.RasterYSize) >= factor:
+            factors.append(factor)
+            factor *= 2
+        if not factors:
+            return
+
+        start = time.perf_counter()
+        self.ds.BuildOverviews(OVERVIEW_RESAMPLING.get(tile.warp_config.resampling, 'NEAREST'), factors)
+        if tile.warp_config.verbose:
+            print(f'Overviews {factors}: {time.perf_counter() - start:.2f} s')
 
     def merge_bands(self, paths):
         """Merge bands into one image.
 
+        Bands are stacked in a VRT referencing the images, so pixels are not copied.
+
         Args:
             paths(list(str)): Paths to images. Images must be in order of red, green, blue. shape: (3,)
         Returns:
-            ds_merged(gdal.Dataset): Merged image dataset.
+            ds_merged(gdal.Dataset): Merged image dataset. Bands are in order of red, green, blue.
         """
         if len(paths) != 3:
             print(f'Too less bands are given: {len(paths)}')
@@ -149,15 +406,8 @@ class FileIO:
             print('Error: Size of input images are not the same.')
             exit()
 
-        driver = ds_red.GetDriver()
-        data_type = ds_red.GetRasterBand(1).DataType
-        ds_merged = driver.Create('.proc_tile/merged_bands', ds_red.RasterXSize, ds_red.RasterYSize, 3, data_type)
-        ds_merged.SetProjection(ds_red.GetProjection())
-        ds_merged.SetGeoTransform(ds_red.GetGeoTransform())
-
-        for ind, ds in enumerate([ds_blue, ds_green, ds_red]):
-            buffer = ds.GetRasterBand(1).ReadAsArray(buf_type=data_type)
-            ds_merged.GetRasterBand(ind+1).WriteArray(buffer)
+        path = self.scratch.path('merged_bands.vrt', 0)
+        ds_merged = gdal.BuildVRT(path, [os.path.abspath(p) for p in paths], separate=True)
 
         return ds_merged
 
@@ -174,3 +424,91 @@ def get_sensor(name):
     for sensor in Sensors.keys():
         if sensor in splits:
             return sensor
+
+
+def raster_bytes(ds, data_type=None):
+    """Get size of a raster in bytes.
+
+    Args:
+        ds(gdal.Dataset): Gdal dataset.
+        data_type(int): Gdal data type. If not given, the one of the dataset is used(Optional). Default: None
+    Returns:
+        (int): Bytes of all bands.
+    """
+    if data_type is None:
+        data_type = ds.GetRasterBand(1).DataType
+
+    return ds.RasterXSize * ds.RasterYSize * ds.RasterCount * gdal.GetDataTypeSize(data_type) // 8
+
+
+def iter_blocks(ds, block_size):
+    """Iterate windows of blocks covering a dataset.
+
+    Args:
+        ds(gdal.Dataset): Gdal dataset.
+        block_size(int): Width and height of a block.
+    Yields:
+        (tuple(int)): x offset, y offset, x size, y size of a block.
+    """
+    for yoff in range(0, ds.RasterYSize, block_size):
+        ysize = min(block_size, ds.RasterYSize - yoff)
+        for xoff in range(0, ds.RasterXSize, block_size):
+            xsize = min(block_size, ds.RasterXSize - xoff)
+            yield xoff, yoff, xsize, ysize
+
+
+def band_values(img, bins, band=None):
+    """Get values of a float image, or of a band of it, counted in the given bins of float_histogram.
+
+    Args:
+        img(ndarray): Float image array. shape: (height, width, band)
+        bins(ndarray): Bin indexes.
+        band(int): Index of a band(Optional). If not given, values of all bands are got. Default: None
+    Returns:
+        (ndarray): Values in the bins. shape: (n,)
+    """
+    return float_bin_values(img if band is None else img[..., band], bins)
+
+
+def read_block(ds, xoff, yoff, xsize, ysize):
+    """Read a block of all bands into a uint16 array, or a float32 array for a float image.
+
+    Args:
+        ds(gdal.Dataset): Gdal dataset.
+        xoff(int): X offset of a block.
+        yoff(int): Y offset of a block.
+        xsize(int): Width of a block.
+        ysize(int): Height of a block.
+    Returns:
+        img(ndarray): Image array. shape: (ysize, xsize, band)
+    """
+    dtype = np.float32 if ds.GetRasterBand(1).DataType == gdal.GDT_Float32 else np.uint16
+    img = np.empty([ysize, xsize, ds.RasterCount], dtype=dtype)
+    read_bands(ds, xoff, yoff, img)
+
+    return img
+
+
+def read_bands(ds, xoff, yoff, img, bands=None):
+    """Read a window of bands straight into a band-interleaved(pixel-interleaved) array.
+
+    All bands are read by one request of the dataset, converted to the data type of the array.
+
+    Args:
+        ds(gdal.Dataset): Gdal dataset.
+        xoff(int): X offset of a window.
+        yoff(int): Y offset of a window.
+        img(ndarray): Array to read into. It can be a view. shape: (ysize, xsize, band)
+        bands(list(int)): Bands to read(Optional). If not given, all bands are read. Default: None
+    """
+    ysize, xsize = img.shape[:2]
+    if bands is None or list(bands) == list(range(1, ds.RasterCount + 1)):
+        if ds.RasterCount == 1:
+            ds.GetRasterBand(1).ReadAsArray(xoff, yoff, xsize, ysize, buf_obj=img[..., 0])
+        else:
+            # A view in band order. GDAL writes pixels with the strides of the array.
+            ds.ReadAsArray(xoff, yoff, xsize, ysize, buf_obj=np.moveaxis(img, -1, 0))
+        return
+
+    for idx, band in enumerate(bands):
+        ds.GetRasterBand(band).ReadAsArray(xoff, yoff, xsize, ysize, buf_obj=img[..., idx])
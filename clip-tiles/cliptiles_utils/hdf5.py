@@ -0,0 +1,120 @@
+# Internal functions
+import glob
+import os
+import re
+import xml.etree.ElementTree as ET
+
+# External functions
+from osgeo import gdal, osr
+import h5py
+import numpy as np
+
+# Corner coordinates of an image and their positions in fractions of the width and height.
+CORNERS = {'topleftgeodeticcoordinates': (0, 0),
+           'toprightgeodeticcoordinates': (1, 0),
+           'bottomleftgeodeticcoordinates': (0, 1),
+           'bottomrightgeodeticcoordinates': (1, 1)}
+
+
+def read_intensity(path, scratch, rows=1024, dataset='S01/SBI'):
+    """Read intensity of a KOMPSAT-5 SBI(complex) product into a float32 raster.
+
+    The complex image is read in blocks of rows aligned to HDF5 chunks,
+    and intensity(I^2 + Q^2) of each block is written on an intermediate raster,
+    so that peak memory depends on the number of rows, not on the image size.
+
+    Args:
+        path(str): Path to a HDF5 file.
+        scratch(Scratch): Scratch space of the intermediate raster.
+        rows(int): Number of rows of a block. It is rounded down to a multiple of chunk rows(Optional). Default: 1024
+        dataset(str): Name of the complex dataset(Optional). Default: 'S01/SBI'
+    Returns:
+        ds(gdal.Dataset): Intensity image dataset. Georeference is taken from corner coordinates.
+    """
+    with h5py.File(path, 'r') as hf:
+        sbi = hf[dataset]
+        height, width = sbi.shape[:2]
+        if sbi.chunks:
+            rows = max(rows // sbi.chunks[0], 1) * sbi.chunks[0]
+        corners = get_corners(path, hf, sbi)
+
+        driver = gdal.GetDriverByName('GTiff')
+        ds = driver.Create(scratch.path('intensity', width * height * 4), width, height, 1, gdal.GDT_Float32,
+                           options=['TILED=YES'])
+        band = ds.GetRasterBand(1)
+        for yoff in range(0, height, rows):
+            block = sbi[yoff:yoff+rows]
+            i = block[..., 0].astype(np.float32)
+            q = block[..., 1].astype(np.float32)
+            band.WriteArray(np.square(i) + np.square(q), 0, yoff)
+
+    set_georeference(ds, corners)
+
+    return ds
+
+
+def get_corners(path, hf, sbi):
+    """Get corner coordinates of a HDF5 product.
+
+    Attributes of the image, its group and the file are searched first.
+    Not all HDF5 include them(KOMPSAT-5, etc.), so Aux.xml next to the file is searched next.
+
+    Args:
+        path(str): Path to a HDF5 file.
+        hf(h5py.File): HDF5 file.
+        sbi(h5py.Dataset): Image dataset.
+    Returns:
+        corners(dict): Latitude and longitude per corner position. {(x, y): (lat, lon)}
+    """
+    corners = {}
+    for node in [sbi, sbi.parent, hf]:
+        for name, value in node.attrs.items():
+            position = CORNERS.get(_simplify(name))
+            if position is not None and position not in corners:
+                corners[position] = tuple(float(v) for v in np.ravel(value)[:2])
+    if len(corners) == len(CORNERS):
+        return corners
+
+    for aux_path in get_aux_paths(path):
+        for elm in ET.parse(aux_path).getroot().iter():
+            position = CORNERS.get(_simplify(elm.tag))
+            if position is not None and position not in corners and elm.text:
+                corners[position] = tuple(float(v) for v in elm.text.replace(',', ' ').split()[:2])
+        if len(corners) == len(CORNERS):
+            return corners
+
+    raise FileNotFoundError(f'Corner coordinates are not found in the HDF5 file or its Aux.xml: {path}')
+
+
+def get_aux_paths(path):
+    """Get paths to Aux.xml files of a product. E.g., K5_[...]_L1A.h5 -> K5_[...]_Aux.xml"""
+    stem = os.path.splitext(path)[0]
+    candidates = [stem + '_Aux.xml', stem.rsplit('_', 1)[0] + '_Aux.xml', path + '.aux.xml']
+    candidates += sorted(glob.glob(glob.escape(stem.rsplit('_', 1)[0]) + '*Aux.xml'))
+
+    return [candidate for candidate in dict.fromkeys(candidates) if os.path.isfile(candidate)]
+
+
+def set_georeference(ds, corners):
+    """Set georeference of a dataset from corner coordinates.
+
+    An image of SBI is in the radar geometry, so the geo-transform is an affine transform(with rotation)
+    fitted to the corners by least squares.
+
+    Args:
+        ds(gdal.Dataset): Gdal dataset.
+        corners(dict): Latitude and longitude per corner position. {(x, y): (lat, lon)}
+    """
+    gcps = []
+    for (x, y), (lat, lon) in corners.items():
+        # Corner coordinates are the ones of the centers of corner pixels.
+        gcps.append(gdal.GCP(lon, lat, 0, 0.5 + x * (ds.RasterXSize - 1), 0.5 + y * (ds.RasterYSize - 1)))
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    ds.SetProjection(srs.ExportToWkt())
+    ds.SetGeoTransform(gdal.GCPsToGeoTransform(gcps))
+
+
+def _simplify(name):
+    return re.sub('[^a-z]', '', name.split('}')[-1].lower())
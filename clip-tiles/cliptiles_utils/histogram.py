@@ -0,0 +1,204 @@
+# External functions
+import numpy as np
+
+# Number of bins of a uint16 histogram.
+NUM_BINS = 65536
+
+
+def band_histogram(img, hist=None):
+    """Accumulate a histogram of a uint16 image.
+
+    Args:
+        img(ndarray): uint16 image array. Any shape.
+        hist(ndarray): Histogram to accumulate into(Optional). shape: (65536,)
+    Returns:
+        hist(ndarray): Pixel counts per value. shape: (65536,)
+    """
+    counts = np.bincount(img.ravel(), minlength=NUM_BINS)
+    if hist is None:
+        return counts
+
+    hist += counts
+    return hist
+
+
+def channel_histograms(img, hist=None):
+    """Accumulate a histogram per channel of a uint16 image.
+
+    Args:
+        img(ndarray): uint16 image array. shape: (height, width, channels)
+        hist(ndarray): Histograms to accumulate into(Optional). shape: (channels, 65536)
+    Returns:
+        hist(ndarray): Pixel counts per value of each channel. shape: (channels, 65536)
+    """
+    counts = np.stack([np.bincount(img[..., idx].ravel(), minlength=NUM_BINS) for idx in range(img.shape[-1])])
+    if hist is None:
+        return counts
+
+    hist += counts
+    return hist
+
+
+def histogram_percentile(hist, q):
+    """Get percentiles from a histogram.
+
+    It gives the same result as np.percentile(linear interpolation) on the pixels
+    counted in the histogram, without sorting them.
+
+    Args:
+        hist(ndarray): Pixel counts per value. shape: (65536,)
+        q(list(float)): Percentiles in range of [0, 100].
+    Returns:
+        (ndarray): Values of the percentiles. shape: (len(q),)
+    """
+    cumsum = np.cumsum(hist)
+    total = cumsum[-1]
+    if total == 0:
+        return np.full(len(q), np.nan)
+
+    index = np.asarray(q, dtype=np.float64) / 100 * (total - 1)
+    index_lo = np.floor(index)
+    index_hi = np.minimum(index_lo + 1, total - 1)
+
+    # Value at the k-th position of the sorted pixels is the first bin whose cumulative count exceeds k.
+    value_lo = np.searchsorted(cumsum, index_lo, side='right').astype(np.float64)
+    value_hi = np.searchsorted(cumsum, index_hi, side='right').astype(np.float64)
+
+    return value_lo + (index - index_lo) * (value_hi - value_lo)
+
+
+def histogram_minmax(hist):
+    """Get minimum and maximum values counted in a histogram.
+
+    Args:
+        hist(ndarray): Pixel counts per value. shape: (65536,)
+    Returns:
+        (tuple(int)): Minimum value, maximum value.
+    """
+    values = np.flatnonzero(hist)
+
+    return int(values[0]), int(values[-1])
+
+
+def float_histogram(img, hist=None):
+    """Accumulate a histogram of a non-negative float image by the upper 16 bits of float32 values.
+
+    Bit patterns of non-negative float32 values are in the same order as the values,
+    so bins are in order of values. NaN and negative values are not counted.
+
+    Args:
+        img(ndarray): Float image array. Any shape.
+        hist(ndarray): Histogram to accumulate into(Optional). shape: (65536,)
+    Returns:
+        hist(ndarray): Pixel counts per bin. shape: (65536,)
+    """
+    _, bins = _float_bins(img)
+    counts = np.bincount(bins, minlength=NUM_BINS)
+    if hist is None:
+        return counts
+
+    hist += counts
+    return hist
+
+
+def channel_float_histograms(img, hist=None):
+    """Accumulate a histogram of float_histogram per channel of a float image.
+
+    Args:
+        img(ndarray): Float image array. shape: (height, width, channels)
+        hist(ndarray): Histograms to accumulate into(Optional). shape: (channels, 65536)
+    Returns:
+        hist(ndarray): Pixel counts per bin of each channel. shape: (channels, 65536)
+    """
+    counts = np.stack([float_histogram(img[..., idx]) for idx in range(img.shape[-1])])
+    if hist is None:
+        return counts
+
+    hist += counts
+    return hist
+
+
+def float_bin_values(img, bins):
+    """Get values of a float image counted in the given bins of float_histogram.
+
+    Args:
+        img(ndarray): Float image array. Any shape.
+        bins(ndarray): Bin indexes.
+    Returns:
+        (ndarray): float32 values in the bins. shape: (n,)
+    """
+    values, value_bins = _float_bins(img)
+
+    return values[np.isin(value_bins, bins)]
+
+
+def float_histogram_percentile(hist, q, refine):
+    """Get exact percentiles from a histogram of float_histogram.
+
+    Bins holding the percentiles are found from the histogram, and only the values in the bins
+    are gathered by refine and sorted. It gives the same result as np.nanpercentile(linear interpolation).
+
+    Args:
+        hist(ndarray): Pixel counts per bin from float_histogram. shape: (65536,)
+        q(list(float)): Percentiles in range of [0, 100].
+        refine(callable): Function returning all values counted in given bins. See float_bin_values.
+    Returns:
+        (ndarray): Values of the percentiles. shape: (len(q),)
+    """
+    cumsum = np.cumsum(hist)
+    total = cumsum[-1]
+    if total == 0:
+        return np.full(len(q), np.nan)
+
+    index = np.asarray(q, dtype=np.float64) / 100 * (total - 1)
+    index_lo = np.floor(index).astype(np.int64)
+    index_hi = np.minimum(index_lo + 1, total - 1)
+
+    ranks = np.concatenate([index_lo, index_hi])
+    bins = np.searchsorted(cumsum, ranks, side='right')
+    selected = np.unique(bins)
+    values = np.sort(refine(selected)).astype(np.float64)
+
+    # Values of the selected bins are concatenated in order of bins.
+    offsets = np.cumsum(hist[selected]) - hist[selected]
+    positions = offsets[np.searchsorted(selected, bins)] + ranks - (cumsum[bins] - hist[bins])
+    value_lo, value_hi = np.split(values[positions], 2)
+
+    return value_lo + (index - index_lo) * (value_hi - value_lo)
+
+
+def is_lut_type(img):
+    """Check if an image can be counted in a uint16 histogram and mapped by a 65536-entry lookup table.
+
+    Args:
+        img(ndarray): Image array.
+    Returns:
+        (bool): True if the image is uint8 or uint16.
+    """
+    return img.dtype in (np.uint8, np.uint16)
+
+
+def apply_lut(img, lut):
+    """Map pixels of a uint8 or uint16 image through a lookup table.
+
+    Args:
+        img(ndarray): uint8 or uint16 image array. shape: (height, width, channels)
+        lut(ndarray): Lookup table, or a lookup table per channel. shape: (65536,) or (channels, 65536)
+    Returns:
+        (ndarray): Mapped image array. Its data type is the one of the lookup table.
+    """
+    if lut.ndim == 1:
+        return np.take(lut, img)
+
+    img_lut = np.empty(img.shape, dtype=lut.dtype)
+    for idx in range(img.shape[-1]):
+        img_lut[..., idx] = np.take(lut[idx], img[..., idx])
+
+    return img_lut
+
+
+def _float_bins(img):
+    values = np.asarray(img, dtype=np.float32)
+    values = values[values >= 0]
+
+    return values, values.view(np.uint32) >> 16
@@ -0,0 +1,50 @@
+# Internal functions
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+# External functions
+import numpy as np
+
+# Compare-exchange pairs of a sorting network giving the median of 9 values at index 4.
+# Source: N. Devillard, "Fast median search: an ANSI C implementation", opt_med9
+MED9_NETWORK = [(1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8),
+                (0, 3), (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2)]
+
+
+def median3x3(img, workers=None, stripe=256):
+    """3x3 median filter of a uint8 image.
+
+    It gives the same result as scipy.signal.medfilt2d(img, kernel_size=3), including the zero-padded border.
+    The image is processed in stripes of rows with a 1 pixel halo by a pool of threads,
+    and each stripe is filtered by a sorting network of 9 shifted views.
+
+    Args:
+        img(ndarray): uint8 image array. shape: (height, width)
+        workers(int): Number of threads(Optional). If not given, the number of CPUs is used. Default: None
+        stripe(int): Number of rows of a stripe(Optional). Default: 256
+    Returns:
+        img_med(ndarray): Filtered uint8 image array. shape: (height, width)
+    """
+    if img.dtype != np.uint8 or img.ndim != 2:
+        raise TypeError(f'Only 2D uint8 image is supported. Given: {img.ndim}D {img.dtype}')
+
+    height, width = img.shape
+    img_med = np.empty_like(img)
+    workers = workers or os.cpu_count() or 1
+
+    def _filter(y0):
+        y1 = min(y0 + stripe, height)
+        padded = np.zeros([y1 - y0 + 2, width + 2], dtype=np.uint8)
+        top = max(y0 - 1, 0)
+        bottom = min(y1 + 1, height)
+        padded[top-y0+1:bottom-y0+1, 1:-1] = img[top:bottom]
+
+        p = [padded[dy:dy+y1-y0, dx:dx+width] for dy in range(3) for dx in range(3)]
+        for a, b in MED9_NETWORK:
+            p[a], p[b] = np.minimum(p[a], p[b]), np.maximum(p[a], p[b])
+        img_med[y0:y1] = p[4]
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(_filter, range(0, height, stripe)))
+
+    return img_med
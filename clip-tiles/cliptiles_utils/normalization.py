@@ -1,3 +1,8 @@
+# External functions
+import numpy as np
+
+# Project functions
+from .histogram import band_histogram, channel_float_histograms, channel_histograms, float_histogram, is_lut_type
 from .registry import Norm
 from .sensor import Sensors
 
@@ -13,10 +18,108 @@ class Normalization:
         """
         self.sensor = sensor
 
-    def __call__(self, img):
+    def __call__(self, img, stats=None):
+        """Normalize an image.
+
+        For uint8 and uint16 images, stretch statistics are computed from a histogram without sorting pixels,
+        and the image is stretched through a lookup table.
+
+        Args:
+            img(ndarray): Image array. shape: (height, width, channel)
+            stats(tuple): Stretch statistics from Normalization.stats(Optional).
+                          If given, img can be a block of the image the statistics are computed from. Default: None
+        Returns:
+            (ndarray): Normalized uint8 image array.
+        """
+        norm_func = self._get_func('norm')
+        if stats is None and is_lut_type(img):
+            stats = self.stats(self.histogram(img))
+        if stats is None:
+            return to_uint8(Norm.get(norm_func)(img))
+
+        return to_uint8(Norm.get(norm_func)(img, stats=stats))
+
+    @property
+    def per_band(self):
+        """Bands of EO are stretched with their own statistics. Channels of the others share them."""
+        return Sensors.get(self.sensor, {}).get('type') == 'EO'
+
+    def histogram(self, img, hist=None):
+        """Accumulate a histogram of a uint8 or uint16 image for Normalization.stats.
+
+        Args:
+            img(ndarray): Image array. shape: (height, width, channel)
+            hist(ndarray): Histogram to accumulate into(Optional). Default: None
+        Returns:
+            hist(ndarray): Pixel counts. shape: (channel, 65536) if per_band, otherwise (65536,)
+        """
+        if self.per_band:
+            return channel_histograms(img, hist)
+
+        return band_histogram(img, hist)
+
+    def float_histogram(self, img, hist=None):
+        """Accumulate a histogram of float_histogram of a float image for Normalization.stats.
+
+        Args:
+            img(ndarray): Float image array. shape: (height, width, channel)
+            hist(ndarray): Histogram to accumulate into(Optional). Default: None
+        Returns:
+            hist(ndarray): Pixel counts per bin. shape: (channel, 65536) if per_band, otherwise (65536,)
+        """
+        if self.per_band:
+            return channel_float_histograms(img, hist)
+
+        return float_histogram(img, hist)
+
+    def merge_histograms(self, hist):
+        """Merge histograms of bands into the one of Normalization.histogram.
+
+        Args:
+            hist(ndarray): Pixel counts of each band. shape: (channel, 65536)
+        Returns:
+            hist(ndarray): Pixel counts. shape: (channel, 65536) if per_band, otherwise (65536,)
+        """
+        if self.per_band:
+            return hist
+
+        return hist.sum(axis=0)
+
+    def stats(self, hist, refine=None):
+        """Compute stretch statistics of the sensor from a histogram.
+
+        Args:
+            hist(ndarray): Pixel counts from Normalization.histogram or Normalization.float_histogram.
+                           shape: (65536,) or (channel, 65536)
+            refine(callable): Function returning values of a float image in given bins(Optional).
+                              It must be given for a histogram of Normalization.float_histogram.
+                              Values of a band are returned by refine(bins, band) for a histogram per band.
+                              Default: None
+        Returns:
+            (tuple): Stretch statistics.
+        """
+        stats_func = Norm.get(self._get_func('stats'))
+        if refine is None:
+            return stats_func(hist)
+
+        return stats_func(hist, refine=refine)
+
+    def _get_func(self, key):
         try:
-            norm_func = Sensors[self.sensor]['norm']
+            return Sensors[self.sensor][key]
         except KeyError:
             raise NotImplementedError(f'Normalization for this sensor is not supported yet: {self.sensor}')
 
-        return Norm.get(norm_func)(img)
+
+def to_uint8(img):
+    """Round and clip a normalized image to uint8, as a lookup table of a normalization does.
+
+    Args:
+        img(ndarray): Normalized image array. Value range is [0, 255] except stretched outliers.
+    Returns:
+        (ndarray): uint8 image array. img itself if it is uint8.
+    """
+    if img.dtype == np.uint8:
+        return img
+
+    return np.uint8(np.clip(np.round(img), 0, 255))
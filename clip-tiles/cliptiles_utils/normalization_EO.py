@@ -1,24 +1,91 @@
+# Internal functions
+from functools import partial
+
 # External functions
 import numpy as np
 
 # Project functions
+from .histogram import NUM_BINS, apply_lut, float_histogram_percentile, histogram_percentile, is_lut_type
 from .registry import Norm
 
 
 @Norm.register_module()
-def percentile_eo(img, pmin=0.1, pmax=99.9):
+def percentile_eo(img, pmin=0.1, pmax=99.9, stats=None):
     """Stretch image
 
     Args:
-        img(ndarray): Image array. shape: (height, width)
+        img(ndarray): Image array. shape: (height, width, channel)
         pmin(float): Minimum percentile value. Default: 0.1%
         pmax(float): Maximum percentile value. Default: 99.9%
+        stats(tuple): Stretch statistics from percentile_eo_stats(Optional). The ones of all bands or per band.
+                      If given, pmin and pmax are ignored and the image is stretched with them.
+                      uint8 and uint16 images are stretched through a lookup table. Default: None
     Returns:
         img_norm(ndarray): Normalised image array. Value range is [0, 255].
+                           uint8 if stretched through a lookup table, otherwise float.
     """
-    buffer = img[img != 0]
-    stretch_min = np.nanpercentile(buffer, pmin)
-    stretch_max = np.nanpercentile(buffer, pmax)
+    if stats is None:
+        buffer = img[img != 0]
+        stretch_min = np.nanpercentile(buffer, pmin)
+        stretch_max = np.nanpercentile(buffer, pmax)
+        stats = (stretch_min, stretch_max)
+    elif is_lut_type(img):
+        # Stretch all possible values once and look them up.
+        lut = stretch_eo(np.arange(NUM_BINS, dtype=np.uint16), stats)
+        lut = np.uint8(np.round(np.clip(lut, 0, 255)))  # shape: (65536,) or (channel, 65536) per band
+        return apply_lut(img, lut)
 
-    img_norm = (img - stretch_min) / (stretch_max - stretch_min) * 255
+    img_norm = stretch_eo(img, stats)
     return img_norm
+
+
+def stretch_eo(img, stats):
+    """Stretch an image with statistics of percentile_eo_stats.
+
+    If stats are per band, a 1D image(values of a lookup table) is stretched per band to shape (channel, n),
+    and the others are stretched per last axis(channel).
+
+    Args:
+        img(ndarray): Image array.
+        stats(tuple): Minimum stretch value, maximum stretch value. Or the ones per band. shape: (2,) or (channel, 2)
+    Returns:
+        (ndarray): Stretched float array. Values out of the statistics are out of [0, 255].
+    """
+    stats = np.asarray(stats, dtype=np.float64)
+    stretch_min, stretch_max = stats[..., 0], stats[..., 1]
+    if stats.ndim == 2 and img.ndim == 1:
+        img = img[None, :]
+        stretch_min, stretch_max = stretch_min[:, None], stretch_max[:, None]
+
+    return (img - stretch_min) / (stretch_max - stretch_min) * 255
+
+
+@Norm.register_module()
+def percentile_eo_stats(hist, pmin=0.1, pmax=99.9, refine=None):
+    """Get stretch statistics of percentile_eo from a histogram.
+
+    Args:
+        hist(ndarray): Pixel counts of a uint16 image, or of each band. shape: (65536,) or (channel, 65536)
+                       Or the ones of a float image from float_histogram or channel_float_histograms.
+        pmin(float): Minimum percentile value. Default: 0.1%
+        pmax(float): Maximum percentile value. Default: 99.9%
+        refine(callable): Function returning values of a float image in given bins(Optional).
+                          It must be given for a histogram of a float image.
+                          Values of a band are returned by refine(bins, band) for histograms of bands. Default: None
+    Returns:
+        (tuple(float)): Minimum stretch value, maximum stretch value. A tuple of them per band for histograms of bands.
+    """
+    if hist.ndim == 2:
+        return tuple(percentile_eo_stats(band_hist, pmin, pmax,
+                                         refine=None if refine is None else partial(refine, band=band))
+                     for band, band_hist in enumerate(hist))
+
+    hist = hist.copy()
+    hist[0] = 0  # Zero is no data. The first bin of a float image holds zero and denormal values next to it.
+    if refine is not None:
+        stretch_min, stretch_max = float_histogram_percentile(hist, [pmin, pmax], refine)
+        return float(stretch_min), float(stretch_max)
+
+    stretch_min, stretch_max = histogram_percentile(hist, [pmin, pmax])
+
+    return stretch_min, stretch_max
@@ -1,13 +1,15 @@
 # External functions
-from scipy import signal
 import numpy as np
 
 # Project functions
+from .histogram import NUM_BINS, apply_lut, float_histogram_percentile, histogram_minmax, histogram_percentile, \
+    is_lut_type
+from .median import median3x3
 from .registry import Norm
 
 
 @Norm.register_module()
-def percentile_sar(img, pmin=2, pmax=98):
+def percentile_sar(img, pmin=2, pmax=98, stats=None):
     """Convert image to 8bit file.
 
     Convert image to 8bit file and visualize it for labeling.
@@ -16,23 +18,82 @@ def percentile_sar(img, pmin=2, pmax=98):
         img(ndarray): Image array. Shape: (y, x, channel)
         pmin(int): Percentile of minimum value. Default: 2 %
         pmax(int): Percentile of maximum value. Default: 98 %
+        stats(tuple): Stretch statistics from percentile_sar_stats(Optional).
+                      If given, pmin and pmax are ignored and the image is stretched with them.
+                      uint8 and uint16 images are stretched through a lookup table. Default: None
 
     Returns:
-        img_8bit_med(ndarray): Normalized array.
+        img_8bit_med(ndarray): Normalized uint8 array.
     """
-    # cut values outside of pmin% ~ pmax% of image value
-    percentile = np.nanpercentile(img, [pmin, pmax])
-    img[img < percentile[0]] = percentile[0]
-    img[img > percentile[1]] = percentile[1]
-
-    img_max = np.max(img)
-    img_min = np.min(img)
-    img_8bit = np.uint16((img - img_min) / (img_max - img_min) * 255)
+    if stats is None:
+        # cut values outside of pmin% ~ pmax% of image value
+        percentile = np.nanpercentile(img, [pmin, pmax])
+        img[img < percentile[0]] = percentile[0]
+        img[img > percentile[1]] = percentile[1]
+
+        img_max = np.max(img)
+        img_min = np.min(img)
+        img_8bit = np.uint8((img - img_min) / (img_max - img_min) * 255)
+    elif is_lut_type(img):
+        # Stretch all possible values once and look them up.
+        img_8bit = apply_lut(img, stretch_sar(np.arange(NUM_BINS, dtype=np.uint16), stats))
+    else:
+        img_8bit = stretch_sar(img, stats)
+
+    # Stretched values fit in uint8, so the fast median filter is used. It gives the same result as medfilt2d.
     if img_8bit.ndim == 3:
-        img_8bit_med = np.zeros(img_8bit.shape, dtype=np.uint16)
+        img_8bit_med = np.zeros(img_8bit.shape, dtype=np.uint8)
         for n in range(img_8bit.shape[2]):
-            img_8bit_med[..., n] = signal.medfilt2d(img_8bit[..., n], kernel_size=3)
+            img_8bit_med[..., n] = median3x3(img_8bit[..., n])
     else:
-        img_8bit_med = signal.medfilt2d(img_8bit, kernel_size=3)
+        img_8bit_med = median3x3(img_8bit)
+
+    return img_8bit_med
+
+
+@Norm.register_module()
+def percentile_sar_stats(hist, pmin=2, pmax=98, refine=None):
+    """Get stretch statistics of percentile_sar from a histogram.
+
+    The statistics are the minimum and maximum values of a uint16 image clipped by percentile_sar.
+    Stretching blocks of the image with them gives the same result as stretching the whole image.
+
+    Args:
+        hist(ndarray): Pixel counts of a uint16 image, or of a float image from float_histogram. shape: (65536,)
+        pmin(int): Percentile of minimum value. Default: 2 %
+        pmax(int): Percentile of maximum value. Default: 98 %
+        refine(callable): Function returning values of a float image in given bins(Optional).
+                          It must be given for a histogram of float_histogram. Default: None
+
+    Returns:
+        (tuple): Minimum value, maximum value.
+    """
+    if refine is not None:
+        # Clipped values of a float image are not truncated.
+        value_min, value_max = float_histogram_percentile(hist, [pmin, pmax], refine)
+        return float(value_min), float(value_max)
+
+    percentile = histogram_percentile(hist, [pmin, pmax])
+    value_min, value_max = histogram_minmax(hist)
+
+    # Clipped values are truncated to integers when they are written back to a uint16 image.
+    img_min = int(percentile[0]) if value_min < percentile[0] else value_min
+    img_max = int(percentile[1]) if value_max > percentile[1] else value_max
+
+    return img_min, img_max
+
+
+def stretch_sar(img, stats):
+    """Stretch an image to [0, 255] with statistics of percentile_sar_stats.
+
+    Args:
+        img(ndarray): Image array.
+        stats(tuple): Minimum value, maximum value.
+
+    Returns:
+        (ndarray): Stretched uint8 array.
+    """
+    img_min, img_max = stats
+    img = np.clip(img, img_min, img_max)
 
-    return img_8bit_med
\ No newline at end of file
+    return np.uint8((img - img_min) / (img_max - img_min) * 255)
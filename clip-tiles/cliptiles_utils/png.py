@@ -0,0 +1,79 @@
+# Internal functions
+import struct
+import zlib
+
+# External functions
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Color types of PNG per number of channels. gray, gray + alpha, RGB, RGBA
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+COLOR_TYPE_PALETTE = 3
+# Up filter: difference from the pixel above.
+FILTER_UP = 2
+
+
+def new_rows(height, width, channels):
+    """Allocate a buffer of filtered scanlines for filter_rows.
+
+    Args:
+        height(int): Height of an image.
+        width(int): Width of an image.
+        channels(int): Number of channels of an image.
+    Returns:
+        rows(ndarray): uint8 array. shape: (height, 1 + width * channels)
+    """
+    rows = np.empty([height, 1 + width * channels], dtype=np.uint8)
+    rows[:, 0] = FILTER_UP
+
+    return rows
+
+
+def filter_rows(pixels, rows):
+    """Filter scanlines of an image by Up filter of PNG into a buffer.
+
+    Args:
+        pixels(ndarray): uint8 pixels with interleaved channels. Rows can be strided views.
+                         shape: (height, width, channels)
+        rows(ndarray): Buffer from new_rows. shape: (height, 1 + width * channels)
+    Returns:
+        rows(ndarray): Filtered scanlines.
+    """
+    height = pixels.shape[0]
+    lines = pixels.reshape(height, -1)
+    rows[0, 1:] = lines[0]
+    np.subtract(lines[1:], lines[:-1], out=rows[1:, 1:])  # Differences wrap around in uint8.
+
+    return rows
+
+
+def encode_png(rows, width, height, channels, level=6, palette=None):
+    """Encode filtered scanlines to PNG.
+
+    Args:
+        rows(ndarray): Filtered scanlines from filter_rows. shape: (height, 1 + width * channels)
+        width(int): Width of an image.
+        height(int): Height of an image.
+        channels(int): Number of channels. 1: gray, 2: gray + alpha, 3: RGB, 4: RGBA
+        level(int): Compression level of zlib. 0 ~ 9(Optional). Default: 6
+        palette(ndarray): RGBA colors of a palette image. Pixels are indexes of it and channels must be 1(Optional).
+                          shape: (n, 4), n <= 256. Default: None
+    Returns:
+        (bytes): Encoded png.
+    """
+    color_type = COLOR_TYPES[channels] if palette is None else COLOR_TYPE_PALETTE
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+
+    chunks = [PNG_SIGNATURE, _chunk(b'IHDR', header)]
+    if palette is not None:
+        chunks.append(_chunk(b'PLTE', np.ascontiguousarray(palette[:, :3], dtype=np.uint8).tobytes()))
+        translucent = np.flatnonzero(palette[:, 3] != 255)
+        if translucent.size:  # Alpha of entries up to the last translucent one.
+            chunks.append(_chunk(b'tRNS', palette[:translucent[-1]+1, 3].astype(np.uint8).tobytes()))
+    chunks += [_chunk(b'IDAT', zlib.compress(rows, level)), _chunk(b'IEND', b'')]
+
+    return b''.join(chunks)
+
+
+def _chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
@@ -0,0 +1,139 @@
+# Internal functions
+from contextlib import contextmanager
+import json
+import os
+import time
+import tracemalloc
+
+# Fields of events summed per stage.
+COUNTERS = ('bytes_read', 'bytes_written', 'tiles', 'pixels_time', 'encode_time')
+
+
+class Profiler:
+    def __init__(self, enabled=True, events=None, trace_memory=False):
+        """Opt-in instrumentation of stages of a run.
+
+        A stage records its duration, resident memory of the process and fields given by the caller,
+        such as bytes read and written or tiles emitted. Stages can be nested, e.g., warps in a zoom level.
+        A disabled profiler records nothing, so instrumented code runs as before.
+
+        Args:
+            enabled(bool): Record stages(Optional). Default: True
+            events(str): Path to a line-delimited JSON file. An event is appended per stage as it ends(Optional).
+                         Default: None
+            trace_memory(bool): Record peak Python allocations per stage with tracemalloc. It slows down a run.
+                                Before Python 3.9, a peak is the one since tracing started(Optional). Default: False
+        """
+        self.enabled = enabled
+        self.events = []
+        self.trace_memory = trace_memory and enabled
+        self._stack = []
+        self._start = time.perf_counter()
+        self._file = open(events, 'a') if events and enabled else None
+
+        # Tracing started by the caller is kept running on close.
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Record a stage.
+
+        Args:
+            name(str): Name of the stage. E.g., norm, warp, cut_tiles
+            fields(dict): Fields of the event. E.g., zoom=15
+        Yields:
+            record(dict): Event of the stage. Fields added to it are recorded, e.g., record['tiles'] = 10
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        record = {'stage': name, 'path': '/'.join([frame['name'] for frame in self._stack] + [name]), **fields}
+        frame = {'name': name, 'peak': 0}
+        if self.trace_memory:
+            # Peak of tracemalloc is global. Keep the peak of the outer stage before resetting it.
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+            # Before Python 3.9, the peak cannot be reset. It is the peak since tracing started then.
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        self._stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            record['start'] = round(start - self._start, 6)
+            record['duration'] = round(end - start, 6)
+            record['rss_mb'] = rss_mb()
+            record['max_rss_mb'] = max_rss_mb()
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['py_peak_mb'] = round(peak / 1024 / 1024, 3)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self.add(record)
+
+    def add(self, record):
+        """Add an event. It is written on the event stream if any."""
+        self.events.append(record)
+        if self._file is not None:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def report(self):
+        """Summarize events.
+
+        Returns:
+            report(dict): Events, and total duration and counters per stage and per zoom level and stage.
+        """
+        stages = {}
+        zoom_levels = {}
+        for record in self.events:
+            summaries = [stages.setdefault(record['path'], {})]
+            if 'zoom' in record:
+                summaries.append(zoom_levels.setdefault(str(record['zoom']), {}).setdefault(record['path'], {}))
+
+            for summary in summaries:
+                summary['count'] = summary.get('count', 0) + 1
+                for name in ('duration',) + COUNTERS:
+                    if record.get(name) is not None:
+                        summary[name] = round(summary.get(name, 0) + record[name], 6)
+                for name in ('max_rss_mb', 'py_peak_mb'):
+                    if record.get(name) is not None:
+                        summary[name] = max(summary.get(name, 0), record[name])
+
+        return {'stages': stages, 'zoom_levels': zoom_levels, 'events': self.events}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+def rss_mb():
+    """Get resident memory of the process in MB. None if it is not available(non-Linux)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 3)
+
+
+def max_rss_mb():
+    """Get peak resident memory of the process in MB. None if it is not available(Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 3)  # ru_maxrss is in KB on Linux.
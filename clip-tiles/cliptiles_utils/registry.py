@@ -44,9 +44,7 @@ class Registry:
     def _register_module(self, module_class, module_name=None):
         if module_name is None:
             module_name = module_class.__name__
-        elif isinstance(module_name, str):
-            module_name = [module_name]
-        else:
+        elif not isinstance(module_name, str):
             msg = f'Module name should be str type. But given: {type(module_name)}'
             raise TypeError(msg)
 
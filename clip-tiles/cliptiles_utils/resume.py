@@ -0,0 +1,154 @@
+# Internal functions
+import hashlib
+import json
+import os
+
+# Name of a state file in an output directory.
+STATE = '.cliptiles_state.jsonl'
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Get SHA-1 checksum of a file.
+
+    Args:
+        path(str): Path to a file.
+        chunk_size(int): Number of bytes read at a time(Optional). Default: 1 MiB
+    Returns:
+        (str): Hex digest.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def make_key(paths, **params):
+    """Make a key of a tiling run.
+
+    Tiles of two runs are the same if their keys are the same.
+
+    Args:
+        paths(list(str)): Paths to input files.
+        params(dict): Parameters changing tiles. E.g., sensor, epsg, tile_size, norm
+    Returns:
+        (str): Key of the run.
+    """
+    key = {'files': [file_checksum(path) for path in paths], 'params': params}
+
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class RunState:
+    def __init__(self, output_dir, key):
+        """Progress of a tiling run to resume it.
+
+        Progress is appended to [output_dir]/.cliptiles_state.jsonl as soon as a stripe of tile columns,
+        a row of tiles of a stripe or a zoom level is complete, so it survives when the run dies.
+        A run is not resumed on the output directory of a run with a different key, since tiles of both runs
+        would be mixed.
+
+        Args:
+            output_dir(str): Path to an output directory.
+            key(str): Key of the run. See make_key.
+        Raises:
+            FileExistsError: If the output directory has a state of a run with a different key.
+        """
+        self.path = os.path.join(output_dir, STATE)
+        self.key = key
+        self.resumed = False
+        self._done = set()
+        self._columns = {}
+        self._cells = {}
+        self._tiles = {}
+
+        self.load()
+
+    def load(self):
+        records = []
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as f:
+                lines = f.read().split('\n')
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:  # Empty line or a line of a run which died while writing it.
+                    continue
+
+        if records and records[0].get('key') != self.key:
+            raise FileExistsError(f'Output directory has tiles of a run with other input files or parameters: '
+                                  f'{os.path.dirname(self.path)}')
+
+        if records:
+            self.resumed = True
+            if lines[-1]:  # Start a new line after a broken line.
+                self._append_line('')
+            for record in records[1:]:
+                zoom = record['zoom']
+                if record.get('done'):
+                    self._done.add(zoom)
+                    continue
+                if 'rows' in record:
+                    self._cells.setdefault(zoom, set()).update(
+                        (x, y) for x in record['columns'] for y in record['rows'])
+                else:
+                    self._columns.setdefault(zoom, set()).update(record['columns'])
+                self._tiles.setdefault(zoom, []).extend(tuple(tile) for tile in record['tiles'])
+        else:
+            with open(self.path, 'w') as f:
+                f.write(json.dumps({'key': self.key}) + '\n')
+
+    def _append(self, record):
+        self._append_line(json.dumps(record))
+
+    def _append_line(self, line):
+        with open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+    def is_done(self, zoom_level):
+        """Check if a zoom level is complete."""
+        return zoom_level in self._done
+
+    def columns(self, zoom_level):
+        """Get X indexes of complete tile columns of a zoom level."""
+        return self._columns.get(zoom_level, set())
+
+    def cells(self, zoom_level):
+        """Get tile indexes (x, y) of complete rows of tiles of stripes of a zoom level, out of complete columns."""
+        return self._cells.get(zoom_level, set())
+
+    def tiles(self, zoom_level):
+        """Get tile indexes (x, y) written in complete tile columns of a zoom level."""
+        return self._tiles.get(zoom_level, [])
+
+    def add_columns(self, zoom_level, columns, tiles):
+        """Record complete tile columns.
+
+        Args:
+            zoom_level(int): Zoom level.
+            columns(list(int)): X indexes of complete tile columns.
+            tiles(list(tuple)): Tile indexes (x, y) written in the columns.
+        """
+        self._columns.setdefault(zoom_level, set()).update(columns)
+        self._tiles.setdefault(zoom_level, []).extend(tiles)
+        self._append({'zoom': zoom_level, 'columns': list(columns), 'tiles': [list(tile) for tile in tiles]})
+
+    def add_row(self, zoom_level, columns, row, tiles):
+        """Record a complete row of tiles of tile columns.
+
+        Args:
+            zoom_level(int): Zoom level.
+            columns(list(int)): X indexes of the tile columns.
+            row(int): Y index of the row.
+            tiles(list(tuple)): Tile indexes (x, y) written in the row.
+        """
+        self._cells.setdefault(zoom_level, set()).update((x, row) for x in columns)
+        self._tiles.setdefault(zoom_level, []).extend(tiles)
+        self._append({'zoom': zoom_level, 'columns': list(columns), 'rows': [row],
+                      'tiles': [list(tile) for tile in tiles]})
+
+    def mark_done(self, zoom_level):
+        """Record a complete zoom level."""
+        self._done.add(zoom_level)
+        self._append({'zoom': zoom_level, 'done': True})
@@ -0,0 +1,70 @@
+# Internal functions
+from shutil import rmtree
+import os
+import tempfile
+import uuid
+
+# External functions
+from osgeo import gdal
+
+
+class Scratch:
+    def __init__(self, memory_limit=1024 * 1024 * 1024, tmp_dir=None):
+        """Scratch space of intermediate rasters of a run.
+
+        Intermediates are kept in GDAL in-memory file system(/vsimem) while they fit the memory limit.
+        The others spill to a temporary directory which is unique per run,
+        so that several runs can be executed from the same directory.
+
+        Args:
+            memory_limit(int): Maximum bytes of intermediates kept in memory(Optional). Default: 1 GiB
+            tmp_dir(str): Directory where the temporary directory is created(Optional).
+                          If not given, the system temporary directory is used. Default: None
+        """
+        self.memory_limit = memory_limit
+        self.mem_dir = f'/vsimem/cliptiles_{uuid.uuid4().hex}'
+        self.disk_dir = tempfile.mkdtemp(prefix='cliptiles_', dir=tmp_dir)
+        self._mem_files = {}
+
+    @property
+    def memory_used(self):
+        return sum(self._mem_files.values())
+
+    def path(self, name, nbytes, shared=False):
+        """Get a path for an intermediate raster.
+
+        Args:
+            name(str): Name of an intermediate.
+            nbytes(int): Estimated size of the intermediate in bytes.
+            shared(bool): The intermediate is read by other processes. It is always written on disk(Optional).
+                          Default: False
+        Returns:
+            (str): Path to the intermediate.
+        """
+        # A stale intermediate of the same name is removed wherever it is, in memory or on disk.
+        self.remove(os.path.join(self.mem_dir, name))
+        self.remove(os.path.join(self.disk_dir, name))
+        if not shared and self.memory_used + nbytes <= self.memory_limit:
+            path = os.path.join(self.mem_dir, name)
+            self._mem_files[path] = nbytes
+            return path
+
+        return os.path.join(self.disk_dir, name)
+
+    def remove(self, path):
+        """Remove an intermediate. Datasets of it must be closed before.
+
+        Args:
+            path(str): Path to the intermediate. Paths not in the scratch space are ignored.
+        """
+        if path in self._mem_files:
+            del self._mem_files[path]
+            gdal.Unlink(path)
+        elif os.path.dirname(path) == self.disk_dir and os.path.isfile(path):
+            gdal.Unlink(path)
+
+    def close(self):
+        """Remove all intermediates and the temporary directory. Call it even if a run fails, e.g., in finally."""
+        for path in list(self._mem_files):
+            self.remove(path)
+        rmtree(self.disk_dir, ignore_errors=True)
@@ -1,3 +1,3 @@
-Sensors = {'K5': {'fullname': 'KOMPSAT-5', 'type': 'SAR', 'norm': 'percentile_sar'},
-           'K3A': {'fullname': 'KOMPSAT-3A','type': 'EO', 'norm': 'percentile_eo'},
-           'K3': {'fullname': 'KOMPSAT-3','type': 'EO', 'norm': 'percentile_eo'}}
\ No newline at end of file
+Sensors = {'K5': {'fullname': 'KOMPSAT-5', 'type': 'SAR', 'norm': 'percentile_sar', 'stats': 'percentile_sar_stats'},
+           'K3A': {'fullname': 'KOMPSAT-3A','type': 'EO', 'norm': 'percentile_eo', 'stats': 'percentile_eo_stats'},
+           'K3': {'fullname': 'KOMPSAT-3','type': 'EO', 'norm': 'percentile_eo', 'stats': 'percentile_eo_stats'}}
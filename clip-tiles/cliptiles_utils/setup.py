@@ -1,4 +1,4 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 __version__ = "1.0"
 
@@ -10,7 +10,9 @@ setup(
     long_description='cliptiles_utils',
     long_description_content_type="text/markdown",
     url="https://www.contec.kr",
-    packages=find_packages(),
+    # This file is in the package directory, e.g., pip install clip-tiles/cliptiles_utils
+    packages=['cliptiles_utils'],
+    package_dir={'cliptiles_utils': '.'},
     python_requires=">=3.6",
     install_requires=[],
     classifiers=[
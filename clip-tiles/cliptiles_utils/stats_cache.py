@@ -0,0 +1,116 @@
+# Internal functions
+import hashlib
+import io
+import json
+import os
+
+# External functions
+import numpy as np
+
+# Directory of the cache if it is not given.
+DEFAULT_CACHE_DIR = os.environ.get('CLIPTILES_STATS_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'cliptiles', 'stats'))
+
+
+class StatsCache:
+    def __init__(self, cache_dir=None):
+        """Persisted cache of histograms of bands of scenes.
+
+        A histogram is keyed by path, size and modification time of a scene file and the band of it,
+        so that it is counted once per band and each tool derives its own statistics from it.
+        E.g., cliptiles.py stretches with the percentiles of the sensor, and roi_extractor.py with 0.1 and 99.9 %.
+        The cache is used only if a tool is given one. See --stats_cache of the tools.
+
+        Args:
+            cache_dir(str): Directory of the cache(Optional).
+                            If not given, $CLIPTILES_STATS_CACHE or ~/.cache/cliptiles/stats is used. Default: None
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, paths, **params):
+        """Make a key of statistics.
+
+        Args:
+            paths(list(str)): Paths to scene files.
+            params(dict): Parameters of the statistics. E.g., band
+        Returns:
+            (str): Key of the statistics.
+        """
+        files = []
+        for path in paths:
+            stat = os.stat(path)
+            files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        key = {'files': files, 'params': params}
+
+        return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def load_bands(self, bands):
+        """Load histograms of bands.
+
+        Args:
+            bands(list(tuple)): Scene file and band index of each band. [(path, band), ...]
+        Returns:
+            hist(ndarray): Pixel counts per value of each band. None if any band is not cached. shape: (band, 65536)
+        """
+        hists = []
+        for path, band in bands:
+            _, hist = self.load(self.make_key([path], band=band))
+            if hist is None:
+                return None
+            hists.append(hist)
+
+        return np.stack(hists)
+
+    def save_bands(self, bands, hist):
+        """Save histograms of bands.
+
+        Args:
+            bands(list(tuple)): Scene file and band index of each band. [(path, band), ...]
+            hist(ndarray): Pixel counts per value of each band. shape: (band, 65536)
+        """
+        for (path, band), band_hist in zip(bands, hist):
+            self.save(self.make_key([path], band=band), hist=band_hist)
+
+    def load(self, key):
+        """Load statistics.
+
+        Args:
+            key(str): Key of the statistics.
+        Returns:
+            stats(tuple): Statistics. None if they are not cached.
+            hist(ndarray): Histogram. None if it is not cached.
+        """
+        path = os.path.join(self.cache_dir, key + '.npz')
+        if not os.path.isfile(path):
+            return None, None
+
+        with np.load(path) as data:
+            stats = tuple(json.loads(str(data['stats']))) if 'stats' in data else None
+            hist = data['hist'] if 'hist' in data else None
+
+        return stats, hist
+
+    def save(self, key, stats=None, hist=None):
+        """Save statistics.
+
+        Args:
+            key(str): Key of the statistics.
+            stats(tuple): Statistics(Optional). Default: None
+            hist(ndarray): Histogram(Optional). Default: None
+        """
+        arrays = {}
+        if stats is not None:
+            arrays['stats'] = json.dumps([v.item() if isinstance(v, np.generic) else v for v in stats])
+        if hist is not None:
+            arrays['hist'] = hist
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+
+        # Write and rename so that other processes never read a partial file.
+        path = os.path.join(self.cache_dir, key + '.npz')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
@@ -1,46 +1,117 @@
 # Internal functions
+from collections import OrderedDict
+from multiprocessing import Pool
+import hashlib
 import math
 import os
+import threading
+import time
 
 # External functions
 from osgeo import gdal, gdal_array, osr
 import numpy as np
 
-# Source: https://wiki.openstreetmap.org/wiki/Zoom_levels
-# zoom level: m/pixel
-ZOOM = {0: 156543, 1: 78272, 2: 39136, 3: 19568, 4: 9784, 5: 4892, 6: 2446,
-        7: 1223, 8: 611.496, 9: 305.748, 10: 152.874, 11: 76.437, 12: 38.219, 13: 19.109,
-        14: 9.555, 15: 4.777, 16: 2.389, 17: 1.194, 18: 0.597, 19: 0.299, 20: 0.149}
+# Project functions
+from .file_io import read_bands
+from .png import encode_png, filter_rows, new_rows
+from .profiler import Profiler
+from .tile_math import LAT_MAX, tile_parents, tile_to_lonlat
+from .tile_store import BufferStore
+from .warp import WarpConfig
+
+# Number of recent encoded tiles reused for tiles with the same pixels.
+NUM_ENCODED = 256
+# Number of channels of tiles per pixel format. la(gray + alpha) and palette are for single-band images.
+PIXEL_FORMATS = {'rgba': 4, 'la': 2, 'palette': 1, 'webp': 4}
+# Palette of gray levels. Index 0 is transparent(no data) as in the other pixel formats.
+GRAY_PALETTE = np.stack([np.arange(256)] * 3 + [np.full(256, 255)], axis=1).astype(np.uint8)
+GRAY_PALETTE[0, 3] = 0
 
 
 class Tile:
-    def __init__(self, tile_size=256):
+    def __init__(self, tile_size=256, workers=1, warp_config=None, pixel_format='rgba', png_level=6, profiler=None,
+                 rgb=None):
         """Tile class
 
         Args:
             tile_size(int): Tile size. Length of a width and a height are the same
+            workers(int): Number of processes to cut tiles(Optional). Default: 1
+            warp_config(WarpConfig): Options of warps(Optional). If not given, default options are used. Default: None
+            pixel_format(str): Pixel format of tiles(Optional). Default: 'rgba'
+                               rgba: RGBA png
+                               la: Gray + alpha png. For single-band images.
+                               palette: 8 bit gray palette png whose index 0 is transparent. For single-band images.
+                               webp: Lossless RGBA WebP. GDAL must be built with WebP.
+            png_level(int): Compression level of png(zlib). 0 ~ 9(Optional). Default: 6
+            profiler(Profiler): Instrumentation of stages(Optional). If not given, stages are not recorded.
+                                Default: None
+            rgb(list(int)): Bands of a raster to cut, 1 band(gray), 3 bands(red, green, blue) or
+                            4 bands(red, green, blue, alpha)(Optional). If not given, all bands of the raster are cut.
+                            Default: None
         """
-        self.tile_size = tile_size
-        self.rgb = [1]  # TODO: Update for EO in next version.
+        if pixel_format not in PIXEL_FORMATS:
+            raise NotImplementedError(f'Not supported pixel format: {pixel_format}')
+        if pixel_format == 'webp' and gdal.GetDriverByName('WEBP') is None:
+            raise NotImplementedError('WebP is not supported by GDAL.')
 
-    def resize_raster(self, ds, zoom_level):
-        """Resize an input image based on zoom level
-
-        Resize an image and change its resolution based on zoom level.
+        self.tile_size = tile_size
+        self.workers = workers
+        self.warp_config = warp_config if warp_config is not None else WarpConfig(verbose=False)
+        self.pixel_format = pixel_format
+        self.png_level = png_level
+        self.channels = PIXEL_FORMATS[pixel_format]
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.rgb = rgb
+        # Bytes read from warped rasters, bytes of encoded tiles and seconds of building pixels and encoding.
+        self.counters = new_counters()
+        self._encoded = OrderedDict()
+        # Buffers reused for every row of tiles and every tile.
+        self._pixels = None
+        self._rows = new_rows(tile_size, tile_size, self.channels)
+
+    @property
+    def tile_format(self):
+        """File format of tiles. png or webp"""
+        return 'webp' if self.pixel_format == 'webp' else 'png'
+
+    def warp_to_grid(self, ds, zoom_level, scratch, epsg=3857, shared=False, indexes=None):
+        """Warp an input image onto the tile grid of a zoom level.
+
+        The image is reprojected and resized in one warp. The output raster is aligned to tile boundaries,
+        so tiles are read from it at integer multiples of the tile size.
 
         Args:
             ds(gdal.Dataset): Gdal dataset of an input image.
             zoom_level(int): Zoom level.
+            scratch(Scratch): Scratch space where the warped image is written.
+            epsg(int): EPSG code of a target projected coordinate system(Optional). Default: 3857
+            shared(bool): The warped image is read by other processes(Optional). Default: False
+            indexes(tuple): Tile indexes of a part of the grid to warp, e.g., rows of tiles(Optional).
+                            If not given, the whole grid covering the image is warped. Default: None
 
         Returns:
-            resized_ds(gdal.Dataset): Gdal dataset of a resized image
+            grid_ds(gdal.Dataset): Gdal dataset of the warped image.
+            (tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
         """
-        options = gdal.WarpOptions(xRes=ZOOM[zoom_level],
-                                   yRes=ZOOM[zoom_level],
-                                   outputType=ds.GetRasterBand(1).DataType)
-        resized_ds = gdal.Warp('.proc_tile/resize', ds, options=options)
-
-        return resized_ds
+        if indexes is None:
+            indexes, _ = self.create_tile_grid(ds, zoom_level, epsg)
+        bounds = self.grid_bounds(indexes, zoom_level, epsg)
+        size_x = (indexes[2] - indexes[0] + 1) * self.tile_size
+        size_y = (indexes[3] - indexes[1] + 1) * self.tile_size
+        data_type = ds.GetRasterBand(1).DataType
+        nbytes = size_x * size_y * ds.RasterCount * gdal.GetDataTypeSize(data_type) // 8
+
+        grid_ds = self.warp_config.warp(scratch.path('grid', nbytes, shared),
+                                        ds,
+                                        name=f'zoom {zoom_level} rows {indexes[1]}-{indexes[3]}',
+                                        dstSRS=f'EPSG:{epsg}',
+                                        outputBounds=bounds,
+                                        width=size_x,
+                                        height=size_y,
+                                        outputType=data_type,
+                                        creationOptions=['TILED=YES'])  # Fast windowed reads of stripes of tiles
+
+        return grid_ds, indexes
 
     def lonlat2tile(self, lon_deg, lat_deg, zoom_level):
         """Get tile X, Y index
@@ -99,125 +170,666 @@ class Tile:
 
         return lon_deg_min, lat_deg_min, lon_deg_max, lat_deg_max
 
-    def create_base_raster(self, ds, zoom_level):
-        """Create empty base raster.
+    def get_bounds(self, tiles, zoom_level):
+        """Get longitude and latitude bounds of tiles.
+
+        Args:
+            tiles(list(tuple)): Tile indexes (x, y).
+            zoom_level(int): Zoom level of the tiles.
+
+        Returns:
+            (tuple(float)): lon_deg_min, lat_deg_min, lon_deg_max, lat_deg_max
+        """
+        x, y = np.asarray(tiles).T
+        lon_min, lat_min, lon_max, lat_max = tile_to_lonlat(x, y, zoom_level)
+
+        return lon_min.min(), lat_min.min(), lon_max.max(), lat_max.max()
+
+    def get_footprint(self, ds, num_points=21):
+        """Get longitude and latitude bounds of a raster.
 
-        Create base raster having the same attributes as the input dataset.
-        Its width and height size are minimum total tile sizes cover a reference raster.
+        Edges of the raster are sampled so that curved edges in lat./lon. are covered.
+
+        Args:
+            ds(gdal.Dataset): Gdal dataset.
+            num_points(int): Number of points sampled per edge(Optional). Default: 21
+
+        Returns:
+            (tuple(float)): lon_deg_min, lat_deg_min, lon_deg_max, lat_deg_max
+        """
+        src = osr.SpatialReference(wkt=ds.GetProjection())
+        dst = osr.SpatialReference()
+        dst.ImportFromEPSG(4326)
+        if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):  # GDAL >= 3: use (lon, lat) order
+            src.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            dst.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        ct = osr.CoordinateTransformation(src, dst)
+
+        geo_transform = ds.GetGeoTransform()
+        steps = np.linspace(0, 1, num_points)
+        pixels = [(t * ds.RasterXSize, 0) for t in steps] + [(t * ds.RasterXSize, ds.RasterYSize) for t in steps] + \
+                 [(0, t * ds.RasterYSize) for t in steps] + [(ds.RasterXSize, t * ds.RasterYSize) for t in steps]
+        points = ct.TransformPoints([gdal.ApplyGeoTransform(geo_transform, px, py) for px, py in pixels])
+        lons = [point[0] for point in points]
+        lats = [point[1] for point in points]
+
+        return min(lons), min(lats), max(lons), max(lats)
+
+    def create_tile_grid(self, ds, zoom_level, epsg=3857):
+        """Create a tile grid covering a raster.
+
+        The tile grid is the minimum set of tiles covering the reference raster.
+        It is computed from the footprint of the raster, without warping it.
 
         Args:
             ds(gdal.Dataset): Reference raster.
             zoom_level(int): Zoom level.
+            epsg(int): EPSG code of a target projected coordinate system(Optional). Default: 3857
 
         Returns:
-            base_ds(gdal.Dataset): Empty dataset.
             (tuple): Tile indexes. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            (tuple): Bounds of the grid in the target system. (x_min, y_min, x_max, y_max)
         """
-        interim_ds = gdal.Warp('',
-                               ds,
-                               dstSRS='EPSG:4326',
-                               format='VRT',
-                               outputType=ds.GetRasterBand(1).DataType)  # Reproject to EPSG4326 to get lat., lon.
+        lon_min, lat_min, lon_max, lat_max = self.get_footprint(ds)
+        lat_min = max(lat_min, -LAT_MAX)
+        lat_max = min(lat_max, LAT_MAX)
 
-        lon, x_res, _, lat, _, y_res = interim_ds.GetGeoTransform()
-        lon_tl = lon
-        lon_br = lon + interim_ds.RasterXSize * x_res
-        lat_tl = lat
-        lat_br = lat + interim_ds.RasterYSize * y_res
-        del interim_ds
+        n = 2 ** zoom_level
+        tile_x_tl, tile_y_tl = self.lonlat2tile(lon_min, lat_max, zoom_level)
+        tile_x_br, tile_y_br = self.lonlat2tile(lon_max, lat_min, zoom_level)
+        tile_x_tl, tile_y_tl = max(tile_x_tl, 0), max(tile_y_tl, 0)
+        tile_x_br, tile_y_br = min(tile_x_br, n - 1), min(tile_y_br, n - 1)
+        indexes = (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
 
-        tile_x_tl, tile_y_tl = self.lonlat2tile(lon_tl, lat_tl, zoom_level)
-        tile_x_br, tile_y_br = self.lonlat2tile(lon_br, lat_br, zoom_level)
+        return indexes, self.grid_bounds(indexes, zoom_level, epsg)
+
+    def grid_bounds(self, indexes, zoom_level, epsg=3857):
+        """Get bounds of tiles in a target system.
+
+        Args:
+            indexes(tuple): Tile indexes. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            zoom_level(int): Zoom level.
+            epsg(int): EPSG code of a target projected coordinate system(Optional). Default: 3857
+
+        Returns:
+            (tuple): Bounds of the tiles in the target system. (x_min, y_min, x_max, y_max)
+        """
+        tile_x_tl, tile_y_tl, tile_x_br, tile_y_br = indexes
+        n = 2 ** zoom_level
 
-        size_x = (tile_x_br - tile_x_tl + 1) * self.tile_size  # Num. of pixels in x direction.
-        size_y = (tile_y_br - tile_y_tl + 1) * self.tile_size  # Num. of pixels in y direction.
-        lon_tl_base, _, _, lat_tl_base = self.tile2lonlat(tile_x_tl, tile_y_tl, zoom_level)
+        # Corners of the grid in lat./lon.
+        lon_tl = tile_x_tl / n * 360 - 180
+        lat_tl = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y_tl / n))))
+        lon_br = (tile_x_br + 1) / n * 360 - 180
+        lat_br = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (tile_y_br + 1) / n))))
 
         # Convert lat./lon. to the target CSR.
         src = osr.SpatialReference()
         src.ImportFromEPSG(4326)
         dst = osr.SpatialReference()
-        proj = osr.SpatialReference(wkt=ds.GetProjection())
-        epsg = proj.GetAttrValue('AUTHORITY', 1)
-        dst.ImportFromEPSG(int(epsg))
+        dst.ImportFromEPSG(epsg)
+        if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):  # GDAL >= 3: use (lon, lat) order
+            src.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            dst.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
         ct = osr.CoordinateTransformation(src, dst)
-        x_tl_base, y_tl_base, z = ct.TransformPoint(lat_tl_base, lon_tl_base)
-        _, x_res, _, _, _, y_res = ds.GetGeoTransform()
-        geotransform = (x_tl_base, x_res, 0, y_tl_base, 0, y_res)
+        x_tl, y_tl, _ = ct.TransformPoint(lon_tl, lat_tl)
+        x_br, y_br, _ = ct.TransformPoint(lon_br, lat_br)
+
+        return x_tl, y_br, x_br, y_tl
+
+    def read_window(self, ds, x, y, size_x, size_y):
+        """Read a window of a raster warped onto a tile grid.
+
+        Rasters of 1 band(gray), 3 bands(red, green, blue) and 4 bands(red, green, blue, alpha) are supported.
+
+        Args:
+            ds(gdal.Dataset): Raster warped onto a tile grid. See Tile.warp_to_grid.
+            x(int): X pixel of the window.
+            y(int): Y pixel of the window.
+            size_x(int): Width of the window.
+            size_y(int): Height of the window.
+
+        Returns:
+            img(ndarray): Image array. shape: (size_y, size_x), (size_y, size_x, 3) or (size_y, size_x, 4)
+        """
+        bands = self.rgb if self.rgb is not None else list(range(1, ds.RasterCount + 1))
+        if len(bands) not in (1, 3, 4):
+            raise ValueError(f'Only 1, 3 or 4 bands can be tiled. Given: {len(bands)} bands. '
+                             f'Select bands of the raster with rgb.')
+        img = np.empty([size_y, size_x, len(bands)], dtype=gdal_array.GDALTypeCodeToNumericTypeCode(
+            ds.GetRasterBand(1).DataType))
 
-        driver = gdal.GetDriverByName(ds.GetDriver().ShortName)
-        base_ds = driver.Create('.proc_tile/base_ds', size_x, size_y, len(self.rgb), ds.GetRasterBand(1).DataType)
-        base_ds.SetProjection(ds.GetProjection())
-        base_ds.SetGeoTransform(geotransform)
-        base_ds.GetRasterBand(1).Fill(0)
-        base_ds.GetRasterBand(1).SetNoDataValue(0)
+        # Bands are read pixel-interleaved straight into the window.
+        read_bands(ds, x, y, img, bands)
+        self.counters['bytes_read'] += img.nbytes
 
-        return base_ds, (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+        if len(bands) == 1:
+            return img[..., 0]
+        return img
 
-    def cut_tiles(self, img, indexes, output_dir):
-        """Cut tiles from d raster and save it on the output directory.
+    def cut_tiles(self, img, indexes, zoom_level, store, skip=()):
+        """Cut tiles from d raster and save it on the tile store.
+
+        Empty tiles(fully transparent) are skipped.
+        Pixels and transparency of all tiles of the raster are computed at once,
+        and each tile is encoded from a view of them.
 
         Args:
             img(ndarray): Image array to cut
             indexes(tuple): Tile indexes. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
-            output_dir(str): Path to a zoom-level directory where tiles will be saved.
+            zoom_level(int): Zoom level.
+            store(Store): Tile store where tiles will be saved.
+            skip(set(tuple)): Tile indexes (x, y) not to cut, e.g., complete in a previous run(Optional). Default: ()
+
+        Returns:
+            tiles(list(tuple)): Tile indexes (x, y) of the written tiles.
         """
         size_x = int(img.shape[1] / self.tile_size)
         size_y = int(img.shape[0] / self.tile_size)
-        driver = gdal.GetDriverByName('PNG')
+        tiles = []
+
+        start = time.perf_counter()
+        pixels, alpha = self.to_pixels(img)
+        alpha = alpha[:size_y*self.tile_size, :size_x*self.tile_size]
+        visible = alpha.reshape(size_y, self.tile_size, size_x, self.tile_size).any(axis=(1, 3))
+        self.counters['pixels_time'] += time.perf_counter() - start
 
         for x in range(size_x):
-            path_x = os.path.join(output_dir, str(indexes[0] + x))
-            os.makedirs(path_x, exist_ok=True)
             offset_x = x * self.tile_size
             for y in range(size_y):
+                if not visible[y, x] or (indexes[0] + x, indexes[1] + y) in skip:  # No data or fully transparent
+                    continue
                 offset_y = y * self.tile_size
-                if img.ndim == 2:  # img is 1 channel
-                    tile = np.zeros([self.tile_size, self.tile_size, 3], dtype=np.uint8)
-                    tile[..., 2] = tile[..., 1] = tile[..., 0] = img[offset_y:offset_y+self.tile_size,
-                                                                 offset_x:offset_x+self.tile_size]
+                tile = pixels[offset_y:offset_y+self.tile_size, offset_x:offset_x+self.tile_size]
+                start = time.perf_counter()
+                key, data = self.encode_unique(tile)
+                self.counters['encode_time'] += time.perf_counter() - start
+                self.counters['bytes_written'] += len(data)
+                store.put(zoom_level, indexes[0] + x, indexes[1] + y, data, key=key)
+                tiles.append((indexes[0] + x, indexes[1] + y))
 
-                else:  # img is 3 channel
-                    tile = img[offset_y:offset_y + self.tile_size, offset_x:offset_x + self.tile_size]
+        return tiles
 
-                # Generate an image with transparent background
-                alpha = np.array(tile, dtype=bool)
-                alpha = alpha[..., 0] * alpha[..., 1] * alpha[..., 2] * 255
-                alpha = np.expand_dims(alpha, axis=2)
-                tile = np.concatenate((tile, alpha), axis=2)
-                tile = np.transpose(tile, axes=[2, 0, 1])
-                tile = np.uint8(tile)
-                gtile = gdal_array.OpenArray(tile)
-                name = str(indexes[1] + y) + '.png'
-                name = os.path.join(path_x, name)
-                driver.CreateCopy(name, gtile)
+    def to_pixels(self, img):
+        """Convert an image to pixels of the pixel format with transparent background.
 
-    def write_tiles(self, ds, zoom_level, output_dir):
-        """Write tiles on disk.
+        A pixel is transparent if any of its channels is 0, or if the alpha band of a 4 channel image is 0.
+        The result is written on a buffer reused while the image size is the same.
 
-        This function calculates tiles and write them on the given output path.
+        Args:
+            img(ndarray): Image array. shape: (height, width), (height, width, 3) or (height, width, 4)
+
+        Returns:
+            pixels(ndarray): uint8 pixel array. shape: (height, width, channels)
+            alpha(ndarray): Pixels are transparent where it is 0. shape: (height, width)
+        """
+        if img.ndim == 3 and self.pixel_format in ('la', 'palette'):
+            raise NotImplementedError(f'Pixel format {self.pixel_format} is for single-band images.')
+
+        shape = (img.shape[0], img.shape[1], self.channels)
+        if self._pixels is None or self._pixels.shape != shape:
+            self._pixels = np.empty(shape, dtype=np.uint8)
+        pixels = self._pixels
+
+        if self.pixel_format == 'palette':  # Gray level is the index of the palette.
+            pixels[..., 0] = img
+            return pixels, pixels[..., 0]
+
+        if self.pixel_format == 'la':
+            pixels[..., 0] = img
+        elif img.ndim == 2:  # img is 1 channel
+            pixels[..., 0] = img
+            pixels[..., 1] = pixels[..., 0]
+            pixels[..., 2] = pixels[..., 0]
+        else:  # img is 3 channel, or 4 channel with alpha
+            pixels[..., :3] = img[..., :3]
+
+        alpha = pixels[..., -1]
+        np.not_equal(pixels[..., 0], 0, out=alpha, casting='unsafe')
+        for channel in range(1, self.channels - 1):
+            alpha &= pixels[..., channel] != 0
+        if img.ndim == 3 and img.shape[2] == 4:
+            alpha &= img[..., 3] != 0
+        alpha *= 255
+
+        return pixels, alpha
+
+    def from_rgba(self, tile):
+        """Convert a RGBA tile of a gray image to pixels of the pixel format.
 
         Args:
-            ds(gdal.Dataset): Gdal dataset of an input image.
+            tile(ndarray): RGBA tile array. shape: (4, tile_size, tile_size)
+
+        Returns:
+            (ndarray): Pixel array. shape: (tile_size, tile_size, channels)
+        """
+        tile = np.transpose(tile, axes=[1, 2, 0])
+        if self.pixel_format == 'la':
+            return tile[..., [0, 3]]
+        if self.pixel_format == 'palette':
+            return tile[..., :1]
+        return tile
+
+    def cut_columns(self, ds, indexes, x, num_x, zoom_level, store, skip=()):
+        """Cut tiles of columns of a tile grid row by row.
+
+        Only one row of tiles is read from the raster at a time.
+
+        Args:
+            ds(gdal.Dataset): Raster placed on the grid.
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            x(int): First column of the grid to cut.
+            num_x(int): Number of columns to cut.
             zoom_level(int): Zoom level.
-            output_dir(str): Path to a zoom-level directory where tiles will be saved.
+            store(Store): Tile store where tiles will be saved.
+            skip(set(tuple)): Tile indexes (x, y) not to cut. See Tile.cut_rows(Optional). Default: ()
+
+        Returns:
+            tiles(list(tuple)): Tile indexes (x, y) of the written tiles.
         """
-        resized_ds = self.resize_raster(ds, zoom_level)
-        base_ds, indexes = self.create_base_raster(resized_ds, zoom_level)
+        tiles = []
+        for _, row_tiles in self.cut_rows(ds, indexes, x, num_x, zoom_level, store, skip):
+            tiles += row_tiles
 
-        offset_x = int((resized_ds.GetGeoTransform()[0] - base_ds.GetGeoTransform()[0]) / resized_ds.GetGeoTransform()[1])
-        offset_y = int((base_ds.GetGeoTransform()[3] - resized_ds.GetGeoTransform()[3]) / -resized_ds.GetGeoTransform()[5])  # y resolution is negative
+        return tiles
 
-        for idx, band in enumerate(self.rgb):
-            s_band = resized_ds.GetRasterBand(band)
-            t_band = base_ds.GetRasterBand(idx+1)
-            t_band.WriteRaster(offset_x, offset_y, resized_ds.RasterXSize, resized_ds.RasterYSize,
-                               s_band.ReadRaster(), resized_ds.RasterXSize, resized_ds.RasterYSize, t_band.DataType)
+    def cut_rows(self, ds, indexes, x, num_x, zoom_level, store, skip=()):
+        """Cut tiles of columns of a tile grid row by row, yielding each row as it is complete.
 
-        img = base_ds.ReadAsArray()
-        if len(self.rgb) == 3:
-            img = np.transpose(img, axes=[1, 2, 0])
-        self.cut_tiles(img, indexes, output_dir)
+        Args:
+            ds(gdal.Dataset): Raster placed on the grid.
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            x(int): First column of the grid to cut.
+            num_x(int): Number of columns to cut.
+            zoom_level(int): Zoom level.
+            store(Store): Tile store where tiles will be saved.
+            skip(set(tuple)): Tile indexes (x, y) not to cut. A row of them only is not read(Optional). Default: ()
 
-        gdal.Unlink(base_ds.GetDescription())
-        gdal.Unlink(resized_ds.GetDescription())
\ No newline at end of file
+        Yields:
+            y(int): Row of the grid.
+            tiles(list(tuple)): Tile indexes (x, y) of the tiles written in the row.
+        """
+        for y in range(indexes[3] - indexes[1] + 1):
+            row = (indexes[0] + x, indexes[1] + y, indexes[0] + x + num_x - 1, indexes[1] + y)
+            if skip and all((tile_x, row[1]) in skip for tile_x in range(row[0], row[2] + 1)):
+                continue
+            img = self.read_window(ds, x * self.tile_size, y * self.tile_size,
+                                   num_x * self.tile_size, self.tile_size)
+            yield y, self.cut_tiles(img, row, zoom_level, store, skip)
+
+    def cut_tiles_parallel(self, path, indexes, stripes, zoom_level, store, skip=()):
+        """Cut tiles of a raster with a pool of worker processes.
+
+        Each worker opens the raster on disk and reads only its stripe of columns,
+        so the image is not pickled to the workers. Tiles are the same as the ones of a single process.
+        If the store can not be shared by processes, workers return encoded tiles
+        and the main process saves them on the store.
+
+        Args:
+            path(str): Path to a raster placed on the grid.
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            stripes(list(tuple)): Stripes of columns to cut. (first column, number of columns)
+            zoom_level(int): Zoom level.
+            store(Store): Tile store where tiles will be saved.
+            skip(set(tuple)): Tile indexes (x, y) not to cut. See Tile.cut_rows(Optional). Default: ()
+
+        Yields:
+            (tuple): First column, number of columns and tile indexes (x, y) written of a complete stripe.
+        """
+        jobs = [(self.tile_size, self.rgb, self.pixel_format, self.png_level, path, indexes, x, num_x,
+                 zoom_level, store if store.shared else None,
+                 {tile for tile in skip if indexes[0] + x <= tile[0] < indexes[0] + x + num_x})
+                for x, num_x in stripes]
+
+        with Pool(self.workers) as pool:
+            for x, num_x, tiles, payloads, stats, counters in pool.imap_unordered(_cut_stripe, jobs):
+                for payload in payloads:
+                    store.put(*payload)
+                if stats is not None:
+                    store.add_stats(stats)
+                for name, value in counters.items():
+                    self.counters[name] += value
+                yield x, num_x, tiles
+
+    def get_stripes(self, indexes, store, state=None, zoom_level=None):
+        """Split columns of a tile grid into stripes.
+
+        A stripe is the unit of work of a worker process and of the progress of a resumable run.
+        Columns already complete in the run state are excluded. Rows of tiles of a stripe complete in the run state
+        are skipped by Tile.cut_rows.
+
+        Args:
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            store(Store): Tile store where tiles will be saved.
+            state(RunState): Progress of a resumable run(Optional). Default: None
+            zoom_level(int): Zoom level. Required if state is given.
+
+        Returns:
+            stripes(list(tuple)): Stripes of columns. (first column, number of columns)
+        """
+        num_x = indexes[2] - indexes[0] + 1
+        if self.workers > 1 and store.shared:
+            width = max(1, math.ceil(num_x / (self.workers * 4)))  # Several stripes per worker to balance the load.
+        elif self.workers > 1:
+            width = 1
+        else:
+            width = num_x
+
+        done = state.columns(zoom_level) if state is not None else set()
+        stripes = []
+        for x in range(num_x):
+            if indexes[0] + x in done:
+                continue
+            if stripes and stripes[-1][0] + stripes[-1][1] == x and stripes[-1][1] < width:
+                stripes[-1] = (stripes[-1][0], stripes[-1][1] + 1)
+            else:
+                stripes.append((x, 1))
+
+        return stripes
+
+    def encode_tile(self, tile):
+        """Encode a tile to png or webp of the pixel format.
+
+        Args:
+            tile(ndarray): Pixel array. It can be a view of a larger image. shape: (tile_size, tile_size, channels)
+
+        Returns:
+            data(bytes): Encoded tile.
+        """
+        return self._encode(tile, filter_rows(tile, self._rows))
+
+    def _encode(self, tile, rows):
+        if self.pixel_format == 'webp':
+            return self.encode_webp(tile)
+
+        palette = GRAY_PALETTE if self.pixel_format == 'palette' else None
+        return encode_png(rows, self.tile_size, self.tile_size, self.channels, self.png_level, palette)
+
+    def encode_webp(self, tile):
+        """Encode a tile to lossless webp.
+
+        Args:
+            tile(ndarray): RGBA tile array. shape: (tile_size, tile_size, 4)
+
+        Returns:
+            data(bytes): Encoded webp tile.
+        """
+        path = vsimem_path(self.tile_format)
+        try:
+            src = gdal_array.OpenArray(np.ascontiguousarray(np.transpose(tile, axes=[2, 0, 1])))
+            gtile = gdal.GetDriverByName('WEBP').CreateCopy(path, src, options=['LOSSLESS=TRUE'])
+            gtile = None  # Flush
+
+            f = gdal.VSIFOpenL(path, 'rb')
+            gdal.VSIFSeekL(f, 0, os.SEEK_END)
+            size = gdal.VSIFTellL(f)
+            gdal.VSIFSeekL(f, 0, os.SEEK_SET)
+            data = gdal.VSIFReadL(1, size, f)
+            gdal.VSIFCloseL(f)
+        finally:
+            gdal.Unlink(path)
+
+        return data
+
+    def encode_unique(self, tile):
+        """Encode a tile once per pixels.
+
+        Pixels of the tile are hashed before encoding. Recent tiles are kept per hash,
+        so identical tiles(e.g., uniform water or no data) are encoded once.
+
+        Args:
+            tile(ndarray): Pixel array. It can be a view of a larger image. shape: (tile_size, tile_size, channels)
+
+        Returns:
+            key(str): Hash of pixels of the tile.
+            data(bytes): Encoded tile.
+        """
+        # Filtered scanlines are contiguous and identical for identical pixels.
+        rows = filter_rows(tile, self._rows)
+        key = hashlib.blake2b(rows, digest_size=16).hexdigest()
+
+        data = self._encoded.get(key)
+        if data is None:
+            data = self._encode(tile, rows)
+            self._encoded[key] = data
+            if len(self._encoded) > NUM_ENCODED:
+                self._encoded.popitem(last=False)
+        else:
+            self._encoded.move_to_end(key)
+
+        return key, data
+
+    def decode_tile(self, data):
+        """Decode a tile of any pixel format to RGBA.
+
+        Args:
+            data(bytes): Encoded tile.
+
+        Returns:
+            tile(ndarray): RGBA tile array. shape: (4, tile_size, tile_size)
+        """
+        path = vsimem_path(self.tile_format)
+        gdal.FileFromMemBuffer(path, data)
+        try:
+            ds = gdal.Open(path)
+            tile = ds.ReadAsArray()
+            if ds.RasterCount == 1:  # palette
+                table = ds.GetRasterBand(1).GetColorTable()
+                colors = np.array([table.GetColorEntry(idx) for idx in range(table.GetCount())], dtype=np.uint8)
+                tile = np.transpose(colors[tile], axes=[2, 0, 1])
+            elif ds.RasterCount == 2:  # la
+                tile = tile[[0, 0, 0, 1]]
+            ds = None
+        finally:
+            gdal.Unlink(path)
+
+        return tile
+
+    def downsample_tiles(self, store, zoom_level, resampling='average'):
+        """Build tiles of a zoom level from tiles of the zoom level above.
+
+        Each tile is made of its 4 child tiles, merging every 2x2 pixels into 1 pixel.
+        Transparent pixels are excluded from merging.
+
+        Args:
+            store(Store): Tile store having tiles of the zoom level above. Tiles will be saved on it.
+            zoom_level(int): Zoom level of the tiles to build.
+            resampling(str): 'average' for images or 'mode' for masks(Optional). Default: 'average'
+        """
+        if resampling not in ('average', 'mode'):
+            raise NotImplementedError(f'Not supported resampling method: {resampling}')
+
+        children = set(store.tiles(zoom_level + 1))
+        tiles = np.asarray(sorted(children), dtype=np.int64).reshape(-1, 2)
+        x, y = tile_parents(tiles[:, 0], tiles[:, 1], zoom_level + 1, zoom_level)
+        parents = sorted(set(zip(x.tolist(), y.tolist())))
+
+        for x, y in parents:
+            mosaic = np.zeros([4, 2 * self.tile_size, 2 * self.tile_size], dtype=np.uint8)
+            for dx in range(2):
+                for dy in range(2):
+                    if (2 * x + dx, 2 * y + dy) not in children:
+                        continue
+                    data = store.get(zoom_level + 1, 2 * x + dx, 2 * y + dy)
+                    mosaic[:, dy*self.tile_size:(dy+1)*self.tile_size,
+                           dx*self.tile_size:(dx+1)*self.tile_size] = self.decode_tile(data)
+
+            tile = self.merge_pixels(mosaic, resampling)
+            key, data = self.encode_unique(self.from_rgba(tile))
+            self.counters['bytes_written'] += len(data)
+            store.put(zoom_level, x, y, data, key=key)
+
+        store.commit(zoom_level, parents)
+
+    def merge_pixels(self, mosaic, resampling):
+        """Merge every 2x2 pixels of a mosaic of 4 tiles into 1 pixel.
+
+        Args:
+            mosaic(ndarray): RGBA array of 2x2 tiles. shape: (4, 2 * tile_size, 2 * tile_size)
+            resampling(str): 'average' or 'mode'.
+
+        Returns:
+            tile(ndarray): RGBA tile array. shape: (4, tile_size, tile_size)
+        """
+        # Gather 2x2 pixels on the last axis. shape: (4, tile_size, tile_size, 4)
+        pixels = mosaic.reshape(4, self.tile_size, 2, self.tile_size, 2)
+        pixels = np.transpose(pixels, axes=[0, 1, 3, 2, 4]).reshape(4, self.tile_size, self.tile_size, 4)
+        color = pixels[:3]
+        valid = pixels[3] > 0
+        count = np.sum(valid, axis=-1)
+
+        tile = np.zeros([4, self.tile_size, self.tile_size], dtype=np.uint8)
+        if resampling == 'average':
+            total = np.sum(color * valid, axis=-1, dtype=np.uint32)
+            tile[:3] = (total + count // 2) // np.maximum(count, 1)
+        else:
+            # Count how many valid pixels have the same color as each pixel and take the most frequent one.
+            same = np.all(color[..., :, None] == color[..., None, :], axis=0) & valid[..., None, :]
+            score = np.where(valid, np.sum(same, axis=-1), -1)
+            choice = np.argmax(score, axis=-1)
+            tile[:3] = np.take_along_axis(color, choice[None, ..., None], axis=-1)[..., 0]
+        tile[3] = (count > 0) * 255
+
+        return tile
+
+    def write_tiles(self, ds, zoom_level, store, scratch, epsg=3857, state=None):
+        """Write tiles on the tile store.
+
+        This function calculates tiles and write them on the given tile store.
+        Empty tiles are skipped and the written tiles are committed to the store per zoom level.
+        The image is warped onto the tile grid by bands of tile rows fitting in the free memory of the scratch
+        space(the whole grid at once if it fits, or with workers), and tiles are read from a band row by row.
+        So memory is bounded by the memory limit of the scratch space, not by the extent of the zoom level.
+        If state is given, complete columns(or rows of tiles of a stripe in a single process) are recorded
+        and the ones complete in a previous run are skipped.
+
+        Args:
+            ds(gdal.Dataset): Gdal dataset of an input image.
+            zoom_level(int): Zoom level.
+            store(Store): Tile store where tiles will be saved.
+            scratch(Scratch): Scratch space of intermediate rasters.
+            epsg(int): EPSG code of a target projected coordinate system(Optional). Default: 3857
+            state(RunState): Progress of a resumable run(Optional). Default: None
+        """
+        grid_indexes, _ = self.create_tile_grid(ds, zoom_level, epsg)
+        num_rows = self.grid_rows(ds, grid_indexes, scratch)
+        tiles = list(state.tiles(zoom_level)) if state is not None else []
+        done = state.cells(zoom_level) if state is not None else ()
+        done_columns = state.columns(zoom_level) if state is not None else ()
+
+        for row in range(grid_indexes[1], grid_indexes[3] + 1, num_rows):
+            indexes = (grid_indexes[0], row, grid_indexes[2], min(row + num_rows - 1, grid_indexes[3]))
+            if state is not None and all(x in done_columns or (x, y) in done
+                                         for x in range(indexes[0], indexes[2] + 1)
+                                         for y in range(indexes[1], indexes[3] + 1)):
+                continue  # Complete in a previous run
+
+            with self.profiler.stage('warp', zoom=zoom_level) as record:
+                grid_ds, _ = self.warp_to_grid(ds, zoom_level, scratch, epsg, shared=self.workers > 1,
+                                               indexes=indexes)
+                record['bytes_written'] = grid_ds.RasterXSize * grid_ds.RasterYSize * grid_ds.RasterCount * \
+                    gdal.GetDataTypeSize(grid_ds.GetRasterBand(1).DataType) // 8
+            stripes = self.get_stripes(indexes, store, state, zoom_level)
+
+            with self.profiler.stage('cut_tiles', zoom=zoom_level) as record:
+                counters = dict(self.counters)
+                if self.workers > 1:
+                    grid_ds.FlushCache()
+                    results = self.cut_tiles_parallel(grid_ds.GetDescription(), indexes, stripes, zoom_level,
+                                                      store, done)
+                    results = ((x, num_x, None, stripe_tiles) for x, num_x, stripe_tiles in results)
+                else:
+                    # Progress is recorded per row of tiles, so stripes keep the width of the grid.
+                    results = ((x, num_x, y, row_tiles) for x, num_x in stripes
+                               for y, row_tiles in self.cut_rows(grid_ds, indexes, x, num_x, zoom_level, store,
+                                                                 done))
+
+                num_tiles = 0
+                for x, num_x, y, stripe_tiles in results:
+                    tiles += stripe_tiles
+                    num_tiles += len(stripe_tiles)
+                    if state is not None:
+                        store.flush()
+                        columns = range(indexes[0] + x, indexes[0] + x + num_x)
+                        if y is None:
+                            state.add_columns(zoom_level, columns, stripe_tiles)
+                        else:
+                            state.add_row(zoom_level, columns, indexes[1] + y, stripe_tiles)
+                record['tiles'] = num_tiles
+                record.update({name: self.counters[name] - value for name, value in counters.items()})
+
+            path = grid_ds.GetDescription()
+            grid_ds = None
+            scratch.remove(path)
+
+        with self.profiler.stage('commit', zoom=zoom_level):
+            store.commit(zoom_level, tiles)
+
+    def grid_rows(self, ds, indexes, scratch):
+        """Get the number of tile rows warped at a time.
+
+        Rows are as many as fit in the free memory of the scratch space, at least 1.
+        With workers, the grid is written on disk to be shared, so it is warped at once.
+
+        Args:
+            ds(gdal.Dataset): Gdal dataset of an input image.
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            scratch(Scratch): Scratch space of intermediate rasters.
+
+        Returns:
+            (int): Number of tile rows.
+        """
+        num_rows = indexes[3] - indexes[1] + 1
+        if self.workers > 1:
+            return num_rows
+
+        row_bytes = (indexes[2] - indexes[0] + 1) * self.tile_size * self.tile_size * ds.RasterCount * \
+            gdal.GetDataTypeSize(ds.GetRasterBand(1).DataType) // 8
+        free = scratch.memory_limit - scratch.memory_used
+
+        return max(1, min(num_rows, free // row_bytes))
+
+
+def _cut_stripe(job):
+    """Cut tiles of a stripe of columns. Worker of Tile.cut_tiles_parallel.
+
+    Args:
+        job(tuple): tile_size, rgb, pixel_format, png_level, path, indexes, x, num_x, zoom_level, store, skip
+            tile_size(int): Tile size.
+            rgb(list(int)): Bands of the raster to cut. None for all bands.
+            pixel_format(str): Pixel format of tiles.
+            png_level(int): Compression level of png.
+            path(str): Path to a raster placed on the grid.
+            indexes(tuple): Tile indexes of the grid. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+            x(int): First column of the stripe.
+            num_x(int): Number of columns of the stripe.
+            zoom_level(int): Zoom level.
+            store(Store): Tile store shared by processes. If None, tiles are returned to the main process.
+            skip(set(tuple)): Tile indexes (x, y) of the stripe not to cut.
+    Returns:
+        x(int): First column of the stripe.
+        num_x(int): Number of columns of the stripe.
+        tiles(list(tuple)): Tile indexes (x, y) of the written tiles.
+        payloads(list(tuple)): Tiles (zoom_level, x, y, data, key) to be saved by the main process.
+        stats(dict): Deduplication statistics of the shared store. None if store is None.
+        counters(dict): Bytes read and written and seconds of building pixels and encoding. See new_counters.
+    """
+    tile_size, rgb, pixel_format, png_level, path, indexes, x, num_x, zoom_level, store, skip = job
+    buffer = BufferStore() if store is None else None
+
+    tile = Tile(tile_size, pixel_format=pixel_format, png_level=png_level, rgb=rgb)
+    tiles = tile.cut_columns(gdal.Open(path), indexes, x, num_x, zoom_level,
+                             buffer if store is None else store, skip)
+
+    if buffer is not None:
+        return x, num_x, tiles, buffer.payloads, None, tile.counters
+    return x, num_x, tiles, [], store.stats(), tile.counters
+
+
+def new_counters():
+    return {'bytes_read': 0, 'bytes_written': 0, 'pixels_time': 0.0, 'encode_time': 0.0}
+
+
+def vsimem_path(ext):
+    """Get a /vsimem path of a tile unique to the process and thread, since tiles are encoded on threads of a server."""
+    return f'/vsimem/tile_{os.getpid()}_{threading.get_ident()}.{ext}'
@@ -0,0 +1,159 @@
+# Internal functions
+from collections import OrderedDict
+import os
+import threading
+
+
+class TileCache:
+    def __init__(self, memory_size=256 * 1024 * 1024, cache_dir=None, disk_size=1024 * 1024 * 1024, ext='png'):
+        """Bounded LRU cache of rendered tiles in memory and on disk.
+
+        A tile missing in memory is looked up on disk, and rendered only if it is on neither.
+        Concurrent requests of the same tile are coalesced: one thread renders it and the others wait for it.
+        Tiles on disk in cache_dir are reused across runs, so cache_dir must be unique per scene and options.
+
+        Args:
+            memory_size(int): Maximum bytes of tiles kept in memory(Optional). Default: 256 MiB
+            cache_dir(str): Directory of tiles on disk(Optional). If not given, tiles are kept in memory only.
+                            Default: None
+            disk_size(int): Maximum bytes of tiles on disk(Optional). Default: 1 GiB
+            ext(str): File extension of tiles on disk(Optional). Default: 'png'
+        """
+        self.memory_size = memory_size
+        self.cache_dir = cache_dir
+        self.disk_size = disk_size
+        self.ext = ext
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'renders': 0, 'coalesced': 0, 'evictions': 0}
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_disk()
+
+    def get(self, key, render):
+        """Get a tile. It is rendered once if it is not cached.
+
+        Args:
+            key(tuple): Zoom level, x and y of a tile.
+            render(function): Function rendering the tile. It returns encoded tile bytes.
+        Returns:
+            data(bytes): Encoded tile. Empty bytes for an empty tile, if render returns so.
+        """
+        while True:
+            with self._lock:
+                data = self._memory.get(key)
+                if data is not None:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return data
+
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = {'done': threading.Event(), 'data': None}
+                    self._pending[key] = pending
+                    break
+                self.stats['coalesced'] += 1
+
+            # Another thread is rendering the tile. Render it again only if it failed.
+            pending['done'].wait()
+            if pending['data'] is not None:
+                return pending['data']
+
+        try:
+            data = self._read_disk(key)
+            if data is None:
+                data = render()
+                self._write_disk(key, data)
+                with self._lock:
+                    self.stats['renders'] += 1
+            with self._lock:
+                self._put_memory(key, data)
+            pending['data'] = data
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending['done'].set()
+
+        return data
+
+    def _put_memory(self, key, data):
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_size and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats['evictions'] += 1
+
+    def _path(self, key):
+        zoom_level, x, y = key
+        return os.path.join(self.cache_dir, str(zoom_level), str(x), f'{y}.{self.ext}')
+
+    def _load_disk(self):
+        """Index tiles on disk from a previous run, the least recently used first."""
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                stem, ext = os.path.splitext(name)
+                rel = os.path.relpath(root, self.cache_dir).split(os.sep)
+                if ext != '.' + self.ext or len(rel) != 2 or not all(v.isdigit() for v in rel + [stem]):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                files.append((stat.st_mtime, (int(rel[0]), int(rel[1]), int(stem)), stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        with self._lock:
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Recently used in the next run.
+        except OSError:  # Evicted by another thread
+            return None
+
+        with self._lock:
+            self.stats['disk_hits'] += 1
+
+        return data
+
+    def _write_disk(self, key, data):
+        if self.cache_dir is None:
+            return
+
+        # Write and rename so that other threads or runs never read a partial file.
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            while self._disk_bytes > self.disk_size and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
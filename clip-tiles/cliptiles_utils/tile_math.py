@@ -0,0 +1,229 @@
+# External functions
+import numpy as np
+
+# Maximum latitude of Web Mercator tiles.
+LAT_MAX = 85.0511287798066
+# Half of the circumference of the earth in Web Mercator(EPSG:3857) meters.
+MERCATOR_MAX = 20037508.342789244
+# Maximum number of (tile, edge) pairs polygon_tiles tests at once.
+MAX_PAIRS = 1024 * 1024
+
+
+def lonlat_to_tile(lon_deg, lat_deg, zoom_level):
+    """Get tile X, Y indexes of points.
+
+    Vectorized version of Tile.lonlat2tile. Latitudes are clipped to the range of Web Mercator tiles,
+    and indexes are clipped to the valid range of the zoom level.
+
+    Args:
+        lon_deg(ndarray): Longitudes in degree. Any shape.
+        lat_deg(ndarray): Latitudes in degree. The same shape as lon_deg.
+        zoom_level(int): Zoom level of tiles.
+
+    Returns:
+        x(ndarray): int64 X indexes of tiles.
+        y(ndarray): int64 Y indexes of tiles.
+    """
+    n = 2 ** zoom_level
+    fx, fy = lonlat_to_tile_coords(lon_deg, lat_deg, zoom_level)
+    x = np.clip(np.floor(fx), 0, n - 1).astype(np.int64)
+    y = np.clip(np.floor(fy), 0, n - 1).astype(np.int64)
+
+    return x, y
+
+
+def lonlat_to_tile_coords(lon_deg, lat_deg, zoom_level):
+    """Get fractional tile coordinates of points. Integer parts are tile indexes.
+
+    Args:
+        lon_deg(ndarray): Longitudes in degree. Any shape.
+        lat_deg(ndarray): Latitudes in degree. The same shape as lon_deg.
+        zoom_level(int): Zoom level of tiles.
+
+    Returns:
+        fx(ndarray): float64 X coordinates in tiles.
+        fy(ndarray): float64 Y coordinates in tiles.
+    """
+    n = 2 ** zoom_level
+    lon_deg = np.asarray(lon_deg, dtype=np.float64)
+    lat_rad = np.radians(np.clip(np.asarray(lat_deg, dtype=np.float64), -LAT_MAX, LAT_MAX))
+
+    fx = (180 + lon_deg) / 360 * n
+    fy = (1 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2 * n
+
+    return fx, fy
+
+
+def tile_to_lonlat(x, y, zoom_level):
+    """Get longitude and latitude bounds of tiles.
+
+    Vectorized version of Tile.tile2lonlat. Maximum longitudes and minimum latitudes are moved into the tiles
+    by 1e-8 degree, so that the bounds do not touch neighbouring tiles.
+
+    Args:
+        x(ndarray): X indexes of tiles. Any shape.
+        y(ndarray): Y indexes of tiles. The same shape as x.
+        zoom_level(int): Zoom level of tiles.
+
+    Returns:
+        (ndarray): lon_deg_min, lat_deg_min, lon_deg_max, lat_deg_max. Each has the shape of x.
+    """
+    n = 2 ** zoom_level
+    eps = 1e-8
+
+    # Secure x, y index are in the valid range.
+    x = np.asarray(x) % n
+    y = np.asarray(y) % n
+
+    lon_deg_min = x / n * 360 - 180
+    lat_deg_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    lon_deg_max = (x + 1) / n * 360 - 180 - eps
+    lat_deg_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n)))) + eps
+
+    return lon_deg_min, lat_deg_min, lon_deg_max, lat_deg_max
+
+
+def tile_to_mercator(x, y, zoom_level):
+    """Get Web Mercator(EPSG:3857) bounds of tiles.
+
+    Args:
+        x(ndarray): X indexes of tiles. Any shape.
+        y(ndarray): Y indexes of tiles. The same shape as x.
+        zoom_level(int): Zoom level of tiles.
+
+    Returns:
+        (ndarray): x_min, y_min, x_max, y_max in meters. Each has the shape of x.
+    """
+    size = 2 * MERCATOR_MAX / 2 ** zoom_level
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    return x * size - MERCATOR_MAX, MERCATOR_MAX - (y + 1) * size, (x + 1) * size - MERCATOR_MAX, MERCATOR_MAX - y * size
+
+
+def tile_parents(x, y, zoom_level, parent_zoom_level):
+    """Get indexes of parent tiles.
+
+    Args:
+        x(ndarray): X indexes of tiles. Any shape.
+        y(ndarray): Y indexes of tiles. The same shape as x.
+        zoom_level(int): Zoom level of the tiles.
+        parent_zoom_level(int): Zoom level of the parents. It must be less than or the same as zoom_level.
+
+    Returns:
+        x(ndarray): X indexes of the parents.
+        y(ndarray): Y indexes of the parents.
+    """
+    if parent_zoom_level > zoom_level:
+        raise ValueError(f'Zoom level of parents must be less than or the same as {zoom_level}: {parent_zoom_level}')
+
+    shift = zoom_level - parent_zoom_level
+
+    return np.right_shift(x, shift), np.right_shift(y, shift)
+
+
+def tile_children(x, y, zoom_level, child_zoom_level):
+    """Get indexes of child tiles.
+
+    Children of a tile are ordered row by row, and those of tiles are concatenated in order of the tiles.
+
+    Args:
+        x(ndarray): X indexes of tiles. shape: (n,)
+        y(ndarray): Y indexes of tiles. shape: (n,)
+        zoom_level(int): Zoom level of the tiles.
+        child_zoom_level(int): Zoom level of the children. It must be greater than or the same as zoom_level.
+
+    Returns:
+        x(ndarray): X indexes of the children. shape: (n * 4 ** (child_zoom_level - zoom_level),)
+        y(ndarray): Y indexes of the children. shape: (n * 4 ** (child_zoom_level - zoom_level),)
+    """
+    if child_zoom_level < zoom_level:
+        raise ValueError(f'Zoom level of children must be greater than or the same as {zoom_level}: '
+                         f'{child_zoom_level}')
+
+    shift = child_zoom_level - zoom_level
+    offset = np.arange(2 ** shift)
+    x = np.left_shift(np.asarray(x, dtype=np.int64), shift)[:, None, None] + offset[None, None, :]
+    y = np.left_shift(np.asarray(y, dtype=np.int64), shift)[:, None, None] + offset[None, :, None]
+    x, y = np.broadcast_arrays(x, y)
+
+    return x.ravel(), y.ravel()
+
+
+def polygon_tiles(lon_deg, lat_deg, zoom_level):
+    """Get indexes of tiles intersecting a polygon.
+
+    A tile intersects the polygon if its interior overlaps the polygon; tiles only touching it are excluded.
+    Edges of the polygon are straight lines in Web Mercator, so densify long edges in lat./lon. beforehand.
+    The polygon must not cross the antimeridian.
+    Tiles in the bounding box of the polygon are tested against all edges in chunks of up to MAX_PAIRS pairs,
+    so memory does not grow with the number of the tiles.
+
+    Args:
+        lon_deg(ndarray): Longitudes of vertexes of the polygon in degree. The ring can be open or closed. shape: (m,)
+        lat_deg(ndarray): Latitudes of vertexes of the polygon in degree. shape: (m,)
+        zoom_level(int): Zoom level of tiles.
+
+    Returns:
+        x(ndarray): int64 X indexes of the tiles ordered row by row. shape: (k,)
+        y(ndarray): int64 Y indexes of the tiles ordered row by row. shape: (k,)
+    """
+    fx, fy = lonlat_to_tile_coords(np.ravel(lon_deg), np.ravel(lat_deg), zoom_level)
+    n = 2 ** zoom_level
+    x_min, x_max = np.clip(np.floor([fx.min(), fx.max()]), 0, n - 1).astype(int)
+    y_min, y_max = np.clip(np.floor([fy.min(), fy.max()]), 0, n - 1).astype(int)
+    width = x_max - x_min + 1
+    num_tiles = width * (y_max - y_min + 1)
+    chunk = max(MAX_PAIRS // len(fx), 1)
+
+    xs, ys = [], []
+    for start in range(0, num_tiles, chunk):
+        # Tiles of the bounding box row by row.
+        index = np.arange(start, min(start + chunk, num_tiles))
+        x = x_min + index % width
+        y = y_min + index // width
+        mask = _polygon_mask(x, y, fx, fy)
+        xs.append(x[mask])
+        ys.append(y[mask])
+
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def _polygon_mask(x, y, fx, fy):
+    """Test tiles against a polygon in tile coordinates. See polygon_tiles."""
+    # Edges (x0, y0) -> (x1, y1) of the ring.
+    x0, y0 = fx[None, :], fy[None, :]
+    x1, y1 = np.roll(fx, -1)[None, :], np.roll(fy, -1)[None, :]
+
+    # Edges crossing interiors of tiles: clip segments to the open tile boxes(Liang-Barsky).
+    t_enter, t_exit = _clip_interval(x0, x1 - x0, x[:, None])
+    t_enter_y, t_exit_y = _clip_interval(y0, y1 - y0, y[:, None])
+    t_enter = np.maximum(np.maximum(t_enter, t_enter_y), 0)
+    t_exit = np.minimum(np.minimum(t_exit, t_exit_y), 1)
+    crossed = (t_enter < t_exit).any(axis=1)
+
+    # Tiles without crossing edges are entirely inside or outside: test their centers(even-odd rule).
+    cx, cy = x[:, None] + 0.5, y[:, None] + 0.5
+    straddle = (y0 > cy) != (y1 > cy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (cy - y0) * (x1 - x0) / (y1 - y0)
+    inside = np.count_nonzero(straddle & (cx < x_cross), axis=1) % 2 == 1
+
+    return crossed | inside
+
+
+def _clip_interval(p0, d, lo):
+    """Get the parameter interval of segments p0 + t * d inside open slabs (lo, lo + 1) along an axis."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (lo - p0) / d
+        t2 = (lo + 1 - p0) / d
+    t_enter = np.minimum(t1, t2)
+    t_exit = np.maximum(t1, t2)
+
+    # Segments parallel to the slabs are inside for all t or none.
+    parallel = d == 0
+    inside = (lo < p0) & (p0 < lo + 1)
+    t_enter = np.where(parallel, -np.inf, t_enter)
+    t_exit = np.where(parallel, np.where(inside, np.inf, -np.inf), t_exit)
+
+    return t_enter, t_exit
@@ -0,0 +1,170 @@
+# Internal functions
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+
+# External functions
+from osgeo import gdal
+
+# Project functions
+from .tile import Tile
+from .tile_math import tile_to_mercator
+from .warp import WarpConfig
+
+# Content types per tile format.
+CONTENT_TYPES = {'png': 'image/png', 'webp': 'image/webp'}
+# Path of a tile. /[Zoom level]/[X]/[Y].[png or webp]
+TILE_PATH = re.compile(r'^/(\d+)/(\d+)/(\d+)\.(png|webp)$')
+
+
+class TileRenderer:
+    def __init__(self, path, tile_size=256, warp_config=None, pixel_format='rgba', png_level=6, rgb=None):
+        """Render tiles of a normalized image on demand.
+
+        A tile is warped alone from the image onto its Web Mercator bounds and encoded,
+        so a tile costs a windowed read of the image(or of an overview at low zoom levels) and a warp of a tile.
+        Each thread has its own dataset handle and Tile, since neither is thread-safe.
+
+        Args:
+            path(str): Path to the normalized image. E.g., FileIO.ds.GetDescription() after FileIO.open
+            tile_size(int): Tile size(Optional). Default: 256
+            warp_config(WarpConfig): Options of warps(Optional). If not given, default options are used. Default: None
+            pixel_format(str): Pixel format of tiles. See Tile(Optional). Default: 'rgba'
+            png_level(int): Compression level of png(Optional). Default: 6
+            rgb(list(int)): Bands of the image to render(Optional). If not given, the ones of Tile are used.
+                            Default: None
+        """
+        self.path = path
+        self.tile_size = tile_size
+        self.warp_config = warp_config if warp_config is not None else WarpConfig(verbose=False)
+        self.pixel_format = pixel_format
+        self.png_level = png_level
+        self.rgb = rgb
+        self.tile_format = Tile(tile_size, pixel_format=pixel_format).tile_format
+
+        self._grids = {}
+        self._local = threading.local()
+
+    def _thread(self):
+        """Get the Tile and the dataset of the current thread."""
+        if not hasattr(self._local, 'tile'):
+            # Timings of warps are not kept, since a server warps as many times as tiles.
+            warp_config = WarpConfig(threads=self.warp_config.threads,
+                                     memory_limit=self.warp_config.memory_limit,
+                                     resampling=self.warp_config.resampling,
+                                     verbose=False)
+            self._local.tile = Tile(self.tile_size, warp_config=warp_config, pixel_format=self.pixel_format,
+                                    png_level=self.png_level, rgb=self.rgb)
+            self._local.ds = gdal.Open(self.path)
+
+        return self._local.tile, self._local.ds
+
+    def get_grid(self, zoom_level):
+        """Get tile indexes covering the image at a zoom level.
+
+        Returns:
+            (tuple): Tile indexes. (tile_x_tl, tile_y_tl, tile_x_br, tile_y_br)
+        """
+        indexes = self._grids.get(zoom_level)
+        if indexes is None:
+            tile, ds = self._thread()
+            indexes, _ = tile.create_tile_grid(ds, zoom_level)
+            self._grids[zoom_level] = indexes
+
+        return indexes
+
+    def render(self, zoom_level, x, y):
+        """Render a tile.
+
+        Args:
+            zoom_level(int): Zoom level.
+            x(int): X index of the tile.
+            y(int): Y index of the tile.
+        Returns:
+            data(bytes): Encoded tile. Empty bytes if the tile is outside the image or fully transparent.
+        """
+        indexes = self.get_grid(zoom_level)
+        if not (indexes[0] <= x <= indexes[2] and indexes[1] <= y <= indexes[3]):
+            return b''
+
+        tile, ds = self._thread()
+        bounds = [float(v) for v in tile_to_mercator(x, y, zoom_level)]
+        grid_ds = tile.warp_config.warp('',
+                                        ds,
+                                        name=f'{zoom_level}/{x}/{y}',
+                                        format='MEM',
+                                        dstSRS='EPSG:3857',
+                                        outputBounds=bounds,
+                                        width=self.tile_size,
+                                        height=self.tile_size,
+                                        outputType=ds.GetRasterBand(1).DataType)
+        tile.warp_config.timings.clear()
+
+        img = tile.read_window(grid_ds, 0, 0, self.tile_size, self.tile_size)
+        pixels, alpha = tile.to_pixels(img)
+        if not alpha.any():
+            return b''
+
+        return tile.encode_tile(pixels)
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    """Serve /[Zoom level]/[X]/[Y].[png or webp] from the renderer and the cache of the server.
+
+    Empty tiles are 404 as the ones not written by cliptiles.py. /stats gives statistics of the cache.
+    """
+    def do_GET(self):
+        if self.path == '/stats':
+            return self.send(200, 'application/json', json.dumps(self.server.cache.stats).encode())
+
+        match = TILE_PATH.match(self.path.split('?')[0])
+        if match is None:
+            return self.send(404, 'text/plain', b'Not found')
+        zoom_level, x, y = (int(v) for v in match.groups()[:3])
+        if match.group(4) != self.server.renderer.tile_format or zoom_level > 20 \
+                or x >= 2 ** zoom_level or y >= 2 ** zoom_level:
+            return self.send(404, 'text/plain', b'Not found')
+
+        key = (zoom_level, x, y)
+        data = self.server.cache.get(key, lambda: self.server.renderer.render(*key))
+        if not data:
+            return self.send(404, 'text/plain', b'Empty tile')
+
+        self.send(200, CONTENT_TYPES[self.server.renderer.tile_format], data)
+
+    def send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')  # Viewers on other origins, e.g., a notebook
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(renderer, cache, host='127.0.0.1', port=8000, verbose=False):
+    """Serve tiles until interrupted.
+
+    Args:
+        renderer(TileRenderer): Renderer of tiles.
+        cache(TileCache): Cache of rendered tiles.
+        host(str): Address to listen on(Optional). Default: '127.0.0.1'
+        port(int): Port to listen on(Optional). Default: 8000
+        verbose(bool): Log requests(Optional). Default: False
+    """
+    server = ThreadingHTTPServer((host, port), TileHandler)
+    server.daemon_threads = True
+    server.renderer = renderer
+    server.cache = cache
+    server.verbose = verbose
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
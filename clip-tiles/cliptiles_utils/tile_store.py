@@ -0,0 +1,340 @@
+# Internal functions
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+
+# Project functions
+from .registry import Registry
+
+Store = Registry('Store')
+
+# Name of a manifest file listing the tiles written in a zoom-level directory.
+MANIFEST = 'manifest.json'
+# Number of recent unique tiles a duplicate is linked to.
+NUM_LINKS = 4096
+
+
+@Store.register_module('xyz')
+class XYZStore:
+    # Worker processes can write tiles on their own.
+    shared = True
+
+    def __init__(self, output_dir, dedup=False, resume=False, tile_format='png'):
+        """Store tiles as [Zoom level]/[X coordinate]/[Y coordinate].[tile_format] files.
+
+        Tiles written in each zoom level are listed in [Zoom level]/manifest.json.
+        If dedup is True, a tile identical to one of recent unique tiles is written as a hard link to its file.
+
+        Args:
+            output_dir(str): Path to an output directory.
+            dedup(bool): Write identical tiles as hard links(Optional). Default: False
+            resume(bool): Not used. Existing tile files are overwritten when they are written again(Optional).
+                          Default: False
+            tile_format(str): File format of tiles. png or webp(Optional). Default: 'png'
+        """
+        self.output_dir = output_dir
+        self.dedup = dedup
+        self.ext = '.' + tile_format
+        self._dirs = set()
+        self._links = OrderedDict()  # Hash of pixels -> path to a file
+        self._paths = {}  # Path to a file -> hash of pixels
+        self._stats = new_stats()
+
+    def __getstate__(self):
+        # A copy in a worker process starts with empty statistics. See Tile.cut_tiles_parallel.
+        state = self.__dict__.copy()
+        state['_links'] = OrderedDict()
+        state['_paths'] = {}
+        state['_stats'] = new_stats()
+        return state
+
+    def put(self, zoom_level, x, y, data, key=None):
+        """Write a tile.
+
+        Args:
+            zoom_level(int): Zoom level.
+            x(int): X index of a tile.
+            y(int): Y index of a tile.
+            data(bytes): Encoded png tile.
+            key(str): Hash of pixels of the tile(Optional). Tiles with the same key are identical. Default: None
+        """
+        path_x = os.path.join(self.output_dir, str(zoom_level), str(x))
+        if path_x not in self._dirs:
+            os.makedirs(path_x, exist_ok=True)
+            self._dirs.add(path_x)
+        path = os.path.join(path_x, str(y) + self.ext)
+
+        # Files can be linked to others, so they are replaced, not overwritten.
+        if os.path.lexists(path):
+            os.remove(path)
+            self._links.pop(self._paths.pop(path, None), None)
+
+        self._stats['tiles'] += 1
+        if self.dedup and key is not None and key in self._links:
+            self._links.move_to_end(key)
+            try:
+                os.link(self._links[key], path)
+                self._stats['duplicates'] += 1
+                self._stats['bytes_saved'] += len(data)
+                return
+            except OSError:  # File system without hard links or a removed file.
+                del self._paths[self._links.pop(key)]
+
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._stats['unique'] += 1
+        if self.dedup and key is not None:
+            self._links[key] = path
+            self._paths[path] = key
+            if len(self._links) > NUM_LINKS:
+                del self._paths[self._links.popitem(last=False)[1]]
+
+    def get(self, zoom_level, x, y):
+        """Read a tile.
+
+        Args:
+            zoom_level(int): Zoom level.
+            x(int): X index of a tile.
+            y(int): Y index of a tile.
+        Returns:
+            data(bytes): Encoded png tile. None if the tile does not exist.
+        """
+        path = os.path.join(self.output_dir, str(zoom_level), str(x), str(y) + self.ext)
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def tiles(self, zoom_level):
+        """Get tiles written in a zoom level.
+
+        Args:
+            zoom_level(int): Zoom level.
+        Returns:
+            (list(tuple)): Tile indexes (x, y).
+        """
+        with open(os.path.join(self.output_dir, str(zoom_level), MANIFEST), 'r') as f:
+            manifest = json.load(f)
+
+        return [tuple(tile) for tile in manifest['tiles']]
+
+    def commit(self, zoom_level, tiles):
+        """Finish writing a zoom level and write its manifest.
+
+        Args:
+            zoom_level(int): Zoom level.
+            tiles(list(tuple)): Tile indexes (x, y) written in the zoom level.
+        """
+        path_z = os.path.join(self.output_dir, str(zoom_level))
+        os.makedirs(path_z, exist_ok=True)
+        manifest = {'zoom': zoom_level,
+                    'tiles': sorted([list(tile) for tile in tiles])}
+        with open(os.path.join(path_z, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+    def flush(self):
+        pass
+
+    def stats(self):
+        """Get deduplication statistics of the run.
+
+        Returns:
+            (dict): Number of tiles, unique tiles, duplicates and bytes saved by deduplication.
+        """
+        return dict(self._stats)
+
+    def add_stats(self, stats):
+        """Add statistics of a copy of the store in a worker process."""
+        for name, value in stats.items():
+            self._stats[name] += value
+
+    def set_metadata(self, **metadata):
+        pass
+
+    def close(self):
+        pass
+
+
+@Store.register_module('mbtiles')
+class MBTilesStore:
+    # SQLite archive is written by one process only.
+    shared = False
+
+    def __init__(self, output_dir, dedup=False, resume=False, tile_format='png', batch_size=1000):
+        """Store tiles in a MBTiles(SQLite) archive, [output_dir]/tiles.mbtiles.
+
+        Tiles are inserted in batches of transactions.
+        Reference: https://github.com/mapbox/mbtiles-spec/blob/master/1.3/spec.md
+
+        Args:
+            output_dir(str): Path to an output directory.
+            dedup(bool): Store identical tiles once(Optional). Default: False
+            resume(bool): Keep tiles of an existing archive. Otherwise, the archive is recreated(Optional).
+                          Default: False
+            tile_format(str): File format of tiles. png or webp(Optional). Default: 'png'
+            batch_size(int): Number of tiles inserted in a transaction(Optional). Default: 1000
+        """
+        self.path = os.path.join(output_dir, 'tiles.mbtiles')
+        self.dedup = dedup
+        self.tile_format = tile_format
+        self.batch_size = batch_size
+        self._batch = []
+
+        os.makedirs(output_dir, exist_ok=True)
+        if not resume and os.path.isfile(self.path):
+            os.remove(self.path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute('PRAGMA journal_mode=MEMORY')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)')
+        if self.dedup:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS map (zoom_level INTEGER, tile_column INTEGER, '
+                              'tile_row INTEGER, tile_id TEXT, PRIMARY KEY (zoom_level, tile_column, tile_row))')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB)')
+            self.conn.execute('CREATE VIEW IF NOT EXISTS tiles AS SELECT map.zoom_level AS zoom_level, '
+                              'map.tile_column AS tile_column, map.tile_row AS tile_row, images.tile_data AS tile_data '
+                              'FROM map JOIN images ON map.tile_id = images.tile_id')
+        else:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, '
+                              'tile_row INTEGER, tile_data BLOB, PRIMARY KEY (zoom_level, tile_column, tile_row))')
+        self.conn.commit()
+
+    def put(self, zoom_level, x, y, data, key=None):
+        """Add a tile to the current batch.
+
+        Args:
+            zoom_level(int): Zoom level.
+            x(int): X index of a tile.
+            y(int): Y index of a tile.
+            data(bytes): Encoded png tile.
+            key(str): Hash of pixels of the tile(Optional). If dedup is True, it is the id of the tile image.
+                      If not given, the id is MD5 of the encoded tile. Default: None
+        """
+        self._batch.append((zoom_level, x, self.flip_y(y, zoom_level), data, key))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def get(self, zoom_level, x, y):
+        """Read a tile.
+
+        Args:
+            zoom_level(int): Zoom level.
+            x(int): X index of a tile.
+            y(int): Y index of a tile.
+        Returns:
+            data(bytes): Encoded png tile. None if the tile does not exist.
+        """
+        self.flush()
+        row = self.conn.execute('SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?',
+                                (zoom_level, x, self.flip_y(y, zoom_level))).fetchone()
+
+        return None if row is None else bytes(row[0])
+
+    def tiles(self, zoom_level):
+        """Get tiles written in a zoom level.
+
+        Args:
+            zoom_level(int): Zoom level.
+        Returns:
+            (list(tuple)): Tile indexes (x, y).
+        """
+        self.flush()
+        table = 'map' if self.dedup else 'tiles'
+        rows = self.conn.execute(f'SELECT tile_column, tile_row FROM {table} WHERE zoom_level=?', (zoom_level,))
+
+        return [(x, self.flip_y(y, zoom_level)) for x, y in rows]
+
+    def flush(self):
+        """Insert tiles of the current batch in a transaction."""
+        if not self._batch:
+            return
+
+        with self.conn:
+            if self.dedup:
+                images = {}
+                tiles = []
+                for zoom_level, x, y, data, key in self._batch:
+                    tile_id = key or hashlib.md5(data).hexdigest()
+                    images[tile_id] = data
+                    tiles.append((zoom_level, x, y, tile_id))
+                self.conn.executemany('INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)',
+                                      images.items())
+                self.conn.executemany('INSERT OR REPLACE INTO map (zoom_level, tile_column, tile_row, tile_id) '
+                                      'VALUES (?, ?, ?, ?)', tiles)
+            else:
+                self.conn.executemany('INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) '
+                                      'VALUES (?, ?, ?, ?)', [tile[:4] for tile in self._batch])
+        self._batch = []
+
+    def commit(self, zoom_level, tiles):
+        """Finish writing a zoom level.
+
+        Args:
+            zoom_level(int): Zoom level.
+            tiles(list(tuple)): Tile indexes (x, y) written in the zoom level.
+        """
+        self.flush()
+
+    def stats(self):
+        """Get deduplication statistics of the archive.
+
+        Returns:
+            (dict): Number of tiles, unique tiles, duplicates and bytes saved by deduplication.
+        """
+        self.flush()
+        if self.dedup:
+            num_tiles, num_bytes = self.conn.execute('SELECT COUNT(*), TOTAL(LENGTH(tile_data)) FROM tiles').fetchone()
+            num_unique, unique_bytes = self.conn.execute('SELECT COUNT(*), TOTAL(LENGTH(tile_data)) '
+                                                         'FROM images').fetchone()
+        else:
+            num_tiles = num_unique = self.conn.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+            num_bytes = unique_bytes = 0
+
+        return {'tiles': num_tiles, 'unique': num_unique, 'duplicates': num_tiles - num_unique,
+                'bytes_saved': int(num_bytes - unique_bytes)}
+
+    def set_metadata(self, **metadata):
+        """Set values of the metadata table.
+
+        Args:
+            metadata(dict): Names and values of metadata. E.g., bounds='126.9,37.5,127.0,37.6'
+        """
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)',
+                                  [(name, str(value)) for name, value in metadata.items()])
+
+    def close(self):
+        self.flush()
+        table = 'map' if self.dedup else 'tiles'
+        zoom_min, zoom_max = self.conn.execute(f'SELECT MIN(zoom_level), MAX(zoom_level) FROM {table}').fetchone()
+        if zoom_min is not None:
+            self.set_metadata(name=os.path.basename(os.path.dirname(os.path.abspath(self.path))),
+                              format=self.tile_format,
+                              type='overlay',
+                              version='1.1',
+                              minzoom=zoom_min,
+                              maxzoom=zoom_max)
+        self.conn.close()
+
+    @staticmethod
+    def flip_y(y, zoom_level):
+        """Convert Y index between XYZ and TMS scheme. MBTiles uses TMS scheme."""
+        return 2 ** zoom_level - 1 - y
+
+
+class BufferStore:
+    shared = False
+
+    def __init__(self):
+        """Keep tiles in memory. Worker processes hand tiles to a store which is not shared through it."""
+        self.payloads = []
+
+    def put(self, zoom_level, x, y, data, key=None):
+        self.payloads.append((zoom_level, x, y, data, key))
+
+
+def new_stats():
+    return {'tiles': 0, 'unique': 0, 'duplicates': 0, 'bytes_saved': 0}
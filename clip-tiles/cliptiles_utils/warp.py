@@ -0,0 +1,58 @@
+# Internal functions
+import time
+
+# External functions
+from osgeo import gdal
+
+
+class WarpConfig:
+    def __init__(self, threads=1, memory_limit=None, cache_size=None, resampling='near', verbose=True):
+        """Options shared by every warp.
+
+        If cache_size is given, it sets the size of GDAL block cache of the process.
+
+        Args:
+            threads(int): Number of threads of a warp. 0 uses all CPUs(Optional). Default: 1
+            memory_limit(int): Memory of a warp in MB. A warp is processed in chunks of this size(Optional).
+                               If not given, GDAL default(64 MB) is used. Default: None
+            cache_size(int): Size of GDAL block cache in MB(Optional). If not given, GDAL default is used. Default: None
+            resampling(str): Resampling method. E.g., near, bilinear, cubic, average, mode(Optional). Default: 'near'
+            verbose(bool): Print how long each warp took(Optional). Default: True
+        """
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self.cache_size = cache_size
+        self.resampling = resampling
+        self.verbose = verbose
+        self.timings = []
+
+        if cache_size:
+            gdal.SetCacheMax(cache_size * 1024 * 1024)
+
+    def warp(self, dst, src, name='warp', **kwargs):
+        """Warp a dataset with the shared options.
+
+        Args:
+            dst(str): Path to an output dataset.
+            src(gdal.Dataset): Gdal dataset to warp.
+            name(str): Name of the warp to report(Optional). Default: 'warp'
+            kwargs(dict): Other options of gdal.WarpOptions. E.g., dstSRS, outputBounds, width, height
+        Returns:
+            ds(gdal.Dataset): Warped dataset.
+        """
+        num_threads = 'ALL_CPUS' if self.threads == 0 else str(self.threads)
+        options = gdal.WarpOptions(multithread=self.threads != 1,
+                                   warpOptions=[f'NUM_THREADS={num_threads}'],
+                                   warpMemoryLimit=self.memory_limit * 1024 * 1024 if self.memory_limit else None,
+                                   resampleAlg=self.resampling,
+                                   **kwargs)
+
+        start = time.perf_counter()
+        ds = gdal.Warp(dst, src, options=options)
+        elapsed = time.perf_counter() - start
+
+        self.timings.append((name, elapsed))
+        if self.verbose:
+            print(f'Warp({name}): {elapsed:.2f} s')
+
+        return ds
@@ -0,0 +1,89 @@
+"""Make cliptiles_utils importable by tests.
+
+If GDAL is not installed, cliptiles_utils/__init__.py(which imports GDAL through FileIO and Tile) is not executed,
+so that modules using numpy and the standard library only are still tested. Tests of GDAL code are skipped then.
+"""
+# Internal functions
+import importlib.util
+import os
+import sys
+import types
+
+# External functions
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+if importlib.util.find_spec('osgeo') is None:
+    package = types.ModuleType('cliptiles_utils')
+    package.__path__ = [os.path.join(ROOT, 'cliptiles_utils')]
+    sys.modules['cliptiles_utils'] = package
+
+
+@pytest.fixture(scope='session')
+def scenes(tmp_path_factory):
+    """Synthetic scenes of cliptiles_bench.py. SAR(K5, single-band) and EO(K3A, red/green/blue files) of 512 x 512 pixels.
+
+    Tests using them are skipped without GDAL.
+    """
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_bench import make_scene
+
+    work_dir = str(tmp_path_factory.mktemp('scenes'))
+    return {kind: make_scene(work_dir, kind, 512, 5) for kind in ('sar', 'eo')}
+
+
+@pytest.fixture(scope='session')
+def tiler():
+    """Tile a scene as cliptiles.py does.
+
+    Returns:
+        tile_scene(function): tile_scene(paths, output_dir, zoom_min, zoom_max, tile_options=None, file_options=None,
+                              **write_options) runs FileIO.open and FileIO.write, and returns (report, tile).
+    """
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_utils import FileIO, Tile, WarpConfig, get_sensor
+
+    def tile_scene(paths, output_dir, zoom_min, zoom_max, tile_options=None, file_options=None, **write_options):
+        tile_options = dict(tile_options or {})
+        tile_options.setdefault('warp_config', WarpConfig(verbose=False))
+        tile = Tile(256, **tile_options)
+        file_io = FileIO(get_sensor(os.path.basename(paths[0])), **(file_options or {}))
+        try:
+            file_io.open(path=paths, epsg=3857)
+            report = file_io.write(tile=tile, output_dir=str(output_dir), zoom_min=zoom_min, zoom_max=zoom_max,
+                                   **write_options)
+        finally:
+            file_io.close()
+
+        return report, tile
+
+    return tile_scene
+
+
+def read_xyz(output_dir, ext='png'):
+    """Read tiles of a xyz directory.
+
+    Args:
+        output_dir(str): Directory of [Zoom level]/[X]/[Y].[ext] files.
+        ext(str): Extension of tiles(Optional). Default: 'png'
+    Returns:
+        tiles(dict): Encoded tiles by (zoom level, x, y).
+    """
+    tiles = {}
+    for root, _, files in os.walk(str(output_dir)):
+        for name in files:
+            if not name.endswith(f'.{ext}'):
+                continue
+            zoom, x = os.path.relpath(root, str(output_dir)).split(os.sep)
+            with open(os.path.join(root, name), 'rb') as f:
+                tiles[int(zoom), int(x), int(name.split('.')[0])] = f.read()
+
+    return tiles
+
+
+@pytest.fixture(scope='session')
+def xyz_tiles():
+    """Read tiles of a xyz directory. See read_xyz."""
+    return read_xyz
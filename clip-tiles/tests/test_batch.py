@@ -0,0 +1,77 @@
+# Internal functions
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+# External functions
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def touch(directory, *names):
+    for name in names:
+        (directory / name).write_bytes(b'')
+
+
+def test_find_scenes_in_directory(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_batch import find_scenes
+
+    touch(tmp_path, 'K3A_01_red.tif', 'K3A_01_green.tif', 'K3A_01_blue.tif', 'K3A_02_R.tif', 'K3A_02_nir.tif',
+          'K5_03_HH.tif', 'K5_04_L1A.h5', 'notes.txt')
+    scenes = find_scenes(str(tmp_path))
+
+    # Complete red, green and blue files are a scene in rgb order. Others are single-band scenes.
+    assert [(name, [os.path.basename(path) for path in files]) for name, files in scenes] == [
+        ('K3A_01', ['K3A_01_red.tif', 'K3A_01_green.tif', 'K3A_01_blue.tif']),
+        ('K3A_02_R', ['K3A_02_R.tif']),
+        ('K3A_02_nir', ['K3A_02_nir.tif']),
+        ('K5_03_HH', ['K5_03_HH.tif']),
+        ('K5_04_L1A', ['K5_04_L1A.h5'])]
+
+
+def test_find_scenes_in_manifest(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_batch import find_scenes
+
+    manifest = tmp_path / 'scenes.txt'
+    manifest.write_text('# Scenes\n'
+                        'K3A_01_red.tif, K3A_01_green.tif, K3A_01_blue.tif\n'
+                        '\n'
+                        'a/K5_03_HH.tif\n'
+                        'b/K5_03_HH.tif\n')
+    scenes = find_scenes(str(manifest))
+
+    # Paths are relative to the manifest, and names are unique.
+    assert scenes == [('K3A_01', [str(tmp_path / f'K3A_01_{band}.tif') for band in ('red', 'green', 'blue')]),
+                      ('K5_03_HH', [str(tmp_path / 'a' / 'K5_03_HH.tif')]),
+                      ('K5_03_HH_1', [str(tmp_path / 'b' / 'K5_03_HH.tif')])]
+
+
+def test_batch(scenes, tiler, xyz_tiles, tmp_path):
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for path in scenes['sar'] + scenes['eo']:
+        shutil.copy(path, str(input_dir))
+    (input_dir / 'K5_broken_HH.tif').write_bytes(b'not a tiff')
+    tmp_dir = tmp_path / 'tmp'
+    tmp_dir.mkdir()
+
+    output = tmp_path / 'output'
+    subprocess.run([sys.executable, os.path.join(ROOT, 'cliptiles_batch.py'), str(input_dir), '13', '14', str(output),
+                    '--jobs', '2', '--tmp_dir', str(tmp_dir)], check=True, stdout=subprocess.DEVNULL)
+
+    with open(str(output / 'batch_summary.json')) as f:
+        summary = {job['name']: job for job in json.load(f)}
+    assert {name: job['status'] for name, job in summary.items()} == {
+        'K3A_bench512': 'done', 'K5_bench512_HH': 'done', 'K5_broken_HH': 'failed'}
+    assert summary['K5_broken_HH']['error'] and os.path.isfile(summary['K5_broken_HH']['log'])
+
+    # A failing scene does not affect the others, which are tiled as cliptiles.py does.
+    for kind, name in [('sar', 'K5_bench512_HH'), ('eo', 'K3A_bench512')]:
+        tiler(scenes[kind], tmp_path / kind, 13, 14)
+        assert xyz_tiles(output / name) == xyz_tiles(tmp_path / kind)
+    assert os.listdir(str(tmp_dir)) == []
@@ -0,0 +1,40 @@
+# External functions
+import pytest
+
+
+def test_measure_stages(scenes, tiler, xyz_tiles, tmp_path):
+    from cliptiles_bench import measure
+
+    case = {'files': scenes['sar'], 'output': str(tmp_path / 'bench'), 'zoom_min': 13, 'zoom_max': 14,
+            'tile_size': 256, 'block_size': None, 'workers': 1, 'threads': 1, 'format': 'xyz', 'pixel_format': 'rgba'}
+    result = measure(case)
+
+    assert set(result['stages']) == {'open', 'norm', 'overviews', 'write_tiles', 'warp', 'close'}
+    assert set(result['zoom_levels']) == {'13', '14'}
+    assert result['total'] == pytest.approx(sum(elapsed for name, elapsed in result['stages'].items()
+                                                if name != 'warp'))
+
+    # Tiles are the ones of cliptiles.py.
+    tiler(scenes['sar'], tmp_path / 'tiles', 13, 14)
+    tiles = xyz_tiles(tmp_path / 'tiles')
+    assert result['tiles'] == len(tiles)
+    assert xyz_tiles(case['output']) == tiles
+
+
+def test_compare_flags_regressions():
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_bench import compare
+
+    base = {'total': 10.0, 'tiles_per_s': 100.0, 'bytes': 1000, 'peak_rss_mb': 100.0,
+            'stages': {'open': 1.0, 'transform_crs': 0.01, 'write_tiles': 9.0}}
+    result = {'total': 10.5, 'tiles_per_s': 80.0, 'bytes': 1000, 'peak_rss_mb': 150.0,
+              'stages': {'open': 1.0, 'overviews': 1.0, 'write_tiles': 9.5}}
+    comparison = compare({'sar_512': result, 'eo_512': {'error': 'ValueError'}},
+                         {'sar_512': base, 'eo_512': base}, 0.1)
+
+    # Stages missing in either run, e.g., of an older baseline, are not compared.
+    regressions = {item['metric'] for item in comparison if item['regression']}
+    assert {item['metric'] for item in comparison} == {'total', 'tiles_per_s', 'bytes', 'peak_rss_mb',
+                                                       'stages.open', 'stages.write_tiles'}
+    assert regressions == {'tiles_per_s', 'peak_rss_mb'}
+    assert all(item['case'] == 'sar_512' for item in comparison)
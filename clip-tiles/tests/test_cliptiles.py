@@ -0,0 +1,39 @@
+# Internal functions
+import json
+import tracemalloc
+
+# External functions
+import pytest
+
+
+def test_run_writes_profile(scenes, tmp_path):
+    import cliptiles
+
+    events = tmp_path / 'events.jsonl'
+    cliptiles.run(cliptiles.parse_args([*scenes['sar'], '13', '14', str(tmp_path / 'tiles'),
+                                        '--profile_events', str(events), '--trace_memory']))
+
+    with open(str(tmp_path / 'tiles' / cliptiles.REPORT)) as f:
+        report = json.load(f)
+    lines = events.read_text().splitlines()
+    assert len(lines) == len(report['profile']['events']) > 0
+    assert {'read', 'norm', 'write_tiles'} <= set(report['profile']['stages'])
+    assert all('py_peak_mb' in json.loads(line) for line in lines)
+    assert not tracemalloc.is_tracing()
+
+
+def test_failed_run_closes_profiler(scenes, tmp_path, monkeypatch):
+    import cliptiles
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('write failed')
+
+    monkeypatch.setattr(cliptiles.FileIO, 'write', fail)
+    events = tmp_path / 'events.jsonl'
+    with pytest.raises(RuntimeError):
+        cliptiles.run(cliptiles.parse_args([*scenes['sar'], '13', '14', str(tmp_path / 'tiles'),
+                                            '--profile_events', str(events), '--trace_memory']))
+
+    # Tracing started by the run is stopped, and the events of stages before the failure are written.
+    assert not tracemalloc.is_tracing()
+    assert [json.loads(line)['stage'] for line in events.read_text().splitlines()][-1] == 'norm'
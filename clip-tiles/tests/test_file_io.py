@@ -0,0 +1,85 @@
+# Internal functions
+import os
+
+# External functions
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('kind', ['sar', 'eo'])
+def test_normalized_image_has_nodata(scenes, kind):
+    from cliptiles_utils import FileIO, get_sensor
+
+    file_io = FileIO(get_sensor(os.path.basename(scenes[kind][0])))
+    try:
+        file_io.open(path=scenes[kind], epsg=3857)
+        assert file_io.ds.RasterCount == (1 if kind == 'sar' else 3)
+        for idx in range(file_io.ds.RasterCount):
+            assert file_io.ds.GetRasterBand(idx+1).GetNoDataValue() == 0
+    finally:
+        file_io.close()
+
+
+def test_open_keeps_epsg_without_warping(scenes):
+    from osgeo import gdal
+    from cliptiles_utils import FileIO, Profiler, get_sensor
+
+    # The image is warped onto tile grids of zoom levels in the target system by FileIO.write.
+    profiler = Profiler()
+    file_io = FileIO(get_sensor(os.path.basename(scenes['sar'][0])), profiler=profiler)
+    try:
+        file_io.open(path=scenes['sar'], epsg=32652)
+        assert file_io.epsg == 32652
+        assert file_io.ds.GetProjection() == gdal.Open(scenes['sar'][0]).GetProjection()
+        assert file_io.ds.RasterXSize == 512
+    finally:
+        file_io.close()
+    assert [path for path in profiler.report()['stages'] if '/' not in path] == ['read', 'norm']
+
+
+
+def test_tiles_do_not_depend_on_zoom_range(scenes, tiler, xyz_tiles, tmp_path):
+    from cliptiles_utils import WarpConfig
+
+    # Overviews are built down to the minimum zoom level. Edges of the maximum one are the same without them.
+    options = {'warp_config': WarpConfig(resampling='bilinear', verbose=False)}
+    tiler(scenes['sar'], tmp_path / 'one', 16, 16, tile_options=options)
+    tiler(scenes['sar'], tmp_path / 'range', 12, 16, tile_options=options)
+
+    tiles = xyz_tiles(tmp_path / 'one')
+    tiles_range = xyz_tiles(tmp_path / 'range')
+    assert tiles
+    assert tiles == {key: data for key, data in tiles_range.items() if key[0] == 16}
+
+
+def read_normalized(paths, **file_options):
+    from cliptiles_utils import FileIO, get_sensor
+
+    file_io = FileIO(get_sensor(os.path.basename(paths[0])), **file_options)
+    try:
+        file_io.open(path=paths)
+        return file_io.ds.ReadAsArray()
+    finally:
+        file_io.close()
+
+
+@pytest.mark.parametrize('kind', ['sar', 'eo'])
+@pytest.mark.parametrize('block_size', [None, 128])
+def test_float_image_is_normalized_as_integer_one(scenes, tmp_path, kind, block_size):
+    from osgeo import gdal
+    from cliptiles_utils import StatsCache
+
+    # Float images, e.g., intensity of HDF5, are stretched with exact percentiles of their values, per band for EO.
+    paths = []
+    for path in scenes[kind]:
+        paths.append(str(tmp_path / os.path.basename(path)))
+        gdal.Translate(paths[-1], path, outputType=gdal.GDT_Float32)
+
+    expected = read_normalized(scenes[kind], block_size=block_size)
+    np.testing.assert_array_equal(read_normalized(paths, block_size=block_size), expected)
+
+    # Statistics of the float image are cached and reused.
+    stats_cache = StatsCache(str(tmp_path / 'stats'))
+    for _ in range(2):
+        np.testing.assert_array_equal(read_normalized(paths, block_size=block_size, stats_cache=stats_cache), expected)
+    assert os.listdir(str(tmp_path / 'stats'))
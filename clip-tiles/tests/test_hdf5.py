@@ -0,0 +1,85 @@
+# External functions
+import numpy as np
+import pytest
+
+CORNERS = {'TopLeftGeodeticCoordinates': (37.6, 126.9), 'TopRightGeodeticCoordinates': (37.6, 127.0),
+           'BottomLeftGeodeticCoordinates': (37.5, 126.9), 'BottomRightGeodeticCoordinates': (37.5, 127.0)}
+
+
+def make_sbi(path, height=300, width=200, attrs=True):
+    """Write a KOMPSAT-5 SBI like HDF5 file of int16 I/Q pairs in chunks of 64 rows."""
+    h5py = pytest.importorskip('h5py')
+
+    rng = np.random.default_rng(0)
+    sbi = rng.normal(0, 300, [height, width, 2]).astype(np.int16)
+    with h5py.File(path, 'w') as hf:
+        dataset = hf.create_dataset('S01/SBI', data=sbi, chunks=(64, width, 2))
+        if attrs:
+            for name, value in CORNERS.items():
+                dataset.parent.attrs[name] = value
+
+    return sbi.astype(np.float32)
+
+
+@pytest.fixture
+def scratch(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_utils import Scratch
+
+    scratch = Scratch(tmp_dir=str(tmp_path))
+    yield scratch
+    scratch.close()
+
+
+@pytest.mark.parametrize('rows', [1, 100, 1024])
+def test_read_intensity(tmp_path, scratch, rows):
+    from cliptiles_utils.hdf5 import read_intensity
+
+    path = str(tmp_path / 'K5_20190406_L1A.h5')
+    sbi = make_sbi(path)
+    ds = read_intensity(path, scratch, rows=rows)
+
+    np.testing.assert_array_equal(ds.ReadAsArray(), sbi[..., 0] ** 2 + sbi[..., 1] ** 2)
+
+    # Corner coordinates are the ones of the centers of the corner pixels.
+    gt = ds.GetGeoTransform()
+    for name, (x, y) in [('TopLeft', (0, 0)), ('BottomRight', (199, 299))]:
+        lat, lon = CORNERS[name + 'GeodeticCoordinates']
+        assert gt[0] + (x + 0.5) * gt[1] + (y + 0.5) * gt[2] == pytest.approx(lon)
+        assert gt[3] + (x + 0.5) * gt[4] + (y + 0.5) * gt[5] == pytest.approx(lat)
+
+
+def test_corners_of_aux_xml(tmp_path, scratch):
+    from cliptiles_utils.hdf5 import read_intensity
+
+    path = str(tmp_path / 'K5_20190406_L1A.h5')
+    make_sbi(path, attrs=False)
+    with pytest.raises(FileNotFoundError):
+        read_intensity(path, scratch)
+
+    # KOMPSAT-5 products keep the corners in K5_[...]_Aux.xml.
+    items = ''.join(f'<{name}>{lat} {lon}</{name}>' for name, (lat, lon) in CORNERS.items())
+    (tmp_path / 'K5_20190406_Aux.xml').write_text(f'<Auxiliary><Root><ImageInfo>{items}</ImageInfo></Root></Auxiliary>')
+    gt = read_intensity(path, scratch).GetGeoTransform()
+    assert gt[0] + 0.5 * gt[1] + 0.5 * gt[2] == pytest.approx(126.9)
+
+
+def test_open_hdf5_in_blocks(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_utils import FileIO
+
+    path = str(tmp_path / 'K5_20190406_L1A.h5')
+    make_sbi(path)
+
+    # Intensity is read and normalized block by block as the whole image.
+    images = []
+    for block_size in (None, 64):
+        file_io = FileIO('K5', block_size=block_size)
+        try:
+            file_io.open(path=[path])
+            images.append(file_io.ds.ReadAsArray())
+        finally:
+            file_io.close()
+
+    assert images[0].shape == (300, 200) and images[0].max() > 0
+    np.testing.assert_array_equal(images[1], images[0])
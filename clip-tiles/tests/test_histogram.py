@@ -0,0 +1,103 @@
+# External functions
+import numpy as np
+import pytest
+
+# Project functions
+from cliptiles_utils.histogram import NUM_BINS, apply_lut, band_histogram, channel_float_histograms, channel_histograms, \
+    float_bin_values, float_histogram, float_histogram_percentile, histogram_minmax, histogram_percentile
+from cliptiles_utils.normalization_EO import percentile_eo, percentile_eo_stats, stretch_eo
+
+PERCENTILES = [0, 0.1, 2, 25, 50, 98, 99.9, 100]
+
+
+def random_image(shape, high=4096, seed=0):
+    return np.random.default_rng(seed).integers(0, high, shape, dtype=np.uint16)
+
+
+@pytest.mark.parametrize('shape', [(1,), (2,), (101, 37), (64, 64, 3)])
+def test_histogram_percentile_matches_percentile(shape):
+    img = random_image(shape)
+
+    hist = band_histogram(img)
+    assert hist.shape == (NUM_BINS,) and hist.sum() == img.size
+    np.testing.assert_allclose(histogram_percentile(hist, PERCENTILES), np.percentile(img, PERCENTILES))
+    assert histogram_minmax(hist) == (img.min(), img.max())
+
+
+def test_histogram_of_blocks():
+    img = random_image([100, 80, 3])
+
+    hist = None
+    channels = None
+    for y in range(0, 100, 32):
+        for x in range(0, 80, 32):
+            hist = band_histogram(img[y:y+32, x:x+32], hist)
+            channels = channel_histograms(img[y:y+32, x:x+32], channels)
+
+    np.testing.assert_array_equal(hist, band_histogram(img))
+    np.testing.assert_array_equal(channels.sum(axis=0), hist)
+    for idx in range(3):
+        np.testing.assert_array_equal(channels[idx], band_histogram(img[..., idx]))
+
+
+def test_float_histogram_percentile_matches_percentile():
+    img = np.random.default_rng(0).gamma(1.0, 500.0, [200, 150]).astype(np.float32)
+
+    hist = float_histogram(img)
+    values = float_histogram_percentile(hist, [2, 50, 98], lambda bins: float_bin_values(img, bins))
+    np.testing.assert_allclose(values, np.percentile(img, [2, 50, 98]), rtol=1e-6)
+
+
+def test_percentile_eo_stats_ignore_zero():
+    img = random_image([128, 96])
+    img[:10] = 0
+
+    stats = percentile_eo_stats(band_histogram(img))
+    np.testing.assert_allclose(stats, np.percentile(img[img != 0], [0.1, 99.9]))
+
+
+def test_percentile_eo_stats_per_band():
+    img = random_image([64, 48, 3])
+    img[..., 1] //= 4
+
+    stats = percentile_eo_stats(channel_histograms(img))
+    assert len(stats) == 3
+    for idx in range(3):
+        band = img[..., idx]
+        np.testing.assert_allclose(stats[idx], np.percentile(band[band != 0], [0.1, 99.9]))
+
+
+def test_percentile_eo_stats_of_float_bands():
+    img = np.random.default_rng(0).gamma(2.0, 300.0, [64, 48, 3]).astype(np.float32)
+    img[..., 1] /= 4
+    img[:5] = 0
+
+    def refine(bins, band):
+        return float_bin_values(img[..., band], bins)
+
+    stats = percentile_eo_stats(channel_float_histograms(img), refine=refine)
+    assert len(stats) == 3
+    for idx in range(3):
+        band = img[..., idx]
+        np.testing.assert_allclose(stats[idx], np.percentile(band[band != 0], [0.1, 99.9]), rtol=1e-6)
+
+
+@pytest.mark.parametrize('per_band', [False, True])
+def test_percentile_eo_lut_matches_stretch(per_band):
+    img = random_image([50, 40, 3])
+    hist = channel_histograms(img) if per_band else band_histogram(img)
+    stats = percentile_eo_stats(hist)
+
+    expected = np.uint8(np.round(np.clip(stretch_eo(img.astype(np.float64), stats), 0, 255)))
+    img_norm = percentile_eo(img, stats=stats)
+    assert img_norm.dtype == np.uint8
+    np.testing.assert_array_equal(img_norm, expected)
+
+
+def test_apply_lut_per_channel():
+    img = random_image([8, 8, 2], high=NUM_BINS)
+    lut = np.stack([np.arange(NUM_BINS) % 251, np.arange(NUM_BINS) % 7]).astype(np.uint8)
+
+    img_lut = apply_lut(img, lut)
+    np.testing.assert_array_equal(img_lut[..., 0], img[..., 0] % 251)
+    np.testing.assert_array_equal(img_lut[..., 1], img[..., 1] % 7)
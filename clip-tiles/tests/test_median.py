@@ -0,0 +1,58 @@
+# External functions
+from scipy import signal
+import numpy as np
+import pytest
+
+# Project functions
+from cliptiles_utils import normalization_SAR
+from cliptiles_utils.median import median3x3
+
+
+@pytest.mark.parametrize('shape', [(1, 1), (1, 9), (9, 1), (2, 3), (37, 23), (300, 17)])
+@pytest.mark.parametrize('stripe', [1, 4, 256])
+def test_median3x3_matches_medfilt2d(shape, stripe):
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+
+    expected = signal.medfilt2d(img, kernel_size=3)
+    np.testing.assert_array_equal(median3x3(img, workers=2, stripe=stripe), expected)
+
+
+def test_median3x3_speckle():
+    # Isolated bright and dark pixels are removed, as for speckle of SAR.
+    img = np.full([16, 16], 100, dtype=np.uint8)
+    img[5, 5] = 255
+    img[10, 3] = 0
+
+    img_med = median3x3(img)
+    np.testing.assert_array_equal(img_med, signal.medfilt2d(img, kernel_size=3))
+    assert img_med[5, 5] == 100 and img_med[10, 3] == 100
+
+
+@pytest.mark.parametrize('img', [np.zeros([4, 4], dtype=np.uint16), np.zeros([4, 4, 1], dtype=np.uint8)])
+def test_median3x3_rejects_other_images(img):
+    with pytest.raises(TypeError):
+        median3x3(img)
+
+
+@pytest.mark.parametrize('dtype', [np.uint16, np.float32])
+@pytest.mark.parametrize('shape', [(40, 30), (40, 30, 2)])
+def test_percentile_sar_uses_median3x3(monkeypatch, dtype, shape):
+    calls = []
+
+    def spy(band):
+        calls.append(band.dtype)
+        return median3x3(band)
+
+    monkeypatch.setattr(normalization_SAR, 'median3x3', spy)
+
+    img = np.random.default_rng(0).gamma(1, 1000, shape).astype(dtype)
+    stats = (100.5, 3000.25)
+    img_norm = normalization_SAR.percentile_sar(img, stats=stats)
+
+    # Float and LUT images are filtered by median3x3 and give the result of medfilt2d of the stretched image.
+    stretched = np.uint8((np.clip(img, *stats) - stats[0]) / (stats[1] - stats[0]) * 255)
+    stretched = stretched.reshape(shape[:2] + (-1,))
+    expected = np.stack([signal.medfilt2d(stretched[..., n], kernel_size=3) for n in range(stretched.shape[2])], -1)
+    assert img_norm.dtype == np.uint8
+    assert calls and all(dtype == np.uint8 for dtype in calls)
+    np.testing.assert_array_equal(img_norm.reshape(expected.shape), expected)
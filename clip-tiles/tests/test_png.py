@@ -0,0 +1,128 @@
+# Internal functions
+import io
+import struct
+import zlib
+
+# External functions
+import numpy as np
+import pytest
+
+# Project functions
+from cliptiles_utils.png import FILTER_UP, PNG_SIGNATURE, encode_png, filter_rows, new_rows
+
+# Palette of Tile for the palette pixel format. See cliptiles_utils/tile.py(which imports GDAL).
+GRAY_PALETTE = np.stack([np.arange(256)] * 3 + [np.full(256, 255)], axis=1).astype(np.uint8)
+GRAY_PALETTE[0, 3] = 0
+
+
+def read_chunks(data):
+    assert data[:8] == PNG_SIGNATURE
+    chunks = {}
+    pos = 8
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos+4])
+        tag = data[pos+4:pos+8]
+        body = data[pos+8:pos+8+length]
+        crc, = struct.unpack('>I', data[pos+8+length:pos+12+length])
+        assert crc == zlib.crc32(tag + body)
+        chunks[tag] = chunks.get(tag, b'') + body
+        pos += 12 + length
+
+    return chunks
+
+
+def decode(data):
+    """Decode a png written by encode_png with zlib: every scanline is Up filtered."""
+    chunks = read_chunks(data)
+    width, height, depth, color_type, _, _, _ = struct.unpack('>IIBBBBB', chunks[b'IHDR'])
+    assert depth == 8
+    channels = {0: 1, 4: 2, 2: 3, 6: 4, 3: 1}[color_type]
+
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, 1 + width * channels)
+    assert (rows[:, 0] == FILTER_UP).all()
+    lines = np.cumsum(rows[:, 1:], axis=0, dtype=np.uint8)  # Sums wrap around in uint8.
+
+    return lines.reshape(height, width, channels), color_type, chunks
+
+
+def random_pixels(shape, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    pixels[: shape[0] // 2] = pixels[0]  # Repeated rows as in tiles of uniform areas.
+
+    return pixels
+
+
+@pytest.mark.parametrize('channels, color_type', [(1, 0), (2, 4), (3, 2), (4, 6)])
+@pytest.mark.parametrize('level', [0, 1, 6, 9])
+def test_encode_png_round_trip(channels, color_type, level):
+    pixels = random_pixels([32, 48, channels])
+
+    data = encode_png(filter_rows(pixels, new_rows(32, 48, channels)), 48, 32, channels, level)
+    decoded, decoded_type, _ = decode(data)
+    assert decoded_type == color_type
+    np.testing.assert_array_equal(decoded, pixels)
+
+
+def test_filter_rows_of_views():
+    # Tiles are encoded from views of a stripe of tiles, so rows are strided.
+    stripe = random_pixels([16, 64, 4])
+    rows = new_rows(16, 16, 4)
+
+    for x in range(0, 64, 16):
+        tile = stripe[:, x:x+16]
+        decoded, _, _ = decode(encode_png(filter_rows(tile, rows), 16, 16, 4))
+        np.testing.assert_array_equal(decoded, tile)
+
+
+def test_encode_png_palette():
+    pixels = random_pixels([20, 10, 1])
+
+    data = encode_png(filter_rows(pixels, new_rows(20, 10, 1)), 10, 20, 1, palette=GRAY_PALETTE)
+    decoded, color_type, chunks = decode(data)
+    assert color_type == 3
+    np.testing.assert_array_equal(decoded, pixels)
+    np.testing.assert_array_equal(np.frombuffer(chunks[b'PLTE'], dtype=np.uint8).reshape(-1, 3), GRAY_PALETTE[:, :3])
+    assert chunks[b'tRNS'] == b'\x00'  # Alpha up to the last translucent entry only.
+
+
+@pytest.mark.parametrize('channels, mode', [(1, 'L'), (2, 'LA'), (3, 'RGB'), (4, 'RGBA')])
+def test_encode_png_pil(channels, mode):
+    image = pytest.importorskip('PIL.Image')
+    pixels = random_pixels([24, 40, channels])
+
+    with image.open(io.BytesIO(encode_png(filter_rows(pixels, new_rows(24, 40, channels)), 40, 24, channels))) as img:
+        assert img.mode == mode
+        np.testing.assert_array_equal(np.asarray(img).reshape(24, 40, channels), pixels)
+
+
+
+
+def test_encode_png_palette_pil():
+    image = pytest.importorskip('PIL.Image')
+    pixels = random_pixels([24, 40, 1])
+
+    data = encode_png(filter_rows(pixels, new_rows(24, 40, 1)), 40, 24, 1, palette=GRAY_PALETTE)
+    with image.open(io.BytesIO(data)) as img:
+        rgba = np.asarray(img.convert('RGBA'))
+    np.testing.assert_array_equal(rgba, GRAY_PALETTE[pixels[..., 0]])
+
+@pytest.mark.parametrize('channels', [1, 2, 3, 4])
+def test_encode_png_matches_gdal(channels):
+    gdal = pytest.importorskip('osgeo.gdal')
+    gdal_array = pytest.importorskip('osgeo.gdal_array')
+    pixels = random_pixels([24, 40, channels])
+
+    # Tiles were encoded by the PNG driver of GDAL before. Both are decoded to the same pixels.
+    path = '/vsimem/test_encode_png_matches_gdal.png'
+    gdal.GetDriverByName('PNG').CreateCopy(path, gdal_array.OpenArray(np.moveaxis(pixels, -1, 0).copy()))
+    try:
+        expected = gdal.Open(path).ReadAsArray()
+    finally:
+        gdal.Unlink(path)
+
+    path = '/vsimem/test_encode_png_matches_gdal_new.png'
+    gdal.FileFromMemBuffer(path, encode_png(filter_rows(pixels, new_rows(24, 40, channels)), 40, 24, channels))
+    try:
+        np.testing.assert_array_equal(gdal.Open(path).ReadAsArray(), expected)
+    finally:
+        gdal.Unlink(path)
@@ -0,0 +1,44 @@
+# Internal functions
+import tracemalloc
+
+# Project functions
+from cliptiles_utils.profiler import Profiler
+
+
+def test_close_stops_own_tracing():
+    profiler = Profiler(trace_memory=True)
+    with profiler.stage('norm') as record:
+        record['tiles'] = 0
+    assert tracemalloc.is_tracing()
+
+    profiler.close()
+    assert not tracemalloc.is_tracing()
+    assert profiler.events[0]['stage'] == 'norm' and 'py_peak_mb' in profiler.events[0]
+
+
+def test_close_keeps_tracing_of_caller():
+    tracemalloc.start()
+    try:
+        profiler = Profiler(trace_memory=True)
+        with profiler.stage('warp', zoom=15):
+            pass
+        profiler.close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_trace_memory_without_reset_peak(monkeypatch):
+    # tracemalloc.reset_peak is new in Python 3.9.
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    profiler = Profiler(trace_memory=True)
+    try:
+        with profiler.stage('write_tiles'):
+            with profiler.stage('warp'):
+                buffer = bytearray(1024 * 1024)
+            del buffer
+    finally:
+        profiler.close()
+
+    warp, write_tiles = profiler.events
+    assert warp['py_peak_mb'] >= 1 and write_tiles['py_peak_mb'] >= warp['py_peak_mb']
@@ -0,0 +1,99 @@
+# External functions
+import numpy as np
+import pytest
+
+ZOOM_MIN, ZOOM_MAX = 13, 16
+
+
+def block_pixels(tile, tiles, zoom, x, y):
+    """Pixels of 2x2 child tiles gathered per pixel of their parent. Missing children are transparent.
+
+    Returns:
+        (ndarray): RGBA values of 2x2 pixels on the last axis. shape: (4, tile_size, tile_size, 4)
+    """
+    size = tile.tile_size
+    mosaic = np.zeros([4, 2 * size, 2 * size], dtype=np.int64)
+    for dx in range(2):
+        for dy in range(2):
+            key = (zoom + 1, 2 * x + dx, 2 * y + dy)
+            if key in tiles:
+                mosaic[:, dy*size:(dy+1)*size, dx*size:(dx+1)*size] = tile.decode_tile(tiles[key])
+
+    return mosaic.reshape(4, size, 2, size, 2).transpose(0, 1, 3, 2, 4).reshape(4, size, size, 4)
+
+
+@pytest.fixture(scope='module')
+def pyramids(scenes, tiler, xyz_tiles, tmp_path_factory):
+    """Tiles of the SAR scene built by pyramid(average and mode) and warped for every zoom level."""
+    from cliptiles_utils import WarpConfig
+
+    tiles = {}
+    for name, options in [('average', {'pyramid': True, 'resampling': 'average'}),
+                          ('mode', {'pyramid': True, 'resampling': 'mode'}),
+                          ('warp', {})]:
+        output_dir = tmp_path_factory.mktemp(name)
+        _, tile = tiler(scenes['sar'], output_dir, ZOOM_MIN, ZOOM_MAX,
+                        tile_options={'warp_config': WarpConfig(resampling='average', verbose=False)}, **options)
+        tiles[name] = xyz_tiles(output_dir)
+
+    return tiles, tile
+
+
+@pytest.mark.parametrize('resampling', ['average', 'mode'])
+def test_pyramid_has_tiles_of_warps(pyramids, resampling):
+    tiles, _ = pyramids
+
+    assert set(tiles[resampling]) == set(tiles['warp'])
+    for key in tiles['warp']:
+        if key[0] == ZOOM_MAX:  # The maximum zoom level is warped in both.
+            assert tiles[resampling][key] == tiles['warp'][key]
+
+
+def test_average_of_children(pyramids):
+    tiles, tile = pyramids
+
+    for zoom, x, y in tiles['average']:
+        if zoom == ZOOM_MAX:
+            continue
+        pixels = block_pixels(tile, tiles['average'], zoom, x, y)
+        valid = pixels[3] > 0
+        count = valid.sum(axis=-1)
+        expected = np.round((pixels[:3] * valid).sum(axis=-1) / np.maximum(count, 1) + 1e-9)
+
+        parent = tile.decode_tile(tiles['average'][zoom, x, y])
+        np.testing.assert_array_equal(parent[3], (count > 0) * 255)
+        np.testing.assert_array_equal(parent[:3], expected)
+
+
+def test_mode_of_children(pyramids):
+    tiles, tile = pyramids
+
+    for zoom, x, y in tiles['mode']:
+        if zoom == ZOOM_MAX:
+            continue
+        pixels = block_pixels(tile, tiles['mode'], zoom, x, y)
+        valid = pixels[3] > 0
+        parent = tile.decode_tile(tiles['mode'][zoom, x, y]).astype(np.int64)
+
+        # The parent pixel is one of the most frequent valid children. Ties may take any of them.
+        same = np.all(pixels[:3] == parent[:3, ..., None], axis=0) & valid
+        counts = np.all(pixels[:3, ..., :, None] == pixels[:3, ..., None, :], axis=0) & valid[..., None, :]
+        most = np.where(valid, counts.sum(axis=-1), 0).max(axis=-1)
+        np.testing.assert_array_equal(parent[3], (valid.sum(axis=-1) > 0) * 255)
+        assert (same.sum(axis=-1) == most).all()
+
+
+@pytest.mark.parametrize('resampling', ['average', 'mode'])
+def test_pyramid_close_to_warps(pyramids, resampling):
+    tiles, tile = pyramids
+
+    for zoom in range(ZOOM_MIN, ZOOM_MAX):
+        keys = sorted(key for key in tiles['warp'] if key[0] == zoom)
+        pyramid = np.stack([tile.decode_tile(tiles[resampling][key]) for key in keys]).astype(np.int64)
+        warp = np.stack([tile.decode_tile(tiles['warp'][key]) for key in keys]).astype(np.int64)
+
+        # Edges of the scene may differ by a pixel.
+        assert np.mean((pyramid[:, 3] > 0) != (warp[:, 3] > 0)) < 0.01
+        both = (pyramid[:, 3] > 0) & (warp[:, 3] > 0)
+        # Speckle makes mode of 2x2 pixels far from their average, but not on average over tiles.
+        assert np.abs(pyramid[:, 0] - warp[:, 0])[both].mean() < (4 if resampling == 'average' else 16)
@@ -0,0 +1,151 @@
+# Internal functions
+import json
+import os
+import sqlite3
+
+# External functions
+import pytest
+
+# Project functions
+from cliptiles_utils.resume import STATE, RunState, make_key
+
+
+@pytest.fixture
+def scene(tmp_path):
+    path = tmp_path / 'scene.tif'
+    path.write_bytes(b'pixels')
+    return str(path)
+
+
+def test_make_key(scene):
+    key = make_key([scene], tile_size=256, sensor='K5')
+    assert key == make_key([scene], sensor='K5', tile_size=256)
+    assert key != make_key([scene], tile_size=512, sensor='K5')
+
+    with open(scene, 'wb') as f:
+        f.write(b'other pixels')
+    assert key != make_key([scene], tile_size=256, sensor='K5')
+
+
+def test_run_state_round_trip(tmp_path):
+    output_dir = str(tmp_path)
+    state = RunState(output_dir, 'key')
+    assert not state.resumed
+
+    state.add_columns(12, [100, 101], [(100, 5), (101, 6)])
+    state.add_row(12, range(102, 105), 7, [(103, 7)])
+    state.mark_done(11)
+
+    state = RunState(output_dir, 'key')
+    assert state.resumed
+    assert state.is_done(11) and not state.is_done(12)
+    assert state.columns(12) == {100, 101}
+    assert state.cells(12) == {(102, 7), (103, 7), (104, 7)}
+    assert sorted(state.tiles(12)) == [(100, 5), (101, 6), (103, 7)]
+
+
+def test_run_state_broken_line(tmp_path):
+    output_dir = str(tmp_path)
+    state = RunState(output_dir, 'key')
+    state.add_columns(3, [1], [(1, 1)])
+    with open(os.path.join(output_dir, STATE), 'a') as f:
+        f.write('{"zoom": 3, "colu')  # The run died while writing a line.
+
+    state = RunState(output_dir, 'key')
+    assert state.columns(3) == {1}
+    state.add_columns(3, [2], [(2, 1)])
+
+    state = RunState(output_dir, 'key')
+    assert state.columns(3) == {1, 2}
+    with open(os.path.join(output_dir, STATE)) as f:
+        assert json.loads(f.readline()) == {'key': 'key'}
+
+
+def test_run_state_of_another_run(tmp_path):
+    RunState(str(tmp_path), 'key').mark_done(5)
+
+    with pytest.raises(FileExistsError):
+        RunState(str(tmp_path), 'other key')
+
+
+
+class Interrupted(Exception):
+    pass
+
+
+def read_tiles(output_dir, fmt, xyz_tiles):
+    """Read tiles of a run by (zoom level, x, y) of XYZ scheme, and tiles listed per zoom level by the store."""
+    from cliptiles_utils.tile_store import Store
+
+    if fmt == 'xyz':
+        tiles = xyz_tiles(output_dir)
+    else:
+        with sqlite3.connect(os.path.join(str(output_dir), 'tiles.mbtiles')) as conn:
+            rows = conn.execute('SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles').fetchall()
+        tiles = {(zoom, x, 2 ** zoom - 1 - y): bytes(data) for zoom, x, y, data in rows}
+
+    store = Store.get(fmt)(str(output_dir), resume=True)
+    listed = {zoom: sorted(store.tiles(zoom)) for zoom in sorted({key[0] for key in tiles})}
+    store.close()
+
+    return tiles, listed
+
+
+@pytest.mark.parametrize('fmt', ['xyz', 'mbtiles'])
+@pytest.mark.parametrize('workers', [1, 3])
+@pytest.mark.parametrize('num_records', [1, 4])
+def test_resume_interrupted_write(scenes, tiler, xyz_tiles, tmp_path, monkeypatch, fmt, workers, num_records):
+    from cliptiles_utils.tile_store import Store
+
+    paths = scenes['sar']
+    key = make_key(paths, fmt=fmt, workers=workers)
+    output_dir = tmp_path / 'resumed'
+    output_dir.mkdir()  # As cliptiles.py does
+    tiler(paths, tmp_path / 'fresh', 13, 16, fmt=fmt)
+
+    # The run dies after recording progress num_records times. Tiles after the last record are written again.
+    records = []
+    recorded = []
+
+    def interrupt(add):
+        def add_until_interrupted(state, zoom_level, *args):
+            if len(records) == num_records:
+                raise Interrupted()
+            records.append(args)
+            recorded.extend((zoom_level, x, y) for x, y in args[-1])
+            add(state, zoom_level, *args)
+        return add_until_interrupted
+
+    monkeypatch.setattr(RunState, 'add_columns', interrupt(RunState.add_columns))
+    monkeypatch.setattr(RunState, 'add_row', interrupt(RunState.add_row))
+    with pytest.raises(Interrupted):
+        tiler(paths, output_dir, 13, 16, tile_options={'workers': workers}, fmt=fmt,
+              state=RunState(str(output_dir), key))
+    monkeypatch.undo()
+    assert recorded
+
+    # Tiles recorded are not written again: files keep their time, and nothing is put in the archive.
+    put = Store.get(fmt).put
+    written = []
+
+    def put_recorded(store, zoom_level, x, y, data, key=None):
+        written.append((zoom_level, x, y))
+        put(store, zoom_level, x, y, data, key=key)
+
+    if fmt == 'xyz':
+        for zoom, x, y in recorded:
+            os.utime(str(output_dir / str(zoom) / str(x) / f'{y}.png'), (0, 0))
+    else:
+        monkeypatch.setattr(Store.get(fmt), 'put', put_recorded)
+
+    state = RunState(str(output_dir), key)
+    assert state.resumed
+    tiler(paths, output_dir, 13, 16, tile_options={'workers': workers}, fmt=fmt, state=state)
+    monkeypatch.undo()
+
+    if fmt == 'xyz':
+        for zoom, x, y in recorded:
+            assert os.path.getmtime(str(output_dir / str(zoom) / str(x) / f'{y}.png')) == 0
+    else:
+        assert written and not set(written) & set(recorded)
+    assert read_tiles(output_dir, fmt, xyz_tiles) == read_tiles(tmp_path / 'fresh', fmt, xyz_tiles)
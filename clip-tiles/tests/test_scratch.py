@@ -0,0 +1,72 @@
+# Internal functions
+import os
+
+# External functions
+import pytest
+
+
+def create(path):
+    from osgeo import gdal
+
+    ds = gdal.GetDriverByName('GTiff').Create(path, 64, 64, 1, gdal.GDT_Byte)
+    ds = None
+    return exists(path)
+
+
+def exists(path):
+    from osgeo import gdal
+
+    return gdal.VSIStatL(path) is not None
+
+
+def test_memory_limit_and_spill(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_utils import Scratch
+
+    scratch = Scratch(memory_limit=1000, tmp_dir=str(tmp_path))
+    try:
+        in_memory = scratch.path('norm_ds', 600)
+        spilled = scratch.path('grid', 600)
+        shared = scratch.path('shared', 10, shared=True)
+        assert in_memory.startswith('/vsimem/') and scratch.memory_used == 600
+        assert os.path.dirname(spilled) == os.path.dirname(shared) == scratch.disk_dir
+        assert all(create(path) for path in (in_memory, spilled, shared))
+
+        # Memory of a removed intermediate is available again.
+        scratch.remove(in_memory)
+        assert scratch.memory_used == 0 and not exists(in_memory)
+        assert scratch.path('grid', 600).startswith('/vsimem/')
+        assert not os.path.isfile(spilled)  # The stale one on disk is removed.
+    finally:
+        scratch.close()
+
+    assert not os.path.exists(scratch.disk_dir) and scratch.memory_used == 0
+    assert not exists(shared)
+
+
+def test_paths_out_of_scratch_are_not_removed(tmp_path):
+    pytest.importorskip('osgeo.gdal')
+    from cliptiles_utils import Scratch
+
+    path = str(tmp_path / 'scene.tif')
+    assert create(path)
+    scratch = Scratch(tmp_dir=str(tmp_path))
+    scratch.remove(path)
+    scratch.close()
+    assert os.path.isfile(path)
+
+
+def test_failed_run_removes_scratch(scenes, tmp_path, monkeypatch):
+    import cliptiles
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('write failed')
+
+    monkeypatch.setattr(cliptiles.FileIO, 'write', fail)
+    tmp_dir = tmp_path / 'tmp'
+    tmp_dir.mkdir()
+    with pytest.raises(RuntimeError):
+        cliptiles.run(cliptiles.parse_args([*scenes['sar'], '13', '14', str(tmp_path / 'tiles'),
+                                            '--memory_limit', '0', '--tmp_dir', str(tmp_dir)]))
+
+    assert os.listdir(str(tmp_dir)) == []
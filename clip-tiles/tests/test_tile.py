@@ -0,0 +1,40 @@
+# Internal functions
+import io
+
+# External functions
+import numpy as np
+import pytest
+
+
+def decode_rgba(tiles):
+    image = pytest.importorskip('PIL.Image')
+
+    decoded = {}
+    for key, data in tiles.items():
+        with image.open(io.BytesIO(data)) as img:
+            decoded[key] = np.asarray(img.convert('RGBA'))
+
+    return decoded
+
+
+@pytest.mark.parametrize('pixel_format, ext', [('la', 'png'), ('palette', 'png'), ('webp', 'webp')])
+def test_pixel_formats_decode_to_rgba_tiles(scenes, tiler, xyz_tiles, tmp_path, pixel_format, ext):
+    from osgeo import gdal
+
+    if pixel_format == 'webp' and gdal.GetDriverByName('WEBP') is None:
+        pytest.skip('GDAL is built without WebP.')
+
+    tiler(scenes['sar'], tmp_path / 'rgba', 13, 14)
+    tiler(scenes['sar'], tmp_path / pixel_format, 13, 14, tile_options={'pixel_format': pixel_format})
+
+    expected = decode_rgba(xyz_tiles(tmp_path / 'rgba'))
+    decoded = decode_rgba(xyz_tiles(tmp_path / pixel_format, ext=ext))
+    assert expected and decoded.keys() == expected.keys()
+    for key, rgba in expected.items():
+        np.testing.assert_array_equal(decoded[key], rgba)
+
+
+@pytest.mark.parametrize('pixel_format', ['la', 'palette'])
+def test_single_band_pixel_formats_reject_eo(scenes, tiler, tmp_path, pixel_format):
+    with pytest.raises(NotImplementedError):
+        tiler(scenes['eo'], tmp_path, 13, 13, tile_options={'pixel_format': pixel_format})
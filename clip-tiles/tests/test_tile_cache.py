@@ -0,0 +1,91 @@
+# Internal functions
+import os
+import threading
+import time
+
+# External functions
+import pytest
+
+# Project functions
+from cliptiles_utils.tile_cache import TileCache
+
+
+def renderer(calls):
+    def render(key):
+        calls.append(key)
+        return bytes(10) + str(key).encode()
+    return render
+
+
+def test_memory_lru():
+    calls = []
+    render = renderer(calls)
+    cache = TileCache(memory_size=60)
+
+    for key in [(1, 0, 0), (1, 0, 1), (1, 1, 0)]:  # Each tile is about 20 bytes.
+        cache.get(key, lambda: render(key))
+    cache.get((1, 0, 0), lambda: render((1, 0, 0)))  # Recently used
+    cache.get((1, 1, 1), lambda: render((1, 1, 1)))  # Evicts the least recently used: (1, 0, 1)
+
+    assert cache.get((1, 0, 0), lambda: render((1, 0, 0))) == render((1, 0, 0))
+    calls.clear()
+    cache.get((1, 0, 1), lambda: render((1, 0, 1)))
+    assert calls == [(1, 0, 1)]
+    assert cache.stats['evictions'] >= 1 and cache.stats['memory_hits'] >= 2
+
+
+def test_coalescing():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'tile'
+
+    cache = TileCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get((3, 1, 2), render))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [b'tile'] * 8
+    assert cache.stats['renders'] == 1
+
+
+def test_failed_render_is_retried():
+    cache = TileCache()
+
+    def fail():
+        raise RuntimeError('render failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get((0, 0, 0), fail)
+    assert cache.get((0, 0, 0), lambda: b'tile') == b'tile'
+
+
+def test_disk_cache(tmp_path):
+    calls = []
+    render = renderer(calls)
+    cache = TileCache(memory_size=0, cache_dir=str(tmp_path), disk_size=45, ext='png')
+    for key in [(2, 0, 0), (2, 0, 1), (2, 1, 0)]:
+        cache.get(key, lambda: render(key))
+
+    # Tiles on disk are bounded by disk_size. The least recently used one is removed.
+    assert not os.path.exists(os.path.join(str(tmp_path), '2', '0', '0.png'))
+    assert os.path.isfile(os.path.join(str(tmp_path), '2', '1', '0.png'))
+
+    # Tiles on disk are reused by the next run.
+    calls.clear()
+    cache = TileCache(cache_dir=str(tmp_path), disk_size=45, ext='png')
+    assert cache.get((2, 1, 0), lambda: render((2, 1, 0))) == render((2, 1, 0))
+    assert cache.stats['disk_hits'] == 1 and cache.stats['renders'] == 0
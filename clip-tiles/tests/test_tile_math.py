@@ -0,0 +1,104 @@
+# External functions
+import numpy as np
+import pytest
+
+# Project functions
+from cliptiles_utils import tile_math
+from cliptiles_utils.tile_math import LAT_MAX, MERCATOR_MAX, lonlat_to_tile, polygon_tiles, tile_children, \
+    tile_parents, tile_to_lonlat, tile_to_mercator
+
+
+def test_lonlat_to_tile_known_points():
+    # The origin is the top-left corner of tile (n / 2, n / 2).
+    x, y = lonlat_to_tile(0, 0, 15)
+    assert (x, y) == (2 ** 14, 2 ** 14)
+
+    x, y = lonlat_to_tile([-180, 0, 179.999999, -180], [LAT_MAX, 0, -LAT_MAX, 89.9], 2)
+    np.testing.assert_array_equal(x, [0, 2, 3, 0])
+    np.testing.assert_array_equal(y, [0, 2, 3, 0])
+
+
+def test_tile_to_lonlat_world():
+    lon_min, lat_min, lon_max, lat_max = tile_to_lonlat(0, 0, 0)
+    assert lon_min == -180 and lat_max == pytest.approx(LAT_MAX)
+    assert lon_max == pytest.approx(180) and lat_min == pytest.approx(-LAT_MAX)
+
+
+@pytest.mark.parametrize('zoom_level', [0, 1, 7, 15, 20])
+def test_tile_round_trip(zoom_level):
+    n = 2 ** zoom_level
+    rng = np.random.default_rng(zoom_level)
+    x = rng.integers(0, n, 1000)
+    y = rng.integers(0, n, 1000)
+
+    lon_min, lat_min, lon_max, lat_max = tile_to_lonlat(x, y, zoom_level)
+    assert (lon_min < lon_max).all() and (lat_min < lat_max).all()
+
+    # Centers and bottom-right corners of tiles are in the tiles, since bounds do not touch neighbouring tiles.
+    for lon, lat in [(lon_max, lat_min), ((lon_min + lon_max) / 2, (lat_min + lat_max) / 2)]:
+        tile_x, tile_y = lonlat_to_tile(lon, lat, zoom_level)
+        np.testing.assert_array_equal(tile_x, x)
+        np.testing.assert_array_equal(tile_y, y)
+
+
+def test_tile_to_mercator():
+    np.testing.assert_allclose(tile_to_mercator(0, 0, 0), [-MERCATOR_MAX, -MERCATOR_MAX, MERCATOR_MAX, MERCATOR_MAX])
+
+    x_min, y_min, x_max, y_max = tile_to_mercator(np.array([0, 1]), np.array([1, 0]), 1)
+    np.testing.assert_allclose(x_min, [-MERCATOR_MAX, 0])
+    np.testing.assert_allclose(y_min, [-MERCATOR_MAX, 0])
+    np.testing.assert_allclose(x_max, [0, MERCATOR_MAX])
+    np.testing.assert_allclose(y_max, [0, MERCATOR_MAX])
+
+
+def test_tile_parents_and_children():
+    x, y = tile_children(np.array([3, 10]), np.array([5, 7]), 4, 6)
+    assert len(x) == 2 * 16
+    assert set(zip(x[:16], y[:16])) == {(cx, cy) for cx in range(12, 16) for cy in range(20, 24)}
+
+    parent_x, parent_y = tile_parents(x, y, 6, 4)
+    np.testing.assert_array_equal(parent_x, np.repeat([3, 10], 16))
+    np.testing.assert_array_equal(parent_y, np.repeat([5, 7], 16))
+
+    parent_x, parent_y = tile_parents(x, y, 6, 6)
+    np.testing.assert_array_equal(parent_x, x)
+    np.testing.assert_array_equal(parent_y, y)
+
+
+def test_polygon_tiles_rectangle():
+    # A rectangle covers the tiles of its bounding box.
+    lon = [126.5, 127.5, 127.5, 126.5]
+    lat = [37.0, 37.0, 38.0, 38.0]
+    x, y = polygon_tiles(lon, lat, 10)
+
+    x_tl, y_tl = lonlat_to_tile(126.5, 38.0, 10)
+    x_br, y_br = lonlat_to_tile(127.5, 37.0, 10)
+    assert set(zip(x, y)) == {(tx, ty) for tx in range(x_tl, x_br + 1) for ty in range(y_tl, y_br + 1)}
+
+
+def test_polygon_tiles_triangle():
+    # A triangle over tiles (0, 0) ~ (3, 3) of zoom level 2 below the diagonal from the top-left corner.
+    lon = [-180, 179.9, -180]
+    lat = [LAT_MAX, -LAT_MAX, -LAT_MAX]
+    x, y = polygon_tiles(lon, lat, 2)
+
+    assert set(zip(x, y)) == {(tx, ty) for tx in range(4) for ty in range(4) if tx <= ty}
+
+
+@pytest.mark.parametrize('max_pairs', [1, 7, 100])
+def test_polygon_tiles_in_chunks(monkeypatch, max_pairs):
+    # A star of 10 vertexes, densified to 40.
+    angle = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+    radius = np.where(np.arange(40) // 4 % 2 == 0, 1.0, 0.4)
+    lon = 127 + radius * np.cos(angle)
+    lat = 37 + radius * np.sin(angle)
+
+    expected = polygon_tiles(lon, lat, 9)
+    monkeypatch.setattr(tile_math, 'MAX_PAIRS', max_pairs)
+    x, y = polygon_tiles(lon, lat, 9)
+
+    # Tiles are the same and in the same order(row by row) whatever the chunks are.
+    assert 0 < len(expected[0]) < 12 * 12
+    np.testing.assert_array_equal(x, expected[0])
+    np.testing.assert_array_equal(y, expected[1])
+    assert x.dtype == np.int64 and y.dtype == np.int64
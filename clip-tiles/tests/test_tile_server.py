@@ -0,0 +1,99 @@
+# Internal functions
+import json
+import os
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+# External functions
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def normalized(scenes, tmp_path_factory):
+    """Normalized SAR scene with overviews down to zoom level 0, as cliptiles_serve.py prepares it."""
+    from cliptiles_utils import FileIO, Tile, WarpConfig, get_sensor
+
+    file_io = FileIO(get_sensor(os.path.basename(scenes['sar'][0])), memory_limit=0,
+                     tmp_dir=str(tmp_path_factory.mktemp('scratch')))
+    file_io.open(path=scenes['sar'], epsg=3857)
+    file_io.build_overviews(Tile(256, warp_config=WarpConfig(verbose=False)), 0)
+    file_io.ds.FlushCache()
+    yield file_io.ds.GetDescription()
+    file_io.close()
+
+
+def decode(data):
+    from osgeo import gdal
+
+    path = f'/vsimem/test_tile_server_{threading.get_ident()}.png'
+    gdal.FileFromMemBuffer(path, data)
+    try:
+        return gdal.Open(path).ReadAsArray()
+    finally:
+        gdal.Unlink(path)
+
+
+def test_rendered_tiles_match_written_ones(scenes, normalized, tiler, xyz_tiles, tmp_path):
+    from cliptiles_utils import TileRenderer
+
+    tiler(scenes['sar'], tmp_path, 14, 15)
+    tiles = xyz_tiles(tmp_path)
+    renderer = TileRenderer(normalized)
+
+    # A tile is warped alone, so its pixels can differ from the grid warp of cliptiles.py by the approximate transformer.
+    for (zoom, x, y), data in tiles.items():
+        rendered, written = decode(renderer.render(zoom, x, y)).astype(int), decode(data).astype(int)
+        assert np.mean(rendered[3] != written[3]) < 0.01
+        assert np.mean(np.abs(rendered - written)[:, (rendered[3] > 0) & (written[3] > 0)]) < 1
+
+    indexes = renderer.get_grid(15)
+    assert renderer.render(15, indexes[2] + 1, indexes[1]) == b''
+    assert renderer.render(15, indexes[0], indexes[3] + 1) == b''
+
+
+def test_server(normalized):
+    from http.server import ThreadingHTTPServer
+    from cliptiles_utils import TileCache, TileRenderer
+    from cliptiles_utils.tile_server import TileHandler
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TileHandler)
+    server.renderer = TileRenderer(normalized)
+    server.cache = TileCache(memory_size=1024 * 1024)
+    server.verbose = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        x, y, _, _ = server.renderer.get_grid(15)
+        for _ in range(2):
+            with urlopen(f'{url}/15/{x + 1}/{y + 1}.png') as response:
+                assert response.status == 200 and response.headers['Content-Type'] == 'image/png'
+                assert response.read() == server.renderer.render(15, x + 1, y + 1)
+
+        for path in [f'/15/{x + 1}/{y + 1}.webp', f'/15/{x - 1}/{y}.png', f'/21/0/0.png', '/1/2/0.png', '/tiles']:
+            with pytest.raises(HTTPError) as error:
+                urlopen(url + path)
+            assert error.value.code == 404
+
+        with urlopen(f'{url}/stats') as response:
+            stats = json.loads(response.read())
+        assert stats['memory_hits'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_scene_key(scenes, tmp_path):
+    from cliptiles_serve import scene_key
+
+    path = tmp_path / 'K5_scene.tif'
+    path.write_bytes(b'scene')
+    key = scene_key([str(path)], tile_size=256, pixel_format='rgba')
+
+    # Cached tiles of a scene are reused only for the same file and parameters.
+    assert scene_key([str(path)], tile_size=256, pixel_format='rgba') == key
+    assert scene_key([str(path)], tile_size=512, pixel_format='rgba') != key
+    os.utime(str(path), ns=(0, 0))
+    assert scene_key([str(path)], tile_size=256, pixel_format='rgba') != key
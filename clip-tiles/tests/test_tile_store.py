@@ -0,0 +1,77 @@
+# Internal functions
+import os
+import sqlite3
+
+# External functions
+import pytest
+
+# Project functions
+from cliptiles_utils.tile_store import MBTilesStore
+
+TILES = {(3, 1, 0): b'sea', (3, 1, 1): b'land', (3, 2, 1): b'sea', (4, 2, 2): b'sea', (4, 3, 2): b'coast'}
+
+
+def write_mbtiles(output_dir, dedup, batch_size=2):
+    store = MBTilesStore(str(output_dir), dedup=dedup, batch_size=batch_size)
+    for (zoom, x, y), data in TILES.items():
+        store.put(zoom, x, y, data)
+    for zoom in (3, 4):
+        store.commit(zoom, [(x, y) for z, x, y in TILES if z == zoom])
+    stats = store.stats()
+    store.close()
+
+    return stats
+
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_mbtiles_rows_are_tms(tmp_path, dedup):
+    write_mbtiles(tmp_path, dedup)
+
+    with sqlite3.connect(str(tmp_path / 'tiles.mbtiles')) as conn:
+        rows = conn.execute('SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles').fetchall()
+        metadata = dict(conn.execute('SELECT name, value FROM metadata'))
+
+    # Row 0 of TMS is the bottom row of a zoom level.
+    assert {(zoom, x, 2 ** zoom - 1 - y): data for (zoom, x, y), data in TILES.items()} == \
+        {(zoom, x, y): bytes(data) for zoom, x, y, data in rows}
+    assert metadata['minzoom'] == '3' and metadata['maxzoom'] == '4' and metadata['format'] == 'png'
+
+
+def test_mbtiles_stores_duplicates_once(tmp_path):
+    stats = write_mbtiles(tmp_path, dedup=True)
+
+    with sqlite3.connect(str(tmp_path / 'tiles.mbtiles')) as conn:
+        num_map = conn.execute('SELECT COUNT(*) FROM map').fetchone()[0]
+        images = [bytes(data) for data, in conn.execute('SELECT tile_data FROM images')]
+        ids = conn.execute('SELECT COUNT(DISTINCT tile_id) FROM map WHERE tile_id IN '
+                           '(SELECT tile_id FROM images WHERE tile_data = ?)', (b'sea',)).fetchone()[0]
+
+    assert num_map == len(TILES)
+    assert sorted(images) == sorted(set(TILES.values()))
+    assert ids == 1
+    assert stats == {'tiles': 5, 'unique': 3, 'duplicates': 2, 'bytes_saved': 2 * len(b'sea')}
+
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_mbtiles_reopen(tmp_path, dedup):
+    write_mbtiles(tmp_path, dedup)
+
+    store = MBTilesStore(str(tmp_path), dedup=dedup, resume=True)
+    assert sorted(store.tiles(3)) == [(1, 0), (1, 1), (2, 1)]
+    assert store.get(4, 3, 2) == b'coast' and store.get(4, 0, 0) is None
+    store.close()
+
+    store = MBTilesStore(str(tmp_path), dedup=dedup)  # Recreated without resume
+    assert store.tiles(3) == []
+    store.close()
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_mbtiles_of_scene(scenes, tiler, xyz_tiles, tmp_path, workers):
+    tiler(scenes['sar'], tmp_path / 'xyz', 13, 16)
+    tiler(scenes['sar'], tmp_path / 'mbtiles', 13, 16, tile_options={'workers': workers}, fmt='mbtiles', dedup=True)
+
+    with sqlite3.connect(str(tmp_path / 'mbtiles' / 'tiles.mbtiles')) as conn:
+        rows = conn.execute('SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles').fetchall()
+    assert {(zoom, x, 2 ** zoom - 1 - y): bytes(data) for zoom, x, y, data in rows} == xyz_tiles(tmp_path / 'xyz')
+    assert not os.path.isdir(tmp_path / 'mbtiles' / '16')
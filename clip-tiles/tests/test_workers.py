@@ -0,0 +1,12 @@
+# External functions
+import pytest
+
+
+@pytest.mark.parametrize('kind, pixel_format', [('sar', 'rgba'), ('sar', 'palette'), ('eo', 'rgba')])
+def test_workers_write_the_same_tiles(scenes, tiler, xyz_tiles, tmp_path, kind, pixel_format):
+    tiler(scenes[kind], tmp_path / 'serial', 13, 16, tile_options={'pixel_format': pixel_format})
+    tiler(scenes[kind], tmp_path / 'parallel', 13, 16, tile_options={'pixel_format': pixel_format, 'workers': 3})
+
+    tiles = xyz_tiles(tmp_path / 'serial')
+    assert len(tiles) > 3 * 4  # Stripes of every worker have tiles.
+    assert xyz_tiles(tmp_path / 'parallel') == tiles
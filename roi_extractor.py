@@ -5,16 +5,27 @@ import xml.etree.ElementTree as ET
 from osgeo import gdal, ogr, osr
 import numpy as np
 
+# cliptiles_utils is installed(pip install clip-tiles/cliptiles_utils) or found in PYTHONPATH(clip-tiles).
+from cliptiles_utils.histogram import NUM_BINS, histogram_percentile
+from cliptiles_utils.stats_cache import StatsCache
+from cliptiles_utils.warp import WarpConfig
+
 
 class ImageReader:
-    def __init__(self, img_path, kml_path=None, band='rgb'):
+    def __init__(self, img_path, kml_path=None, band='rgb', warp_config=None, stats_cache=None):
         """
         input_image (str): Path to the input image file.
         kml_path (str): Path to the kml file.
         band (str): Band order of an input image. default: rgb.
+        warp_config (WarpConfig): Options of warps. default: None(default options).
+        stats_cache (StatsCache): Cache of stretch statistics. If given, subsets are stretched with
+                                  statistics of the whole scene. default: None(statistics of a subset).
         """
+        self.img_paths = img_path
         self.dataset = self.get_dataset(img_path)
         self.band = band;
+        self.warp_config = warp_config if warp_config is not None else WarpConfig()
+        self.stats_cache = stats_cache
         if not self.validate_dataset():
             print('좌표계 정보가 존재하지 않는 영상은 사용할 수 없습니다.')
             exit()
@@ -41,10 +52,11 @@ class ImageReader:
         epsg = self.get_epsg()
         if epsg:
             roi = self.get_roi(epsg=epsg)
-            subset = gdal.Warp("",
-                               self.dataset,
-                               outputBounds=[roi[0], roi[3], roi[2], roi[1]],
-                               format="MEM")
+            subset = self.warp_config.warp("",
+                                           self.dataset,
+                                           name='subset',
+                                           outputBounds=[roi[0], roi[3], roi[2], roi[1]],
+                                           format="MEM")
 
             # it gets only first 3 bands of the original image.
             subset = gdal.Translate("", subset, format="MEM", bandList=[1, 2, 3])
@@ -57,11 +69,13 @@ class ImageReader:
         array = subset.ReadAsArray()
         if array.ndim == 3:  # Ensure it's multi-band
             array = np.transpose(array, (1, 2, 0))  # Change from [C, H, W] to [H, W, C]
+        bands = [1, 2, 3]
         if self.dataset.RasterCount != 3:
             array = array[..., :3]  # Assume the channel order is [B, G, R, ...]. Use BGR only.
         if self.band == 'rgb':
             array = array[..., ::-1]  # Convert RGB to BGR
-        array = self.normalize(array)
+            bands = bands[::-1]
+        array = self.normalize(array, bands=bands)
 
         # Determine output format based on file extension
         if output_img.lower().endswith(".tif"):
@@ -85,22 +99,30 @@ class ImageReader:
             epsg = int(epsg)
         return epsg
 
-    def normalize(self, img, pmin=0.1, pmax=99.9):
+    def normalize(self, img, pmin=0.1, pmax=99.9, bands=None):
         """Stretch and normalize it to the 8 bit image.
 
         Args:
             img(ndarray): Image array. shape: (height, width, channel)
             pmin(float): Minimum percentile value. Default: 0.1%
             pmax(float): Maximum percentile value. Default: 99.9%
+            bands(list(int)): Band indexes of the dataset per channel of img. If given with stats_cache,
+                              statistics of the whole scene are used. Default: None
         Returns:
             img_norm(ndarray): Normalised image array. Range of the value is [0, 255].
         """
         img_norm = np.zeros(img.shape)
         for c in range(img.shape[2]):
             band = img[..., c]
-            buffer = band[band != 0]
-            stretch_min = np.nanpercentile(buffer, pmin)  # Error occurred
-            stretch_max = np.nanpercentile(buffer, pmax)
+            stats = None
+            if bands is not None and self.stats_cache is not None:
+                stats = self.scene_stats(bands[c], pmin, pmax)
+            if stats is not None:
+                stretch_min, stretch_max = stats
+            else:
+                buffer = band[band != 0]
+                stretch_min = np.nanpercentile(buffer, pmin)  # Error occurred
+                stretch_max = np.nanpercentile(buffer, pmax)
 
             img_norm[..., c] = (band - stretch_min) / (stretch_max - stretch_min) * 255
 
@@ -109,6 +131,35 @@ class ImageReader:
 
         return np.array(img_norm, dtype=np.uint16)
 
+    def scene_stats(self, band, pmin, pmax):
+        """
+        Get stretch statistics of a band of the whole scene from its histogram in the cache.
+        The histogram is counted and cached if it is not. Zero pixels are ignored as in normalize.
+
+        Args:
+            band (int): Band index of the dataset.
+            pmin (float): Minimum percentile value.
+            pmax (float): Maximum percentile value.
+        Returns:
+            (tuple(float)): stretch_min, stretch_max. None if the band is not 8 or 16 bit integer.
+        """
+        raster_band = self.dataset.GetRasterBand(band)
+        if raster_band.DataType not in (gdal.GDT_Byte, gdal.GDT_UInt16):
+            return None
+
+        # Histograms are cached per file and band of it, shared with cliptiles.py. Merged bands are band 1 of files.
+        source = [(self.img_paths[band - 1], 1) if len(self.img_paths) > 1 else (self.img_paths[0], band)]
+        hist = self.stats_cache.load_bands(source)
+        if hist is None:
+            # Exact histogram with a bin per integer value.
+            hist = np.array([raster_band.GetHistogram(min=-0.5, max=NUM_BINS - 0.5, buckets=NUM_BINS,
+                                                      include_out_of_range=0, approx_ok=0)], dtype=np.int64)
+            self.stats_cache.save_bands(source, hist)
+
+        hist = hist[0].copy()
+        hist[0] = 0
+        return tuple(histogram_percentile(hist, [pmin, pmax]))
+
     def get_roi(self, epsg=None):
         """
         Get coordinates of a region of interest(roi). The reference coordinate system
@@ -275,6 +326,14 @@ if __name__ == '__main__':
     parser.add_argument('--band', type=str, default='rgb', choices=['rgb', 'bgr'],
                         help = 'Band order of a merged image')
     parser.add_argument('--output', type=str, help='Path to save a file')
+    parser.add_argument('--threads', type=int, default=1, help='Number of threads of a warp. 0 uses all CPUs')
+    parser.add_argument('--warp_memory', type=int, default=None, help='Memory of a warp in MB')
+    parser.add_argument('--cache_size', type=int, default=None, help='Size of GDAL block cache in MB')
+    parser.add_argument('--resampling', type=str, default='near', help='Resampling method of a warp. '
+                                                                       'E.g., near, bilinear, cubic')
+    parser.add_argument('--stats_cache', type=str, nargs='?', const='', default=None,
+                        help='Stretch a subset with statistics of the whole scene, cached in the given directory or '
+                             '~/.cache/cliptiles/stats. If not given, a subset is stretched with its own statistics')
     args = parser.parse_args()
 
     if args.output is None:
@@ -287,5 +346,10 @@ if __name__ == '__main__':
         print('Only .tif is supported for the output at the moment. '
               'Output file will be saved as: {}'.format(path_output))
 
-    reader = ImageReader(args.path_img, args.path_kml, args.band)
+    warp_config = WarpConfig(threads=args.threads,
+                             memory_limit=args.warp_memory,
+                             cache_size=args.cache_size,
+                             resampling=args.resampling)
+    stats_cache = None if args.stats_cache is None else StatsCache(args.stats_cache)
+    reader = ImageReader(args.path_img, args.path_kml, args.band, warp_config, stats_cache)
     reader.subset(path_output)